@@ -0,0 +1,179 @@
+"""Reproducible render benchmark for video_writer.
+
+Builds a synthetic background, RGBA cards and MP3 narration locally, then runs generate_video_from_content
+with every render mode across several video durations and resolutions. Each case runs in a fresh process so
+peak RSS is measured per case. Results are written as JSON, and a previous results file can be passed with
+--compare to print the change in frames/sec between commits.
+
+    python benchmarks/bench_render.py --durations 10 30 --resolutions 540x960 1080x1920 --output bench_render.json
+    python benchmarks/bench_render.py --compare bench_render_main.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from viddit import __version__
+from viddit.core.background import get_background_proxy
+from viddit.core.timeline import build_timeline
+from viddit.core.video_writer import RENDER_MODES, generate_video_from_content
+
+# The synthetic inputs live beside this file, however it is run
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from synthetic import write_background, write_post_assets  # noqa: E402
+
+SEGMENTS = 4  # The post and three comments, the default of --max-comments
+WAIT_TIME = 2
+# Every run decodes the same background frames with the same encoder settings, whatever the machine has saved
+BACKGROUND_START_FRAME = 0
+ENCODER_SETTINGS = {}
+
+
+def _max_rss_mb(who):
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    max_rss = resource.getrusage(who).ru_maxrss
+    return max_rss / (1024 * 1024) if sys.platform == "darwin" else max_rss / 1024
+
+
+def _run_case(results_queue, background_path, png_paths, audio_paths, output_name, render_mode, proxy_cache_dir):
+    """Runs in a fresh process so the peak RSS belongs to this case alone"""
+    total_frames = build_timeline(
+        background_path, png_paths, audio_paths, wait_time=WAIT_TIME, background_start_frame=BACKGROUND_START_FRAME
+    ).total_frames
+    start = time.perf_counter()
+    generate_video_from_content(
+        background_path,
+        png_paths,
+        audio_paths,
+        output_name=output_name,
+        wait_time=WAIT_TIME,
+        render_mode=render_mode,
+        proxy_cache_dir=proxy_cache_dir,
+        encoder_settings=ENCODER_SETTINGS,
+        background_start_frame=BACKGROUND_START_FRAME,
+    )
+    wall_time = time.perf_counter() - start
+    results_queue.put(
+        {
+            "frames": total_frames,
+            "wall_time_s": round(wall_time, 3),
+            "frames_per_sec": round(total_frames / wall_time, 2),
+            "peak_rss_mb": round(_max_rss_mb(resource.RUSAGE_SELF), 1),
+            # The largest single child, i.e. an ffmpeg encoder or a parallel render worker
+            "peak_child_rss_mb": round(_max_rss_mb(resource.RUSAGE_CHILDREN), 1),
+            "output_bytes": os.path.getsize(output_name),
+        }
+    )
+
+
+def _run_in_process(context, *args):
+    # A plain (non-daemonic) process, because the parallel render mode starts its own worker processes
+    results_queue = context.Queue()
+    process = context.Process(target=_run_case, args=(results_queue,) + args)
+    process.start()
+    process.join()
+    if process.exitcode != 0:
+        raise RuntimeError(f"Benchmark case exited with code {process.exitcode}")
+    return results_queue.get()
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)), stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except Exception:
+        return None
+
+
+def run_benchmark(durations, resolutions, render_modes, work_dir, repeats=1):
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for width, height in resolutions:
+        # Long enough for the longest video, with some to spare
+        background_path = write_background(os.path.join(work_dir, f"background_{width}x{height}.mp4"), width, height, max(durations) + 10)
+        proxy_cache_dir = os.path.join(work_dir, "proxies")
+        # Build the proxy up front so its one-off cost is not attributed to the first case
+        get_background_proxy(background_path, cache_dir=proxy_cache_dir)
+        for duration in durations:
+            segment_durations = [max(duration / SEGMENTS - WAIT_TIME, 0.5)] * SEGMENTS
+            asset_dir = os.path.join(work_dir, f"assets_{width}x{height}_{duration}s")
+            png_paths, audio_paths = write_post_assets(asset_dir, width, height, segment_durations)
+            for render_mode in render_modes:
+                for repeat in range(repeats):
+                    output_name = os.path.join(work_dir, f"out_{width}x{height}_{duration}s_{render_mode}.mp4")
+                    result = _run_in_process(context, background_path, png_paths, audio_paths, output_name, render_mode, proxy_cache_dir)
+                    os.remove(output_name)
+                    result.update({"render_mode": render_mode, "resolution": f"{width}x{height}", "duration_s": duration, "repeat": repeat})
+                    print(
+                        f"{render_mode:>12} {width}x{height} {duration:>4}s: {result['frames_per_sec']:8.1f} fps, "
+                        f"{result['wall_time_s']:7.2f} s, rss {result['peak_rss_mb']:7.1f} MB "
+                        f"(child {result['peak_child_rss_mb']:.1f} MB), {result['output_bytes'] / 1e6:.2f} MB out"
+                    )
+                    results.append(result)
+    return results
+
+
+def compare(results, previous_results):
+    def key(result):
+        return (result["render_mode"], result["resolution"], result["duration_s"])
+
+    def best(rows):
+        best_rows = {}
+        for row in rows:
+            if key(row) not in best_rows or row["frames_per_sec"] > best_rows[key(row)]["frames_per_sec"]:
+                best_rows[key(row)] = row
+        return best_rows
+
+    current, previous = best(results), best(previous_results)
+    print("\nChange in frames/sec against the previous run:")
+    for case in sorted(current):
+        if case in previous:
+            ratio = current[case]["frames_per_sec"] / previous[case]["frames_per_sec"]
+            print(f"{case[0]:>12} {case[1]} {case[2]:>4}s: {previous[case]['frames_per_sec']:8.1f} -> {current[case]['frames_per_sec']:8.1f} fps ({ratio:.2f}x)")
+
+
+def parse_resolution(value):
+    width, height = value.lower().split("x")
+    return int(width), int(height)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--durations", type=int, nargs="+", default=[10, 30], help="Video durations in seconds")
+    parser.add_argument("--resolutions", type=parse_resolution, nargs="+", default=[(540, 960), (1080, 1920)])
+    parser.add_argument("--render-modes", nargs="+", default=RENDER_MODES, choices=RENDER_MODES)
+    parser.add_argument("--repeats", type=int, default=1)
+    parser.add_argument("--output", default="bench_render.json", help="Where to write the JSON results")
+    parser.add_argument("--compare", help="A previous results file to compare against")
+    parser.add_argument("--work-dir", help="Where to write the synthetic inputs, by default a temporary directory")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="viddit_bench_") as tmp_dir:
+        results = run_benchmark(args.durations, args.resolutions, args.render_modes, args.work_dir or tmp_dir, args.repeats)
+
+    report = {
+        "commit": _git_commit(),
+        "version": __version__,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f)["results"])
+
+
+if __name__ == "__main__":
+    main()
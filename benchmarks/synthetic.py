@@ -0,0 +1,69 @@
+"""Synthetic inputs for the benchmarks, so they run anywhere without the real background or Reddit content."""
+import os
+
+import cv2
+import numpy as np
+
+from viddit.utils.ffmpeg_utils import run_ffmpeg
+
+
+def make_card(width, height, seed=0):
+    """Builds a BGRA card with rounded, anti-aliased corners like a Reddit screenshot"""
+    rng = np.random.default_rng(seed)
+    card = np.zeros((height, width, 4), dtype=np.uint8)
+    card[:, :, :3] = rng.integers(0, 256, size=(height, width, 3), dtype=np.uint8)
+    alpha = np.zeros((height, width), dtype=np.uint8)
+    radius = min(width, height) // 10
+    cv2.rectangle(alpha, (radius, 0), (width - radius, height), 255, -1)
+    cv2.rectangle(alpha, (0, radius), (width, height - radius), 255, -1)
+    for cx, cy in [(radius, radius), (width - radius, radius), (radius, height - radius), (width - radius, height - radius)]:
+        cv2.circle(alpha, (cx, cy), radius, 255, -1, lineType=cv2.LINE_AA)
+    card[:, :, 3] = cv2.GaussianBlur(alpha, (5, 5), 0)
+    return card
+
+
+def write_card(path, width, height, seed=0):
+    cv2.imwrite(path, make_card(width, height, seed))
+    return path
+
+
+def write_background(path, width, height, duration, fps=30):
+    """Writes a moving test pattern with a long GOP, like a typical downloaded background"""
+    run_ffmpeg(
+        [
+            "-f",
+            "lavfi",
+            "-i",
+            f"testsrc2=size={width}x{height}:rate={fps}",
+            "-t",
+            duration,
+            "-c:v",
+            "libx264",
+            "-preset",
+            "ultrafast",
+            "-g",
+            fps * 10,
+            "-pix_fmt",
+            "yuv420p",
+            path,
+        ]
+    )
+    return path
+
+
+def write_narration(path, duration, frequency=440):
+    """Writes a mono 24kHz MP3, the format the TTS module returns"""
+    run_ffmpeg(["-f", "lavfi", "-i", f"sine=frequency={frequency}:sample_rate=24000", "-t", duration, "-c:a", "libmp3lame", "-b:a", "32k", path])
+    return path
+
+
+def write_post_assets(directory, width, height, segment_durations, seed=0):
+    """Writes one card and one narration per segment, returning (png_paths, audio_paths)"""
+    os.makedirs(directory, exist_ok=True)
+    png_paths = []
+    audio_paths = []
+    for i, duration in enumerate(segment_durations):
+        card_height = height // 4 + (i * 37) % (height // 8)
+        png_paths.append(write_card(os.path.join(directory, f"{i}.png"), width * 9 // 10, card_height, seed + i))
+        audio_paths.append(write_narration(os.path.join(directory, f"{i}.mp3"), duration, 300 + 50 * i))
+    return png_paths, audio_paths
@@ -7,11 +7,12 @@ setuptools.setup(
         'viddit': ['resources/*']
     },
     include_package_data=True,
-    install_requires=["opencv-python", "selenium", "moviepy", "numpy", "oauth2client","google-cloud-texttospeech", "gTTS", "google-api-python-client", "google-auth-oauthlib", "openai", "google-auth-httplib2", "pymongo", "praw", "pydrive"],
+    install_requires=["opencv-python", "selenium", "moviepy", "numpy", "oauth2client","google-cloud-texttospeech", "gTTS", "google-api-python-client", "google-auth-oauthlib", "openai", "google-auth-httplib2", "pymongo", "praw", "pydrive", "Pillow"],
     packages=setuptools.find_packages(where='src'),
     entry_points={
         'console_scripts': [
             'viddit=viddit.__main__:main',
+            'viddit-tune-encoder=viddit.core.encoder_tuning:main',
         ],
     },
     classifiers=[
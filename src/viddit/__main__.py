@@ -2,15 +2,26 @@
 import json
 import logging
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 from selenium.webdriver.remote.remote_connection import LOGGER
 
+from viddit.core.artifact_cache import ScrapeArtifactCache
+from viddit.core.audio import AUDIO_EXTENSIONS
 from viddit.core.content_upload.gdrive_uploader import upload_to_google_drive
+from viddit.core.ffmpeg_writer import DEFAULT_PROFILE_NAME, OUTPUT_PROFILES, load_encoder_settings
 from viddit.core.metadata import GPTMetadata
 from viddit.core.mongo import initialise_db
+from viddit.core.poll_cursors import PollCursorStore
+from viddit.core.praw_cards import PrawCardSource
 from viddit.core.reddit_scraper import RedditPostImageScraper, SubRedditInfoScraper
 from viddit.core.tts import GoogleCloudTTS
+from viddit.core.tts_async import AsyncGoogleCloudTTS
+from viddit.core.tts_cache import CachedTTS
+from viddit.core.tts_chunking import ChunkedTTS
 from viddit.core.video_writer import generate_video_from_content
+from viddit.core.workspace import WorkspaceManager
 from viddit.utils.args_utils import parse_args
 from viddit.utils.logging_utils import setup_logger
 
@@ -33,6 +44,12 @@ DIRECTORIES = {
     "comment_audio": COMMENT_AUDIO_DIR,
     "comment_image": COMMENT_IMAGE_DIR,
 }
+
+
+# Every job gets the same directories inside its own workspace
+JOB_LAYOUT = {key: os.path.relpath(directory, BASE_OUTPUT_DIR) for key, directory in DIRECTORIES.items()}
+
+
 BACKGROUND_PATH = os.path.join(os.path.dirname(__file__), "resources", "background.mp4")
 REDDIT_CREDS_PATH = os.path.join(os.path.dirname(__file__), "resources", "reddit_credentials.json")
 OPENAI_CREDS_PATH = os.path.join(os.path.dirname(__file__), "resources", "gpt_key.json")
@@ -63,7 +80,25 @@ def main():
             logger.error("Could not connect to MongoDB")
             raise Exception("Could not connect to MongoDB")
 
-    tts_module = GoogleCloudTTS(SERVICE_ACCOUNT_PATH)
+    if args.tts_client == "async":
+        # One channel, concurrency limit and quota shared by every scrape's narration
+        tts_client = AsyncGoogleCloudTTS(SERVICE_ACCOUNT_PATH, concurrency=args.tts_concurrency, audio_encoding=args.tts_encoding)
+    else:
+        tts_client = GoogleCloudTTS(SERVICE_ACCOUNT_PATH, audio_encoding=args.tts_encoding)
+    # LINEAR16 narration is joined by the renderer without being decoded, every encoding's durations are read exactly
+    audio_extension = AUDIO_EXTENSIONS[args.tts_encoding]
+    tts_module = tts_client
+    chunked_tts = None
+    if args.tts_chunk_bytes:
+        # Long self posts are narrated as chunks in parallel rather than one request that may be over the input limit
+        chunked_tts = tts_module = ChunkedTTS(tts_module, max_bytes=args.tts_chunk_bytes)
+    # Pipeline workers only wait on the async client, enough of them to keep it at its concurrency limit
+    tts_workers = max(args.tts_workers, args.tts_concurrency) if args.tts_client == "async" else args.tts_workers
+    if args.tts_cache_mb:
+        # Retries, reruns and posts shared between subreddits reuse their narration
+        tts_module = CachedTTS(tts_module, max_mb=args.tts_cache_mb)
+    output_profiles = [OUTPUT_PROFILES[name] for name in args.output_profiles.split("|")] if args.output_profiles else None
+    encoder_settings = load_encoder_settings() if args.tuned_encoder else {}
 
     subreddit_scraper = SubRedditInfoScraper(
         reddit_creds["client_id"],
@@ -72,52 +107,130 @@ def main():
         reddit_creds["user_agent"],
         reddit_creds["username"],
     )
-    comment_image_scraper = RedditPostImageScraper(DIRECTORIES, tts_module, CHROME_DRIVER_PATH, operating_sys=args.operating_sys)
-    for i in range(len(reddits)):
+    if args.card_source == "praw":
+        # Reuses the authenticated API client, no Chrome is started
+        comment_image_scraper = PrawCardSource(
+            subreddit_scraper.reddit, DIRECTORIES, tts_module, tts_workers=tts_workers, tts_ssml_marks=args.tts_ssml_marks
+        )
+    else:
+        comment_image_scraper = RedditPostImageScraper(
+            DIRECTORIES,
+            tts_module,
+            CHROME_DRIVER_PATH,
+            operating_sys=args.operating_sys,
+            pool_size=args.driver_pool_size,
+            max_pages_per_driver=args.driver_max_pages,
+            capture_mode=args.capture_mode,
+            tts_workers=tts_workers,
+            tts_ssml_marks=args.tts_ssml_marks,
+        )
+    # Posts scraped by an earlier run whose upload failed are loaded from here rather than scraped again
+    artifact_cache = (
+        ScrapeArtifactCache(
+            max_mb=args.artifact_cache_mb, audio_encoding=args.tts_encoding, card_source=args.card_source, capture_mode=args.capture_mode
+        )
+        if args.artifact_cache_mb
+        else None
+    )
+    # Every job scrapes, renders and uploads in a workspace of its own, so jobs can overlap
+    workspace_manager = WorkspaceManager(BASE_OUTPUT_DIR, JOB_LAYOUT, tmpfs_root=args.workspace_root or None, keep=args.keep_workspaces)
+    # Scrapes run ahead on the driver pool while earlier posts are rendered and uploaded
+    scrape_executor = ThreadPoolExecutor(max_workers=args.driver_pool_size, thread_name_prefix="scraper")
+    render_slots = threading.BoundedSemaphore(args.parallel_jobs)
+    # Every started job holds a workspace, so no more are started than can be scraping or rendering at once
+    max_live_jobs = args.driver_pool_size + args.parallel_jobs
+    job_slots = threading.BoundedSemaphore(max_live_jobs)
+    job_executor = ThreadPoolExecutor(max_workers=max_live_jobs, thread_name_prefix="job")
+    # Posts are only marked passed once their video is uploaded, so a failed job is offered again next run
+    cursor_store = PollCursorStore() if args.incremental else None
+    # Listings arrive as each subreddit's fetch completes, all fetches share one rate limit budget
+    subreddit_listings = subreddit_scraper.iter_subreddits_info(
+        reddits,
+        max_workers=args.subreddit_workers,
+        cursor_store=cursor_store,
+        limit=args.max_vids_per_subreddit,
+        time_filter="day",
+        filter_locked=True,
+        filter_mod=False,
+        filter_stickied=True,
+        filter_original_content=False,
+        filter_nsfw=False,
+        min_upvotes=50,
+        min_num_comments=10,
+        min_upvote_ratio=0.85,
+    )
+
+    def scrape_post(post, directories):
+        if artifact_cache:
+            return artifact_cache.scrape_post(comment_image_scraper, post, args.max_comments, directories)
+        return comment_image_scraper.scrape_post("https://www.reddit.com" + post["permalink"], args.max_comments, directories)
+
+    def process_post(subreddit_name, post, job_name):
+        post_link = "https://www.reddit.com" + post["permalink"]
+        try:
+            # Made once the job starts, so the tmpfs check sees what earlier jobs have written
+            with workspace_manager.job(job_name) as workspace:
+                directories = workspace.directories
+                no_comments, post_info = scrape_executor.submit(scrape_post, post, directories).result()
+                with render_slots:
+                    logger.info(f"Creating video for {post_link}")
+                    vid_input_list = [os.path.join(directories["post_image"], "0.png")] + [
+                        os.path.join(directories["comment_image"], f"{x}.png") for x in range(0, no_comments)
+                    ]
+                    audio_input_list = [os.path.join(directories["post_audio"], f"0{audio_extension}")] + [
+                        os.path.join(directories["comment_audio"], f"{x}{audio_extension}") for x in range(0, no_comments)
+                    ]
+                    output_paths = generate_video_from_content(
+                        BACKGROUND_PATH,
+                        vid_input_list,
+                        audio_input_list,
+                        output_name=workspace.file(TEMP_OUTPUT_NAME + ".mp4"),
+                        render_mode=args.render_mode,
+                        max_workers=args.render_workers or None,
+                        output_profiles=output_profiles,
+                        encoder_settings=encoder_settings,
+                    )
+                    metadata = metadata_generator.generate_metadata_gpt(post_info)
+                    metadata_path = workspace.file(TEMP_OUTPUT_NAME + ".json")
+                    with open(metadata_path, "w") as f:
+                        json.dump(metadata, f)
+                    for profile_name, output_path in output_paths.items():
+                        suffix = "" if profile_name == DEFAULT_PROFILE_NAME else f"_{profile_name}"
+                        upload_to_google_drive(output_path, OUATH_CREDS_PATH, metadata["Title"] + suffix + ".mp4")
+                    upload_to_google_drive(metadata_path, OUATH_CREDS_PATH, metadata["Title"] + ".json")
+                if connection_status:
+                    db.add_viddited(post["permalink"])  # TODO Add metadata
+                if cursor_store is not None:
+                    cursor_store.mark_passed(subreddit_name, post["name"])
+        except Exception as e:
+            logger.error(f"Error processing post {post_link}")
+            logger.error(e)
+        finally:
+            job_slots.release()
+
+    job_count = 0
+    for subreddit_name, posts in subreddit_listings:
         try:
-            posts = subreddit_scraper.get_subreddit_info(
-                reddits[i],
-                limit=args.max_vids_per_subreddit,
-                time_filter="day",
-                filter_locked=True,
-                filter_mod=False,
-                filter_stickied=True,
-                filter_original_content=False,
-                filter_nsfw=False,
-                min_upvotes=50,
-                min_num_comments=10,
-                min_upvote_ratio=0.85,
-            )
-
-            for j in range(len(posts)):
-                try:
-                    post_link = "https://www.reddit.com" + posts[j]["permalink"]
-                    create = True
-                    if connection_status:
-                        if db.get_viddited(posts[j]["permalink"]):
-                            create = False
-                    if create:
-                        logger.info(f"Creating video for {post_link}")
-                        no_comments, post_info = comment_image_scraper.scrape_post(post_link, args.max_comments)
-                        vid_input_list = [f"{POST_IMAGE_DIR}/0.png"] + [f"{COMMENT_IMAGE_DIR}/{x}.png" for x in range(0, no_comments)]
-                        audio_input_list = [f"{POST_AUDIO_DIR}/0.mp3"] + [f"{COMMENT_AUDIO_DIR}/{x}.mp3" for x in range(0, no_comments)]
-                        generate_video_from_content(
-                            BACKGROUND_PATH, vid_input_list, audio_input_list, output_name=TEMP_OUTPUT_NAME + ".mp4"
-                        )
-                        metadata = metadata_generator.generate_metadata_gpt(post_info)
-                        with open(TEMP_OUTPUT_NAME + ".json", "w") as f:
-                            json.dump(metadata, f)
-                        upload_to_google_drive(TEMP_OUTPUT_NAME + ".mp4", OUATH_CREDS_PATH, metadata["Title"] + ".mp4")
-                        upload_to_google_drive(TEMP_OUTPUT_NAME + ".json", OUATH_CREDS_PATH, metadata["Title"] + ".json")
-                        if connection_status:
-                            db.add_viddited(posts[j]["permalink"])  # TODO Add metadata
-                except Exception as e:
-                    logger.error(f"Error processing post {post_link}")
-                    logger.error(e)
-                    continue
+            if connection_status:
+                posts = [post for post in posts if not db.get_viddited(post["permalink"])]
+            for post in posts:
+                # Blocks while max_live_jobs are running, rather than queueing every listed post
+                job_slots.acquire()
+                job_executor.submit(process_post, subreddit_name, post, f"job_{job_count}")
+                job_count += 1
         except Exception as e:
-            logger.error(f"Could not scrape subreddit {reddits[i]}: {e}")
+            logger.error(f"Could not scrape subreddit {subreddit_name}: {e}")
             posts = []
+    job_executor.shutdown()
+    scrape_executor.shutdown()
+    logger.info(f"Workspaces: {workspace_manager.summary()}")
+    if args.tts_cache_mb:
+        logger.info(f"TTS cache: {tts_module.stats()}")
+    comment_image_scraper.teardown()
+    if chunked_tts is not None:
+        chunked_tts.close()
+    if args.tts_client == "async":
+        tts_client.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,92 @@
+import logging
+import os
+
+from viddit.core.audio import AUDIO_EXTENSIONS
+from viddit.utils.disk_cache import DiskLRUCache, make_key
+from viddit.utils.file_util import delete_content_of_dir, make_dir_if_not_exists
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "viddit", "artifacts")
+ARTIFACT_CACHE_MAX_MB = 1024
+
+
+def artifact_key(post, no_comments, audio_encoding="MP3", card_source="selenium", capture_mode="element"):
+    """Keys a post's artifacts by its permalink and text and by how they were made, so an edited post, a different
+    comment count, narration encoding or card source misses"""
+    return make_key(post["permalink"], post["title"], post["selftext"], no_comments, audio_encoding, card_source, capture_mode)
+
+
+class ScrapeArtifactCache:
+    """Keeps the cards, narration and post_data of scraped posts between runs, so a post whose upload or
+    metadata generation failed is not scraped and narrated all over again on the next run
+    Parameters
+    ----------
+    directory : str, optional
+        Where the artifacts are kept, by default ARTIFACT_CACHE_DIR
+    max_mb : int, optional
+        Size the cache may grow to before the least recently used posts are evicted, by default ARTIFACT_CACHE_MAX_MB
+    audio_encoding : str, optional
+        Encoding of the narration the scraper writes, MP3, LINEAR16 or OGG_OPUS, by default MP3
+    card_source : str, optional
+        Where the cards come from, "selenium" or "praw", by default "selenium"
+    capture_mode : str, optional
+        How selenium cards are captured, "element" or "page", by default "element"
+    """
+
+    def __init__(
+        self, directory=ARTIFACT_CACHE_DIR, max_mb=ARTIFACT_CACHE_MAX_MB, audio_encoding="MP3", card_source="selenium", capture_mode="element"
+    ):
+        self.cache = DiskLRUCache(directory, max_mb * 1024 * 1024)
+        self.audio_encoding = audio_encoding
+        self.card_source = card_source
+        self.capture_mode = capture_mode
+
+    def _key(self, post, no_comments):
+        return artifact_key(post, no_comments, self.audio_encoding, self.card_source, self.capture_mode)
+
+    def _has_expected_files(self, metadata):
+        """Whether an entry holds the narration files the renderer will look for"""
+        extension = AUDIO_EXTENSIONS[self.audio_encoding]
+        expected = [f"post_audio/0{extension}"] + [f"comment_audio/{k}{extension}" for k in range(metadata["no_comments"])]
+        return set(expected) <= set(metadata["files"])
+
+    def load(self, post, no_comments, directories):
+        """Copies a post's cached artifacts into directories, returning (number of comments, post_data) or None on a miss"""
+        for directory in directories.values():
+            make_dir_if_not_exists(directory)
+            delete_content_of_dir(directory)
+
+        def destinations(metadata):
+            if not self._has_expected_files(metadata):
+                # e.g. written by a version that did not key on the encoding, nothing is copied and it is a miss
+                return {}
+            return {name: os.path.join(directories[name.split("/")[0]], name.split("/")[1]) for name in metadata["files"]}
+
+        entry = self.cache.copy_out(self._key(post, no_comments), destinations)
+        if entry is None or not self._has_expected_files(entry.metadata):
+            return None
+        return entry.metadata["no_comments"], entry.metadata["post_data"]
+
+    def store(self, post, no_comments, directories, result):
+        """Caches the artifacts a scrape left in directories along with its (number of comments, post_data)"""
+        files = {
+            f"{directory_key}/{file_name}": os.path.join(directory, file_name)
+            for directory_key, directory in directories.items()
+            for file_name in os.listdir(directory)
+        }
+        metadata = {"permalink": post["permalink"], "no_comments": result[0], "post_data": result[1], "files": sorted(files)}
+        self.cache.put(self._key(post, no_comments), files, metadata)
+
+    def scrape_post(self, scraper, post, no_comments, directories):
+        """Returns scraper.scrape_post's result for post, from the cache when its artifacts are already there"""
+        result = self.load(post, no_comments, directories)
+        if result is not None:
+            logger.info(f"Reusing cached cards and narration for {post['permalink']}")
+            return result
+        result = scraper.scrape_post("https://www.reddit.com" + post["permalink"], no_comments, directories)
+        try:
+            self.store(post, no_comments, directories, result)
+        except OSError as e:
+            logger.warning(f"Could not cache the artifacts of {post['permalink']}: {e}")
+        return result
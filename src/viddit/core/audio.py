@@ -0,0 +1,315 @@
+import io
+import logging
+import os
+import wave
+from dataclasses import dataclass
+from typing import Optional
+
+from viddit.utils.ffmpeg_utils import run_ffmpeg
+
+logger = logging.getLogger(__name__)
+
+OPUS_SAMPLE_RATE = 48000
+# File extension for each Text-to-Speech audio encoding
+AUDIO_EXTENSIONS = {"MP3": ".mp3", "LINEAR16": ".wav", "OGG_OPUS": ".ogg"}
+# ffmpeg raw formats for the PCM sample widths
+_PCM_FORMATS = {1: "u8", 2: "s16le", 4: "s32le"}
+
+# Indexed by [version][layer], version 3 is MPEG-1 and layer 1 is Layer III as they are encoded in the header
+_MPEG1, _MPEG2, _MPEG25 = 3, 2, 0
+_LAYER3, _LAYER2, _LAYER1 = 1, 2, 3
+_BITRATES_KBPS = {
+    (_MPEG1, _LAYER1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (_MPEG1, _LAYER2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (_MPEG1, _LAYER3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (_MPEG2, _LAYER1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (_MPEG2, _LAYER2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (_MPEG2, _LAYER3): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+_SAMPLE_RATES = {_MPEG1: [44100, 48000, 32000], _MPEG2: [22050, 24000, 16000], _MPEG25: [11025, 12000, 8000]}
+
+
+def _parse_frame_header(header):
+    """Returns (frame_length, samples_per_frame, sample_rate, version, channel_mode) or None if not a valid header"""
+    if len(header) < 4 or header[0] != 0xFF or header[1] & 0xE0 != 0xE0:
+        return None
+    version = (header[1] >> 3) & 0x3
+    layer = (header[1] >> 1) & 0x3
+    bitrate_index = header[2] >> 4
+    sample_rate_index = (header[2] >> 2) & 0x3
+    padding = (header[2] >> 1) & 0x1
+    channel_mode = header[3] >> 6
+    if version == 1 or layer == 0 or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None  # Reserved values, or free format which has no length in the header
+    bitrate = _BITRATES_KBPS[(_MPEG1 if version == _MPEG1 else _MPEG2, layer)][bitrate_index] * 1000
+    sample_rate = _SAMPLE_RATES[version][sample_rate_index]
+    if layer == _LAYER1:
+        return (12 * bitrate // sample_rate + padding) * 4, 384, sample_rate, version, channel_mode
+    if layer == _LAYER3 and version != _MPEG1:
+        return 72 * bitrate // sample_rate + padding, 576, sample_rate, version, channel_mode
+    return 144 * bitrate // sample_rate + padding, 1152, sample_rate, version, channel_mode
+
+
+def _vbr_frame_count(data, offset, version, channel_mode):
+    """Returns (frame_count, gapless_samples) from a Xing/Info or VBRI header in the first frame, or None if there is none.
+
+    gapless_samples is the encoder delay plus padding from a LAME tag, which decoders trim from the output.
+    """
+    mono = channel_mode == 3
+    xing_offset = offset + 4 + ((17 if mono else 32) if version == _MPEG1 else (9 if mono else 17))
+    tag = data[xing_offset : xing_offset + 4]
+    if tag in (b"Xing", b"Info"):
+        flags = int.from_bytes(data[xing_offset + 4 : xing_offset + 8], "big")
+        if flags & 0x1:
+            frame_count = int.from_bytes(data[xing_offset + 8 : xing_offset + 12], "big")
+            # Skip the optional frame count, byte count, TOC and quality fields to reach the LAME tag
+            lame_offset = xing_offset + 8 + sum(size for flag, size in [(0x1, 4), (0x2, 4), (0x4, 100), (0x8, 4)] if flags & flag)
+            gapless_samples = 0
+            # ffmpeg writes the same tag layout with its own encoder name
+            if data[lame_offset : lame_offset + 4] in (b"LAME", b"Lavf", b"Lavc"):
+                delay_padding = int.from_bytes(data[lame_offset + 21 : lame_offset + 24], "big")
+                gapless_samples = (delay_padding >> 12) + (delay_padding & 0xFFF)
+            return frame_count, gapless_samples
+    if data[offset + 36 : offset + 40] == b"VBRI":
+        return int.from_bytes(data[offset + 50 : offset + 54], "big"), 0
+    return None
+
+
+def mp3_duration(mp3_path):
+    """Returns the duration of an MP3 in seconds by reading its frame headers, without decoding any audio.
+
+    A Xing/Info/VBRI header in the first frame gives the frame count directly, otherwise the frames are walked.
+    """
+    with open(mp3_path, "rb") as f:
+        return mp3_duration_from_bytes(f.read(), mp3_path)
+
+
+def mp3_duration_from_bytes(data, name="MP3 data"):
+    """mp3_duration for an MP3 held in memory"""
+    offset = 0
+    if data[:3] == b"ID3":
+        # ID3v2 sizes are syncsafe integers, 7 bits per byte, plus a 10 byte header and an optional footer
+        tag_size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        offset = 10 + tag_size + (10 if data[5] & 0x10 else 0)
+
+    samples = 0
+    sample_rate = None
+    first_frame = True
+    while offset + 4 <= len(data):
+        frame = _parse_frame_header(data[offset : offset + 4])
+        if frame is None:
+            if data[offset : offset + 3] == b"TAG":
+                break  # ID3v1 tag at the end of the file
+            offset += 1  # Resynchronise on garbage between frames
+            continue
+        frame_length, samples_per_frame, frame_sample_rate, version, channel_mode = frame
+        if first_frame:
+            first_frame = False
+            vbr_header = _vbr_frame_count(data, offset, version, channel_mode)
+            if vbr_header is not None:
+                frame_count, gapless_samples = vbr_header
+                return (frame_count * samples_per_frame - gapless_samples) / frame_sample_rate
+        samples += samples_per_frame
+        sample_rate = frame_sample_rate
+        offset += frame_length
+    if sample_rate is None:
+        raise ValueError(f"No MPEG audio frames found in {name}")
+    return samples / sample_rate
+
+
+def _ogg_pages(data):
+    """Yields (granule_position, serial, body) for every Ogg page, following each header's segment table"""
+    offset = 0
+    while offset + 27 <= len(data):
+        if data[offset : offset + 4] != b"OggS":
+            raise ValueError(f"No Ogg page at byte {offset}")
+        segment_count = data[offset + 26]
+        body_offset = offset + 27 + segment_count
+        body_length = sum(data[offset + 27 : body_offset])
+        yield int.from_bytes(data[offset + 6 : offset + 14], "little", signed=True), data[offset + 14 : offset + 18], data[body_offset : body_offset + body_length]
+        offset = body_offset + body_length
+
+
+def ogg_opus_duration(data):
+    """Returns the duration of an Ogg Opus stream in seconds from its page headers, without decoding any audio.
+
+    The granule position of the stream's last page counts 48 kHz samples from the start, less the pre-skip in the OpusHead.
+    """
+    serial = pre_skip = None
+    granule_position = 0
+    for page_granule_position, page_serial, body in _ogg_pages(data):
+        if serial is None and body[:8] == b"OpusHead":
+            serial = page_serial
+            pre_skip = int.from_bytes(body[10:12], "little")
+        elif page_serial == serial and page_granule_position >= 0:
+            # -1 marks a page on which no packet ends
+            granule_position = page_granule_position
+    if serial is None:
+        raise ValueError("Not an Ogg Opus stream")
+    return max(granule_position - pre_skip, 0) / OPUS_SAMPLE_RATE
+
+
+@dataclass
+class AudioBuffer:
+    """Narration held in memory along with its exact duration.
+
+    LINEAR16 audio is kept as raw PCM samples, which the renderer can pad and join without decoding anything.
+    Other encodings are kept as the encoded bytes.
+    """
+
+    data: bytes
+    encoding: str
+    duration: float
+    sample_rate: Optional[int] = None
+    channels: int = 1
+    sample_width: int = 2
+
+    @classmethod
+    def from_bytes(cls, data, encoding):
+        """Wraps a Text-to-Speech response's audio_content, LINEAR16 responses are WAV files"""
+        if encoding == "LINEAR16":
+            with wave.open(io.BytesIO(data), "rb") as wav_file:
+                params = wav_file.getparams()
+                samples = wav_file.readframes(params.nframes)
+            return cls(samples, encoding, params.nframes / params.framerate, params.framerate, params.nchannels, params.sampwidth)
+        if encoding == "OGG_OPUS":
+            return cls(data, encoding, ogg_opus_duration(data), OPUS_SAMPLE_RATE)
+        if encoding == "MP3":
+            return cls(data, encoding, mp3_duration_from_bytes(data))
+        raise ValueError(f"Unsupported audio encoding {encoding}")
+
+    @classmethod
+    def from_file(cls, audio_path):
+        encoding = {extension: encoding for encoding, extension in AUDIO_EXTENSIONS.items()}.get(os.path.splitext(audio_path)[1].lower(), "MP3")
+        with open(audio_path, "rb") as f:
+            return cls.from_bytes(f.read(), encoding)
+
+    @property
+    def is_pcm(self):
+        return self.encoding == "LINEAR16"
+
+    def pcm_format(self):
+        return (self.sample_rate, self.channels, self.sample_width)
+
+    def save(self, path):
+        """Writes the audio to a file, PCM as a WAV"""
+        if self.is_pcm:
+            with wave.open(path, "wb") as wav_file:
+                wav_file.setnchannels(self.channels)
+                wav_file.setsampwidth(self.sample_width)
+                wav_file.setframerate(self.sample_rate)
+                wav_file.writeframes(self.data)
+        else:
+            with open(path, "wb") as f:
+                f.write(self.data)
+        return path
+
+
+def get_audio_duration(audio_path):
+    """Returns the duration of an AudioBuffer, or of a WAV, Ogg Opus or MP3 file in seconds from its headers"""
+    if isinstance(audio_path, AudioBuffer):
+        return audio_path.duration
+    extension = os.path.splitext(audio_path)[1].lower()
+    if extension == ".wav":
+        with wave.open(audio_path, "rb") as wav_file:
+            return wav_file.getnframes() / wav_file.getframerate()
+    if extension in (".ogg", ".opus"):
+        with open(audio_path, "rb") as f:
+            return ogg_opus_duration(f.read())
+    return mp3_duration(audio_path)
+
+
+def assemble_narration(audio_paths, segment_durations, output_path, sample_rate=None):
+    """Builds the whole narration track in one pass.
+
+    Each audio input is padded with silence (or trimmed) to the duration of its segment and the results are
+    concatenated, so each segment's narration is followed by its wait_time gap. The codec follows the output
+    extension, e.g. .m4a gives AAC that can be muxed without re-encoding and .wav gives PCM. When every input
+    is PCM the samples are joined in memory and at most encoded once, otherwise ffmpeg decodes and joins them.
+    Parameters
+    ----------
+    audio_paths : list
+        Audio files or AudioBuffers, one per segment
+    segment_durations : list
+        Duration of each segment in seconds
+    output_path : str
+        Path to write the narration track to
+    sample_rate : int, optional
+        Sample rate of the output, by default that of the inputs
+    Returns
+    -------
+    str
+        The output path
+    """
+    if len(audio_paths) != len(segment_durations):
+        raise ValueError("segment_durations must have one entry per audio path")
+    logger.info(f"Assembling {len(audio_paths)} audio inputs into a {sum(segment_durations):.2f} second narration track")
+    pcm_buffers = _pcm_buffers(audio_paths)
+    if pcm_buffers is not None:
+        return _assemble_pcm(pcm_buffers, segment_durations, output_path, sample_rate)
+
+    # ffmpeg needs files, buffers that are not PCM are written beside the output for the duration of the pass
+    temp_paths = []
+    input_paths = []
+    for k, audio_path in enumerate(audio_paths):
+        if isinstance(audio_path, AudioBuffer):
+            audio_path = audio_path.save(f"{os.path.splitext(output_path)[0]}.input{k}{AUDIO_EXTENSIONS[audio_path.encoding]}")
+            temp_paths.append(audio_path)
+        input_paths.append(audio_path)
+    try:
+        args = []
+        for audio_path in input_paths:
+            args += ["-i", audio_path]
+        filters = [f"[{k}:a]apad=whole_dur={duration},atrim=duration={duration}[a{k}]" for k, duration in enumerate(segment_durations)]
+        concat_inputs = "".join(f"[a{k}]" for k in range(len(input_paths)))
+        filters.append(f"{concat_inputs}concat=n={len(input_paths)}:v=0:a=1[aout]")
+        args += ["-filter_complex", ";".join(filters), "-map", "[aout]"]
+        if sample_rate:
+            args += ["-ar", sample_rate]
+        args += [output_path]
+        run_ffmpeg(args)
+    finally:
+        for temp_path in temp_paths:
+            os.remove(temp_path)
+    return output_path
+
+
+def _pcm_buffers(audio_paths):
+    """Returns every input as a PCM AudioBuffer, or None unless they are all PCM in the same format"""
+    buffers = []
+    for audio_path in audio_paths:
+        if isinstance(audio_path, AudioBuffer):
+            buffer = audio_path
+        elif os.path.splitext(audio_path)[1].lower() == ".wav":
+            buffer = AudioBuffer.from_file(audio_path)
+        else:
+            return None
+        if not buffer.is_pcm or (buffers and buffer.pcm_format() != buffers[0].pcm_format()):
+            return None
+        buffers.append(buffer)
+    return buffers
+
+
+def _assemble_pcm(buffers, segment_durations, output_path, sample_rate=None):
+    """Pads and joins PCM buffers in memory, writing a WAV directly or piping the samples to ffmpeg to encode once"""
+    rate, channels, sample_width = buffers[0].pcm_format()
+    frame_size = channels * sample_width
+    silence = b"\x80" if sample_width == 1 else b"\x00"
+    parts = []
+    elapsed = 0.0
+    written_frames = 0
+    for buffer, duration in zip(buffers, segment_durations):
+        # Boundaries are rounded from the running total so rounding never accumulates across segments
+        elapsed += duration
+        num_frames = round(elapsed * rate) - written_frames
+        samples = buffer.data[: num_frames * frame_size]
+        parts.append(samples + silence * (num_frames * frame_size - len(samples)))
+        written_frames += num_frames
+    narration = AudioBuffer(b"".join(parts), "LINEAR16", written_frames / rate, rate, channels, sample_width)
+    if os.path.splitext(output_path)[1].lower() == ".wav" and sample_rate in (None, rate):
+        return narration.save(output_path)
+    args = ["-f", _PCM_FORMATS[sample_width], "-ar", rate, "-ac", channels, "-i", "pipe:0"]
+    if sample_rate:
+        args += ["-ar", sample_rate]
+    run_ffmpeg(args + [output_path], input=narration.data)
+    return output_path
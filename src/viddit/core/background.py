@@ -0,0 +1,222 @@
+import hashlib
+import logging
+import os
+import queue
+import threading
+
+import cv2
+import numpy as np
+
+from viddit.utils.ffmpeg_utils import run_ffmpeg
+from viddit.utils.file_util import make_dir_if_not_exists
+
+logger = logging.getLogger(__name__)
+
+PROXY_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "viddit", "background_proxies")
+# Bump when the proxy encoding changes so stale proxies are not reused
+PROXY_VERSION = 1
+
+_file_hashes = {}
+_PROXY_LOCK = threading.Lock()
+
+
+def hash_file(path, chunk_size=1 << 20):
+    """Returns the sha256 of a file, memoised on its path, size and modification time"""
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    if memo_key not in _file_hashes:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                digest.update(chunk)
+        _file_hashes[memo_key] = digest.hexdigest()
+    return _file_hashes[memo_key]
+
+
+def get_video_properties(video_path):
+    """Returns (fps, width, height, frame_count) of a video"""
+    cap = cv2.VideoCapture(video_path)
+    properties = (
+        cap.get(cv2.CAP_PROP_FPS),
+        int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+        int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+        int(cap.get(cv2.CAP_PROP_FRAME_COUNT)),
+    )
+    cap.release()
+    return properties
+
+
+def get_background_proxy(source_path, output_size=None, fps=None, keyframe_interval=15, crf=18, cache_dir=PROXY_CACHE_DIR):
+    """Returns the path to a seek-friendly proxy of a background video, creating it on first use.
+
+    The proxy is scaled and cropped to the output resolution and encoded with a keyframe every keyframe_interval
+    frames, so a random seek only ever decodes a handful of frames. Proxies are cached on disk, keyed by the
+    hash of the source file and the render settings.
+    Parameters
+    ----------
+    source_path : str
+        Path to the background video
+    output_size : tuple, optional
+        (width, height) of the rendered video, by default the source resolution
+    fps : float, optional
+        Frame rate of the proxy, by default the source frame rate
+    keyframe_interval : int, optional
+        Number of frames between keyframes, by default 15
+    crf : int, optional
+        x264 quality of the proxy, by default 18 which is visually lossless
+    cache_dir : str, optional
+        Directory the proxies are cached in, by default PROXY_CACHE_DIR
+    Returns
+    -------
+    str
+        Path to the cached proxy
+    """
+    source_fps, source_width, source_height, _ = get_video_properties(source_path)
+    width, height = output_size or (source_width, source_height)
+    fps = fps or source_fps
+    settings = f"{width}x{height}_{fps:g}fps_g{keyframe_interval}_crf{crf}_v{PROXY_VERSION}"
+    proxy_path = os.path.join(cache_dir, f"{hash_file(source_path)[:32]}_{settings}.mp4")
+    if os.path.exists(proxy_path):
+        logger.debug(f"Using cached background proxy {proxy_path}")
+        return proxy_path
+    # Threads rendering at the same time wait for one proxy encode, other processes encode to their own partial file
+    with _PROXY_LOCK:
+        if not os.path.exists(proxy_path):
+            _create_background_proxy(source_path, proxy_path, width, height, fps, keyframe_interval, crf, cache_dir)
+    return proxy_path
+
+
+def _create_background_proxy(source_path, proxy_path, width, height, fps, keyframe_interval, crf, cache_dir):
+    make_dir_if_not_exists(cache_dir)
+    logger.info(f"Creating background proxy {proxy_path} from {source_path}, this only happens once per background")
+    # Write to a temporary name first so an interrupted encode is never mistaken for a finished proxy, one per
+    # process and thread so concurrent encodes of the same proxy don't overwrite each other before the rename
+    temp_path = f"{proxy_path}.{os.getpid()}.{threading.get_ident()}.partial.mp4"
+    try:
+        run_ffmpeg(
+            [
+                "-i",
+                source_path,
+                "-an",
+                "-vf",
+                f"scale={width}:{height}:force_original_aspect_ratio=increase,crop={width}:{height},fps={fps}",
+                "-c:v",
+                "libx264",
+                "-preset",
+                "veryfast",
+                "-crf",
+                crf,
+                "-g",
+                keyframe_interval,
+                "-keyint_min",
+                keyframe_interval,
+                "-sc_threshold",
+                0,
+                "-pix_fmt",
+                "yuv420p",
+                temp_path,
+            ]
+        )
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    os.replace(temp_path, proxy_path)
+
+
+class BackgroundFrameSource:
+    """Decodes a background video ahead of the compositor on its own thread, looping back to the start at the end.
+
+    Frames are decoded straight into a bounded ring of preallocated buffers, so decoding the next frames overlaps
+    with compositing and encoding the current one without allocating per frame. A frame returned by read() stays
+    valid until the next call to read(), copy it if it has to outlive that.
+    Parameters
+    ----------
+    video_path : str
+        Path to the background video
+    start_frame : int, optional
+        Frame to start decoding from, by default 0
+    buffer_size : int, optional
+        Number of frames that can be decoded ahead, by default 8
+    loop : bool, optional
+        Whether to continue from the first frame when the video ends, by default True
+    """
+
+    def __init__(self, video_path, start_frame=0, buffer_size=8, loop=True):
+        if buffer_size < 2:
+            raise ValueError("buffer_size must be at least 2, one frame is held by the consumer while the next is decoded")
+        self.video_path = video_path
+        self.loop = loop
+        self.loops = 0
+        self._cap = cv2.VideoCapture(video_path)
+        if not self._cap.isOpened():
+            raise FileNotFoundError(f"Could not open background video {video_path}")
+        if start_frame:
+            self._cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+        self.width = int(self._cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self._cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self._slots = [np.empty((self.height, self.width, 3), dtype=np.uint8) for _ in range(buffer_size)]
+        self._free = queue.Queue()
+        for slot in range(buffer_size):
+            self._free.put(slot)
+        # Slot indices in decode order, then None once a non-looping video ends or an exception if decoding failed
+        self._ready = queue.Queue()
+        self._held = None
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._decode, name="background-decoder", daemon=True)
+        self._thread.start()
+
+    def _read_into(self, slot):
+        ret, _ = self._cap.read(image=self._slots[slot])
+        return ret
+
+    def _decode(self):
+        try:
+            while True:
+                slot = self._free.get()
+                if slot is None or self._stopping.is_set():
+                    return
+                if not self._read_into(slot):
+                    if not self.loop:
+                        self._ready.put(None)
+                        return
+                    # The proxy has a keyframe on frame 0, so the rewind only costs one keyframe decode
+                    self._cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                    self.loops += 1
+                    logger.debug(f"Background video {self.video_path} ended, looping back to the start")
+                    if not self._read_into(slot):
+                        # An empty video would otherwise rewind forever
+                        self._ready.put(None)
+                        return
+                self._ready.put(slot)
+        except Exception as e:
+            self._ready.put(e)
+        finally:
+            self._cap.release()
+
+    def read(self):
+        """Returns the next frame, or None if the video has ended and the source does not loop"""
+        if self._held is not None:
+            self._free.put(self._held)
+            self._held = None
+        item = self._ready.get()
+        if item is None or isinstance(item, Exception):
+            # Leave the marker for any later read
+            self._ready.put(item)
+            if item is None:
+                return None
+            raise RuntimeError(f"Decoding background video {self.video_path} failed") from item
+        self._held = item
+        return self._slots[item]
+
+    def close(self):
+        """Stops the decoder thread and releases the video"""
+        self._stopping.set()
+        self._free.put(None)
+        self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,163 @@
+import logging
+import re
+from functools import lru_cache
+
+from PIL import Image, ImageDraw, ImageFont
+
+logger = logging.getLogger(__name__)
+
+# Comments by this account are left out by both card sources
+AUTOMOD_AUTHOR = "AutoModerator"
+
+# Tried in order, the first that loads is used, Pillow's bundled font is the last resort
+FONT_FILES = {
+    "regular": ["DejaVuSans.ttf", "Arial.ttf", "LiberationSans-Regular.ttf"],
+    "bold": ["DejaVuSans-Bold.ttf", "Arial Bold.ttf", "LiberationSans-Bold.ttf"],
+}
+
+LIGHT_THEME = {"background": (255, 255, 255, 255), "text": (26, 26, 27, 255), "meta": (120, 124, 126, 255), "upvote": (255, 69, 0, 255)}
+DARK_THEME = {"background": (26, 26, 27, 255), "text": (215, 218, 220, 255), "meta": (129, 131, 132, 255), "upvote": (255, 69, 0, 255)}
+
+_MARKDOWN_PATTERNS = [
+    (re.compile(r"!?\[([^\]]*)\]\([^)]*\)"), r"\1"),  # Links and images keep their text
+    (re.compile(r"(\*\*|__|~~|\*|_|`)(.+?)\1"), r"\2"),  # Emphasis, strikethrough and code
+    (re.compile(r"^\s{0,3}(#{1,6}|>+|[-*+])\s+", re.MULTILINE), ""),  # Headings, quotes and bullets
+    (re.compile(r"&amp;"), "&"),
+    (re.compile(r"&lt;"), "<"),
+    (re.compile(r"&gt;"), ">"),
+    (re.compile(r"&#x200B;"), ""),
+]
+
+
+def strip_markdown(text):
+    """Reduces Reddit markdown to the plain text a reader would see"""
+    for pattern, replacement in _MARKDOWN_PATTERNS:
+        text = pattern.sub(replacement, text)
+    return re.sub(r"\n{3,}", "\n\n", text).strip()
+
+
+@lru_cache(maxsize=None)
+def load_font(weight, size):
+    """Returns a cached font of the given weight ("regular" or "bold") and pixel size"""
+    for font_file in FONT_FILES[weight]:
+        try:
+            return ImageFont.truetype(font_file, size)
+        except OSError:
+            continue
+    logger.warning(f"No {weight} TrueType font found, using Pillow's default font")
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:
+        # Pillow before 10.1 only has the fixed size bitmap font
+        return ImageFont.load_default()
+
+
+@lru_cache(maxsize=None)
+def upvote_icon(size, colour):
+    """Returns a cached RGBA upvote arrow"""
+    icon = Image.new("RGBA", (size, size), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(icon)
+    half, stem = size / 2, size / 4
+    draw.polygon(
+        [(half, 0), (size - 1, half), (half + stem, half), (half + stem, size - 1), (half - stem, size - 1), (half - stem, half), (0, half)],
+        fill=colour,
+    )
+    return icon
+
+
+def format_score(score):
+    """Formats a score the way Reddit does, e.g. 12345 becomes 12.3k"""
+    if abs(score) >= 1000:
+        return f"{score / 1000:.1f}k"
+    return str(score)
+
+
+class CardRenderer:
+    """Draws Reddit-like post and comment cards as RGBA images, with no browser involved
+    Parameters
+    ----------
+    width : int, optional
+        Width of every card in pixels, by default 900
+    font_size : int, optional
+        Size of the body text, the title and metadata are scaled from it, by default 30
+    theme : dict, optional
+        Colours of the card, by default DARK_THEME
+    """
+
+    def __init__(self, width=900, font_size=30, theme=DARK_THEME, padding=None, corner_radius=None):
+        self.width = width
+        self.font_size = font_size
+        self.theme = theme
+        self.padding = padding if padding is not None else font_size
+        self.corner_radius = corner_radius if corner_radius is not None else font_size // 2
+        self.body_font = load_font("regular", font_size)
+        self.title_font = load_font("bold", round(font_size * 1.3))
+        self.meta_font = load_font("regular", round(font_size * 0.75))
+        self.line_spacing = round(font_size * 0.35)
+
+    def wrap(self, text, font, max_width):
+        """Splits text into lines no wider than max_width, keeping paragraph breaks"""
+        # Each word is measured once rather than re-measuring the line as it grows
+        space_width = font.getlength(" ")
+        lines = []
+        for paragraph in text.split("\n"):
+            words = paragraph.split()
+            if not words:
+                lines.append("")
+                continue
+            line, line_width = [words[0]], font.getlength(words[0])
+            for word in words[1:]:
+                word_width = font.getlength(word)
+                if line_width + space_width + word_width <= max_width:
+                    line.append(word)
+                    line_width += space_width + word_width
+                else:
+                    lines.append(" ".join(line))
+                    line, line_width = [word], word_width
+            lines.append(" ".join(line))
+        return lines
+
+    def _line_height(self, font):
+        ascent, descent = font.getmetrics()
+        return ascent + descent + self.line_spacing
+
+    def render(self, meta, body="", title=None, score=None):
+        """Renders one card: a metadata line, an optional bold title, the body text and an optional score"""
+        inner_width = self.width - 2 * self.padding
+        blocks = [(self.meta_font, self.theme["meta"], [meta])]
+        if title:
+            blocks.append((self.title_font, self.theme["text"], self.wrap(title, self.title_font, inner_width)))
+        if body:
+            blocks.append((self.body_font, self.theme["text"], self.wrap(body, self.body_font, inner_width)))
+        icon_size = round(self.font_size * 0.8)
+        height = self.padding * 2 + sum(self._line_height(font) * len(lines) for font, _, lines in blocks)
+        if score is not None:
+            height += icon_size + self.line_spacing
+
+        card = Image.new("RGBA", (self.width, height), (0, 0, 0, 0))
+        draw = ImageDraw.Draw(card)
+        draw.rounded_rectangle([0, 0, self.width - 1, height - 1], radius=self.corner_radius, fill=self.theme["background"])
+        y = self.padding
+        for font, colour, lines in blocks:
+            for line in lines:
+                draw.text((self.padding, y), line, font=font, fill=colour)
+                y += self._line_height(font)
+        if score is not None:
+            y += self.line_spacing
+            card.alpha_composite(upvote_icon(icon_size, self.theme["upvote"]), (self.padding, y))
+            draw.text((self.padding + icon_size + self.line_spacing, y), format_score(score), font=self.meta_font, fill=self.theme["meta"])
+        return card
+
+    def render_post(self, subreddit, author, title, body="", score=None, num_comments=None):
+        meta = f"r/{subreddit} • Posted by u/{author}"
+        if num_comments is not None:
+            meta += f" • {num_comments} comments"
+        return self.render(meta, strip_markdown(body), title=title, score=score)
+
+    def render_comment(self, author, body, score=None):
+        return self.render(f"u/{author}", strip_markdown(body), score=score)
+
+
+def save_card(card, path):
+    """Saves a card as an RGBA PNG, favouring speed over file size since the cards are only read back once"""
+    card.save(path, format="PNG", compress_level=1)
@@ -0,0 +1,84 @@
+import logging
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class OverlayCompositor:
+    """Alpha blends a PNG into video frames of a fixed size.
+
+    Everything that only depends on the PNG (placement, the premultiplied colour and the alpha weights) is
+    computed once, and only the bounding box of the non-transparent pixels is touched per frame. Runs of fully
+    opaque rows are copied straight in, and the remaining rows are blended in place using preallocated scratch
+    buffers, so nothing is allocated per frame.
+    """
+
+    def __init__(self, png, frame_width, frame_height, x=None, y=None):
+        if png.ndim == 2:
+            png = cv2.cvtColor(png, cv2.COLOR_GRAY2BGR)
+        if png.shape[2] == 4:
+            alpha = png[:, :, 3]
+        else:
+            alpha = np.full(png.shape[:2], 255, dtype=np.uint8)
+        png_height, png_width = alpha.shape
+        # Centre the PNG by default, matching the original placement
+        self.x = int((frame_width - png_width) / 2) if x is None else x
+        self.y = int((frame_height - png_height) / 2) if y is None else y
+
+        # Clip the PNG to the frame, then shrink to the bounding box of the pixels that are not fully transparent
+        left, top = max(self.x, 0), max(self.y, 0)
+        right, bottom = min(self.x + png_width, frame_width), min(self.y + png_height, frame_height)
+        visible_alpha = alpha[top - self.y : bottom - self.y, left - self.x : right - self.x]
+        rows = np.flatnonzero(visible_alpha.any(axis=1)) if visible_alpha.size else []
+        cols = np.flatnonzero(visible_alpha.any(axis=0)) if visible_alpha.size else []
+        if len(rows) == 0 or len(cols) == 0:
+            logger.warning("Overlay has no visible pixels inside the frame")
+            self.region = None
+            return
+        top, bottom = top + rows[0], top + rows[-1] + 1
+        left, right = left + cols[0], left + cols[-1] + 1
+        self.region = (slice(top, bottom), slice(left, right))
+
+        png_region = (slice(top - self.y, bottom - self.y), slice(left - self.x, right - self.x))
+        region_alpha = alpha[png_region]
+        region_rgb = np.ascontiguousarray(png[png_region][:, :, :3])
+
+        # Split the region into bands of rows that are either fully opaque (copied) or need blending
+        self._copy_bands = []
+        self._blend_bands = []
+        opaque_rows = (region_alpha == 255).all(axis=1)
+        band_edges = np.flatnonzero(np.diff(opaque_rows.astype(np.int8))) + 1
+        for start, stop in zip(np.concatenate([[0], band_edges]), np.concatenate([band_edges, [len(opaque_rows)]])):
+            rows = slice(int(start), int(stop))
+            frame_rows = slice(top + int(start), top + int(stop))
+            if opaque_rows[start]:
+                self._copy_bands.append((frame_rows, region_rgb[rows]))
+            else:
+                weights = region_alpha[rows].astype(np.float32)[..., np.newaxis] / 255.0
+                # The 0.5 rounds to the nearest integer when the blended result is truncated back to uint8
+                premultiplied = region_rgb[rows].astype(np.float32) * weights + 0.5
+                scratch = np.empty(premultiplied.shape, dtype=np.float32)
+                self._blend_bands.append((frame_rows, 1.0 - weights, premultiplied, scratch))
+
+    @classmethod
+    def from_file(cls, png_path, frame_width, frame_height):
+        png = cv2.imread(png_path, cv2.IMREAD_UNCHANGED)
+        if png is None:
+            raise FileNotFoundError(f"Could not read overlay image {png_path}")
+        return cls(png, frame_width, frame_height)
+
+    def apply(self, frame):
+        """Blends the overlay into the frame in place and returns the frame"""
+        if self.region is None:
+            return frame
+        columns = self.region[1]
+        for rows, rgb in self._copy_bands:
+            frame[rows, columns, :3] = rgb
+        for rows, inverse_alpha, premultiplied, scratch in self._blend_bands:
+            roi = frame[rows, columns, :3]
+            np.multiply(roi, inverse_alpha, out=scratch)
+            np.add(scratch, premultiplied, out=scratch)
+            np.copyto(roi, scratch, casting="unsafe")
+        return frame
@@ -0,0 +1,103 @@
+import logging
+from dataclasses import dataclass
+from typing import Any, List, Tuple
+
+from viddit.core.card_renderer import AUTOMOD_AUTHOR
+from viddit.core.page_readiness import COMMENT_SELECTORS, NEW_LAYOUT, OLD_LAYOUT
+
+logger = logging.getLogger(__name__)
+
+# Describes every candidate comment in one round trip. Each entry holds the element itself, so it can still be
+# screenshotted, its own text (not its replies'), its rect in page coordinates, its nesting depth and whether it
+# is distinguished as a moderator comment.
+_EXTRACT_COMMENTS_SCRIPT = """
+const layout = arguments[0];
+const selector = arguments[1];
+// Only the outermost matches of textSelector, e.g. the rtjson div nested in the comment slot would repeat its text
+const ownText = (comment, textSelector) => Array.from(comment.querySelectorAll(textSelector))
+    .filter((node) => node.closest(selector) === comment)
+    .filter((node) => {
+        const outer = node.parentElement ? node.parentElement.closest(textSelector) : null;
+        return outer === null || !comment.contains(outer);
+    })
+    .map((node) => node.innerText.trim())
+    .filter((text) => text.length > 0)
+    .join("\\n");
+return Array.from(document.querySelectorAll(selector), (comment, index) => {
+    const rect = comment.getBoundingClientRect();
+    const entry = {
+        index: index,
+        element: comment,
+        rect: [rect.left + window.scrollX, rect.top + window.scrollY, rect.width, rect.height],
+    };
+    if (layout === "new") {
+        entry.text = ownText(comment, "[slot='comment'], [id$='-post-rtjson-content']");
+        entry.depth = parseInt(comment.getAttribute("depth") || "0", 10);
+        entry.author = comment.getAttribute("author") || "";
+        entry.is_mod = comment.getAttribute("distinguished") === "moderator"
+            || Array.from(comment.querySelectorAll("icon-mod")).some((icon) => icon.closest(selector) === comment);
+    } else {
+        entry.text = ownText(comment, ".RichTextJSON-root");
+        // The old layout indents replies with padding rather than nesting them
+        entry.depth = parseFloat(comment.style.paddingLeft || "0");
+        const author = comment.querySelector("[data-testid='comment_author_link']");
+        entry.author = author ? author.innerText.trim() : "";
+        entry.is_mod = comment.querySelector(".icon.icon-lock_fill") !== null;
+    }
+    return entry;
+});
+"""
+
+
+@dataclass
+class CommentInfo:
+    """A comment as it appears on the page"""
+
+    index: int  # Position on the page
+    element: Any  # The WebElement, for screenshots
+    text: str
+    rect: Tuple[float, float, float, float]  # x, y, width, height in page coordinates
+    depth: int  # 0 for top level comments
+    author: str
+    is_mod: bool
+    is_automod: bool
+
+    @property
+    def top_level(self) -> bool:
+        return self.depth == 0
+
+
+def extract_comments(driver, layout) -> List[CommentInfo]:
+    """Returns every comment on the page from a single script call, for either post layout"""
+    if layout not in (OLD_LAYOUT, NEW_LAYOUT):
+        raise ValueError(f"layout must be '{OLD_LAYOUT}' or '{NEW_LAYOUT}'")
+    entries = driver.execute_script(_EXTRACT_COMMENTS_SCRIPT, layout, COMMENT_SELECTORS[layout]) or []
+    if layout == OLD_LAYOUT and entries:
+        # Turn indentation into depth, the shallowest comments are top level
+        indents = sorted({entry["depth"] for entry in entries})
+        for entry in entries:
+            entry["depth"] = indents.index(entry["depth"])
+    return [
+        CommentInfo(
+            index=entry["index"],
+            element=entry["element"],
+            text=entry["text"],
+            rect=tuple(entry["rect"]),
+            depth=int(entry["depth"]),
+            author=entry["author"],
+            is_mod=bool(entry["is_mod"]),
+            is_automod=entry["author"] == AUTOMOD_AUTHOR,
+        )
+        for entry in entries
+    ]
+
+
+def select_comments(comments, no_comments, skip_mod=True, skip_automod=True):
+    """Picks the first no_comments top level comments with text, leaving out moderator and AutoModerator comments"""
+    selected = [
+        comment
+        for comment in comments
+        if comment.top_level and comment.text and not (skip_mod and comment.is_mod) and not (skip_automod and comment.is_automod)
+    ]
+    logger.info(f"Selected {min(len(selected), no_comments)} of {len(comments)} comments")
+    return selected[:no_comments]
@@ -0,0 +1,153 @@
+import logging
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+
+logger = logging.getLogger(__name__)
+
+
+def create_chrome_driver(path_to_driver, headless=True, operating_sys="linux"):
+    """Starts a Chrome instance with the options the scraper runs with"""
+    options = Options()
+    if operating_sys == "linux":
+        options.add_argument("--disable-dev-shm-usage")
+        options.add_argument("--remote-debugging-port=0")
+        options.add_argument(
+            "--no-sandbox"
+        )  # Discouraged - It is way better to run the Docker container as a non-root user. Problem for another day.
+        options.add_argument("--start-maximized")
+        options.add_argument("--disable-infobars")
+        options.add_argument("--disable-extensions")
+    if headless:
+        if operating_sys == "windows":
+            options.add_argument("--disable-gpu")
+        options.add_argument("--headless")
+    return webdriver.Chrome(path_to_driver, options=options)
+
+
+class _PooledDriver:
+    def __init__(self, driver):
+        self.driver = driver
+        self.pages = 0
+
+
+class WebDriverPool:
+    """A fixed number of warmed up WebDrivers handed out one caller at a time.
+
+    Each driver is warmed up once when it is created, checked before it is handed out and replaced if it has
+    died, and recycled after max_pages_per_driver uses to contain the browser's memory growth.
+    Parameters
+    ----------
+    driver_factory : callable
+        Creates a new driver, e.g. a partial of create_chrome_driver
+    size : int, optional
+        Number of drivers, by default 1
+    warmup : callable, optional
+        Called with each new driver before it is first handed out, e.g. to accept cookies
+    max_pages_per_driver : int, optional
+        Uses after which a driver is quit and replaced, by default 50, 0 never recycles
+    """
+
+    def __init__(self, driver_factory, size=1, warmup=None, max_pages_per_driver=50):
+        if size < 1:
+            raise ValueError("size must be at least 1")
+        self.driver_factory = driver_factory
+        self.size = size
+        self.warmup = warmup
+        self.max_pages_per_driver = max_pages_per_driver
+        self.drivers_created = 0
+        self.drivers_recycled = 0
+        self._lock = threading.Lock()
+        self._idle = queue.Queue()
+        self._all = []
+        self._closed = False
+        # Browsers take seconds to start and warm up, start them all at once
+        with ThreadPoolExecutor(max_workers=size) as executor:
+            for pooled in executor.map(lambda _: self._new_driver(), range(size)):
+                self._idle.put(pooled)
+
+    def _new_driver(self):
+        driver = self.driver_factory()
+        try:
+            if self.warmup is not None:
+                self.warmup(driver)
+        except Exception:
+            _quit_driver(driver)
+            raise
+        pooled = _PooledDriver(driver)
+        with self._lock:
+            self.drivers_created += 1
+            self._all.append(pooled)
+        return pooled
+
+    def _discard(self, pooled):
+        with self._lock:
+            if pooled in self._all:
+                self._all.remove(pooled)
+        _quit_driver(pooled.driver)
+
+    def _replace(self, pooled, reason):
+        logger.info(f"Replacing WebDriver after {pooled.pages} pages: {reason}")
+        self._discard(pooled)
+        return self._new_driver()
+
+    @staticmethod
+    def is_healthy(driver):
+        """Whether the browser behind a driver still responds"""
+        try:
+            driver.execute_script("return 1")
+            return True
+        except Exception:
+            return False
+
+    @contextmanager
+    def acquire(self, timeout=None):
+        """Lends out an idle driver for the duration of the with block, waiting for one if they are all in use"""
+        if self._closed:
+            raise RuntimeError("The WebDriver pool is closed")
+        pooled = self._idle.get(timeout=timeout)
+        try:
+            if not self.is_healthy(pooled.driver):
+                pooled = self._replace(pooled, "driver stopped responding")
+        except Exception:
+            # Could not start a replacement, give the slot back so the next acquire tries again
+            self._idle.put(pooled)
+            raise
+        try:
+            yield pooled.driver
+        finally:
+            pooled.pages += 1
+            try:
+                if self.max_pages_per_driver and pooled.pages >= self.max_pages_per_driver:
+                    with self._lock:
+                        self.drivers_recycled += 1
+                    pooled = self._replace(pooled, "page limit reached")
+            except Exception as e:
+                # The quit driver goes back in its slot, the next acquire finds it unresponsive and tries again
+                logger.error(f"Could not start a replacement WebDriver: {e}")
+            self._idle.put(pooled)
+
+    def close(self):
+        """Quits every driver, including any still lent out"""
+        self._closed = True
+        with self._lock:
+            pooled_drivers, self._all = self._all, []
+        for pooled in pooled_drivers:
+            _quit_driver(pooled.driver)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def _quit_driver(driver):
+    try:
+        driver.quit()
+    except Exception as e:
+        logger.debug(f"Error quitting WebDriver: {e}")
@@ -0,0 +1,265 @@
+"""Finds the fastest encoder settings that meet a size and quality target and saves them for the renderer.
+
+A short sample of the background with a card overlaid is rendered losslessly, re-encoded with every
+combination of preset, CRF and thread count, and each candidate is scored against the lossless reference
+with ffmpeg's SSIM and PSNR filters. Run it once per machine, then run viddit with --tuned-encoder to use the result.
+
+    viddit-tune-encoder --background background.mp4 --card card.png --max-bitrate-kbps 8000 --min-ssim 0.97
+"""
+import argparse
+import logging
+import math
+import os
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from typing import List, Optional
+
+import cv2
+
+from viddit.core.background import get_background_proxy, get_video_properties
+from viddit.core.compositor import OverlayCompositor
+from viddit.core.ffmpeg_writer import ENCODER_SETTINGS_PATH, FFmpegWriter, save_encoder_settings, video_encoder_args
+from viddit.utils.ffmpeg_utils import run_ffmpeg
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PRESETS = ["ultrafast", "superfast", "veryfast", "faster", "fast", "medium"]
+DEFAULT_CRFS = [18, 21, 23, 26, 28]
+
+
+@dataclass
+class EncoderCandidate:
+    """One encoder configuration and how it did on the sample"""
+
+    codec: str
+    preset: str
+    crf: int
+    threads: Optional[int]
+    encode_fps: float = 0.0
+    bitrate_kbps: float = 0.0
+    ssim: float = 0.0
+    psnr: float = 0.0
+
+    @property
+    def settings(self):
+        settings = {"codec": self.codec, "preset": self.preset, "crf": self.crf}
+        if self.threads:
+            settings["threads"] = self.threads
+        return settings
+
+
+def render_reference_sample(background_path, output_path, duration=5, png_path=None, output_size=None, start_time=0):
+    """Renders a lossless sample of the background, with the card overlaid if given, returning (fps, num_frames)"""
+    if output_size is not None:
+        background_path = get_background_proxy(background_path, output_size=output_size)
+    fps, width, height, frame_count = get_video_properties(background_path)
+    start_frame = min(int(start_time * fps), max(frame_count - 1, 0))
+    num_frames = min(int(duration * fps), frame_count - start_frame)
+    compositor = OverlayCompositor.from_file(png_path, width, height) if png_path else None
+    cap = cv2.VideoCapture(background_path)
+    cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+    try:
+        # CRF 0 is lossless, so the reference only differs from the render by the candidate's own losses
+        with FFmpegWriter(output_path, width, height, fps, preset="ultrafast", crf=0) as writer:
+            for _ in range(num_frames):
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                writer.write_frame(compositor.apply(frame) if compositor else frame)
+    finally:
+        cap.release()
+    return fps, writer.frames_written
+
+
+def _filter_path(path):
+    # Filter options are ':' separated and quoted with single quotes
+    return "'" + path.replace("\\", "/").replace(":", "\\:").replace("'", "'\\''") + "'"
+
+
+def parse_ssim_stats(path):
+    """Returns the mean of the per-frame "All" SSIM values in an ssim filter stats file"""
+    values = []
+    with open(path) as f:
+        for line in f:
+            for field in line.split():
+                if field.startswith("All:"):
+                    values.append(float(field[len("All:") :]))
+    if not values:
+        raise ValueError(f"No SSIM values in {path}")
+    return sum(values) / len(values)
+
+
+def parse_psnr_stats(path):
+    """Returns the PSNR of the mean per-frame MSE in a psnr filter stats file, the same average ffmpeg reports"""
+    values = []
+    with open(path) as f:
+        for line in f:
+            for field in line.split():
+                if field.startswith("mse_avg:"):
+                    values.append(float(field[len("mse_avg:") :]))
+    if not values:
+        raise ValueError(f"No PSNR values in {path}")
+    mean_mse = sum(values) / len(values)
+    return math.inf if mean_mse == 0 else 10 * math.log10(255**2 / mean_mse)
+
+
+def measure_quality(distorted_path, reference_path, work_dir):
+    """Scores an encode against the reference, returning (ssim, psnr), both filters run in one decode"""
+    ssim_path = os.path.join(work_dir, "ssim.log")
+    psnr_path = os.path.join(work_dir, "psnr.log")
+    filters = (
+        "[0:v]split[d0][d1];[1:v]split[r0][r1];"
+        f"[d0][r0]ssim=stats_file={_filter_path(ssim_path)}[ssim];"
+        f"[d1][r1]psnr=stats_file={_filter_path(psnr_path)}[psnr]"
+    )
+    run_ffmpeg(["-i", distorted_path, "-i", reference_path, "-filter_complex", filters, "-map", "[ssim]", "-f", "null", "-", "-map", "[psnr]", "-f", "null", "-"])
+    return parse_ssim_stats(ssim_path), parse_psnr_stats(psnr_path)
+
+
+def evaluate_candidate(candidate, reference_path, fps, num_frames, work_dir):
+    """Encodes the reference with the candidate's settings and fills in its speed, bitrate and quality"""
+    output_path = os.path.join(work_dir, "candidate.mp4")
+    start = time.perf_counter()
+    run_ffmpeg(["-i", reference_path, "-an"] + video_encoder_args(candidate.codec, candidate.preset, candidate.crf, candidate.threads) + [output_path])
+    encode_time = time.perf_counter() - start
+    candidate.encode_fps = round(num_frames / encode_time, 2)
+    candidate.bitrate_kbps = round(os.path.getsize(output_path) * 8 / 1000 / (num_frames / fps), 1)
+    ssim, psnr = measure_quality(output_path, reference_path, work_dir)
+    candidate.ssim, candidate.psnr = round(ssim, 5), round(psnr, 3)
+    os.remove(output_path)
+    return candidate
+
+
+def select_candidate(candidates, max_bitrate_kbps=None, min_ssim=None, min_psnr=None):
+    """Returns the fastest candidate within the bitrate cap and above the quality floors, or None if none qualify"""
+    eligible = [
+        candidate
+        for candidate in candidates
+        if (max_bitrate_kbps is None or candidate.bitrate_kbps <= max_bitrate_kbps)
+        and (min_ssim is None or candidate.ssim >= min_ssim)
+        and (min_psnr is None or candidate.psnr >= min_psnr)
+    ]
+    if not eligible:
+        return None
+    # Ties go to the smaller file
+    return max(eligible, key=lambda candidate: (candidate.encode_fps, -candidate.bitrate_kbps))
+
+
+def tune_encoder(
+    background_path,
+    png_path=None,
+    duration=5,
+    output_size=None,
+    presets=DEFAULT_PRESETS,
+    crfs=DEFAULT_CRFS,
+    thread_counts=None,
+    codec="libx264",
+    max_bitrate_kbps=None,
+    min_ssim=0.97,
+    min_psnr=None,
+    settings_path=ENCODER_SETTINGS_PATH,
+):
+    """Measures every combination of preset, CRF and thread count on a sample and saves the fastest that meets the targets
+    Parameters
+    ----------
+    background_path : str
+        The background video to sample
+    png_path : str, optional
+        A card to overlay on the sample, so the sample looks like a real render
+    duration : float, optional
+        Seconds of video to sample, by default 5
+    output_size : tuple, optional
+        (width, height) to render the sample at, by default the background's own resolution
+    thread_counts : list, optional
+        Encoder thread counts to try, by default one thread and one per core
+    max_bitrate_kbps : float, optional
+        The largest acceptable average bitrate, by default no limit
+    min_ssim : float, optional
+        The lowest acceptable mean SSIM against the lossless sample, by default 0.97
+    min_psnr : float, optional
+        The lowest acceptable PSNR in dB, by default no limit
+    settings_path : str, optional
+        Where to save the chosen settings, None to only return them
+    Returns
+    -------
+    tuple
+        (chosen, candidates) where chosen is the selected EncoderCandidate, or None if no candidate met the targets
+    """
+    if thread_counts is None:
+        thread_counts = sorted({1, os.cpu_count() or 1})
+    with tempfile.TemporaryDirectory(prefix="viddit_tune_") as work_dir:
+        reference_path = os.path.join(work_dir, "reference.mp4")
+        fps, num_frames = render_reference_sample(background_path, reference_path, duration, png_path, output_size)
+        logger.info(f"Rendered a {num_frames} frame reference sample, trying {len(presets) * len(crfs) * len(thread_counts)} encoder settings")
+        candidates = []
+        for preset in presets:
+            for crf in crfs:
+                for threads in thread_counts:
+                    candidate = evaluate_candidate(EncoderCandidate(codec, preset, crf, threads), reference_path, fps, num_frames, work_dir)
+                    logger.info(
+                        f"{preset:>9} crf {crf:>2} threads {threads}: {candidate.encode_fps:7.1f} fps, "
+                        f"{candidate.bitrate_kbps:8.1f} kbps, SSIM {candidate.ssim:.4f}, PSNR {candidate.psnr:.2f} dB"
+                    )
+                    candidates.append(candidate)
+
+    chosen = select_candidate(candidates, max_bitrate_kbps, min_ssim, min_psnr)
+    if chosen is None:
+        logger.warning("No encoder settings met the size and quality targets, nothing was saved")
+        return None, candidates
+    logger.info(f"Chose {chosen.settings}: {chosen.encode_fps} fps, {chosen.bitrate_kbps} kbps, SSIM {chosen.ssim}, PSNR {chosen.psnr} dB")
+    if settings_path:
+        save_encoder_settings(
+            dict(
+                chosen.settings,
+                targets={"max_bitrate_kbps": max_bitrate_kbps, "min_ssim": min_ssim, "min_psnr": min_psnr},
+                sample={"background": os.path.abspath(background_path), "png": png_path, "frames": num_frames, "fps": fps},
+                candidates=[asdict(candidate) for candidate in candidates],
+            ),
+            settings_path,
+        )
+    return chosen, candidates
+
+
+def _parse_size(value):
+    width, height = value.lower().split("x")
+    return int(width), int(height)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--background", required=True, help="Background video to sample")
+    parser.add_argument("--card", help="A card PNG to overlay on the sample")
+    parser.add_argument("--duration", type=float, default=5, help="Seconds of video to sample")
+    parser.add_argument("--size", type=_parse_size, help="Resolution to sample at, e.g. 1080x1920, by default the background's own")
+    parser.add_argument("--codec", default="libx264")
+    parser.add_argument("--presets", nargs="+", default=DEFAULT_PRESETS)
+    parser.add_argument("--crfs", type=int, nargs="+", default=DEFAULT_CRFS)
+    parser.add_argument("--threads", type=int, nargs="+", help="Encoder thread counts to try, by default 1 and the core count")
+    parser.add_argument("--max-bitrate-kbps", type=float, help="Largest acceptable average bitrate")
+    parser.add_argument("--min-ssim", type=float, default=0.97, help="Lowest acceptable mean SSIM")
+    parser.add_argument("--min-psnr", type=float, help="Lowest acceptable PSNR in dB")
+    parser.add_argument("--output", default=ENCODER_SETTINGS_PATH, help="Where to save the chosen settings")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    chosen, _ = tune_encoder(
+        args.background,
+        png_path=args.card,
+        duration=args.duration,
+        output_size=args.size,
+        presets=args.presets,
+        crfs=args.crfs,
+        thread_counts=args.threads,
+        codec=args.codec,
+        max_bitrate_kbps=args.max_bitrate_kbps,
+        min_ssim=args.min_ssim,
+        min_psnr=args.min_psnr,
+        settings_path=args.output,
+    )
+    if chosen is None:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
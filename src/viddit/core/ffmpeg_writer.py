@@ -0,0 +1,247 @@
+import json
+import logging
+import os
+import subprocess
+import tempfile
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+from viddit.utils.ffmpeg_utils import ffmpeg_command
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_PROFILE_NAME = "default"
+# Written by the encoder tuner (viddit-tune-encoder), only used by renders that are passed load_encoder_settings()
+ENCODER_SETTINGS_PATH = os.path.join(os.path.expanduser("~"), ".config", "viddit", "encoder_settings.json")
+ENCODER_SETTINGS_KEYS = ["codec", "preset", "crf", "threads"]
+
+
+@dataclass
+class OutputProfile:
+    """One encoded variant of a rendered video.
+
+    A crf or preset set on the profile wins over the render's encoder settings, e.g. tuned ones, None uses them.
+    """
+
+    name: str
+    width: Optional[int] = None  # None keeps the render resolution
+    height: Optional[int] = None
+    crf: Optional[int] = None
+    preset: Optional[str] = None
+    max_bitrate: Optional[str] = None  # An ffmpeg rate, e.g. "500k" or "1.5M", caps the bitrate of low bandwidth variants
+
+
+OUTPUT_PROFILES = {
+    "shorts": OutputProfile("shorts", 1080, 1920),
+    "tiktok": OutputProfile("tiktok", 720, 1280),
+    "preview": OutputProfile("preview", 360, 640, crf=32, preset="veryfast", max_bitrate="400k"),
+}
+
+
+def load_encoder_settings(path=ENCODER_SETTINGS_PATH):
+    """Returns the saved encoder settings as keyword arguments for the writers, or {} if none have been saved"""
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        saved = json.load(f)
+    settings = {key: saved[key] for key in ENCODER_SETTINGS_KEYS if key in saved}
+    logger.debug(f"Loaded encoder settings {settings} from {path}")
+    return settings
+
+
+def save_encoder_settings(settings, path=ENCODER_SETTINGS_PATH):
+    """Saves encoder settings, along with anything else in the dict such as the measurements behind them"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(settings, f, indent=2)
+    logger.info(f"Saved encoder settings to {path}")
+
+
+def profile_output_path(output_name, profile):
+    """The file a profile's variant is written to, e.g. output.mp4 becomes output_tiktok.mp4"""
+    base, extension = os.path.splitext(output_name)
+    return f"{base}_{profile.name}{extension}"
+
+
+_RATE_UNITS = {"k": 1000, "m": 1000**2, "g": 1000**3}
+
+
+def parse_bitrate(rate):
+    """Converts an ffmpeg rate such as "500k", "1.5M" or "500000" to bits per second"""
+    text = str(rate).strip()
+    multiplier = _RATE_UNITS.get(text[-1:].lower(), 1)
+    if multiplier != 1:
+        text = text[:-1]
+    try:
+        return int(float(text) * multiplier)
+    except ValueError:
+        raise ValueError(f"{rate!r} is not a bitrate, expected e.g. 500k, 1.5M or 500000") from None
+
+
+def video_encoder_args(codec="libx264", preset="medium", crf=23, threads=None, max_bitrate=None):
+    """Returns the ffmpeg output arguments for the video encoder, shared by every ffmpeg based render path"""
+    args = ["-c:v", codec, "-preset", preset, "-crf", crf, "-pix_fmt", "yuv420p"]
+    if max_bitrate:
+        # Capped CRF, the buffer of two seconds worth of bits keeps quality steady within the cap
+        bits_per_second = parse_bitrate(max_bitrate)
+        args += ["-maxrate", bits_per_second, "-bufsize", bits_per_second * 2]
+    if threads:
+        args += ["-threads", threads]
+    return args
+
+
+def fan_out_args(
+    video_pad,
+    audio_map,
+    output_name,
+    output_profiles=None,
+    codec="libx264",
+    preset="medium",
+    crf=23,
+    threads=None,
+    audio_codec="copy",
+    per_output_args=(),
+):
+    """Returns the filters and output arguments that encode one video stream into every output profile.
+
+    The stream is split inside the ffmpeg process and each branch is scaled and given its own encoder, so
+    one decode and compositing pass feeds every variant.
+    Parameters
+    ----------
+    video_pad : str
+        Filtergraph pad of the video to encode, e.g. "[0:v]" or "[v3]"
+    audio_map : str
+        -map argument of the audio to mux, e.g. "1:a" or "[aout]", or None for no audio
+    output_name : str
+        Output path, or the base name of the per-profile paths when output_profiles are given
+    output_profiles : list, optional
+        OutputProfiles to encode, by default a single output at the render resolution
+    per_output_args : tuple, optional
+        Extra arguments repeated for each output, e.g. a frame limit
+    Returns
+    -------
+    tuple
+        (filters, args, output_paths) where output_paths maps profile names to files
+    """
+    pad_name = video_pad.strip("[]")
+    video_map = video_pad if ":" not in pad_name else pad_name
+    if not output_profiles:
+        audio_args = ["-map", audio_map, "-c:a", audio_codec] if audio_map else []
+        args = ["-map", video_map] + audio_args + list(per_output_args) + video_encoder_args(codec, preset, crf, threads)
+        return [], args + ["-movflags", "+faststart", output_name], {DEFAULT_PROFILE_NAME: output_name}
+
+    filters = []
+    audio_maps = [audio_map] * len(output_profiles)
+    if len(output_profiles) > 1:
+        branches = [f"[split{k}]" for k in range(len(output_profiles))]
+        filters.append(f"{video_pad}split={len(output_profiles)}{''.join(branches)}")
+        if audio_map and audio_map.startswith("["):
+            # Filtergraph outputs can only be mapped once, unlike input streams
+            audio_maps = [f"[asplit{k}]" for k in range(len(output_profiles))]
+            filters.append(f"{audio_map}asplit={len(output_profiles)}{''.join(audio_maps)}")
+    else:
+        branches = [video_pad]
+    args = []
+    output_paths = {}
+    for k, (profile, branch, branch_audio_map) in enumerate(zip(output_profiles, branches, audio_maps)):
+        if profile.width and profile.height:
+            filters.append(
+                f"{branch}scale={profile.width}:{profile.height}:force_original_aspect_ratio=increase,"
+                f"crop={profile.width}:{profile.height}[out{k}]"
+            )
+            branch_map = f"[out{k}]"
+        else:
+            branch_map = video_map if branch == video_pad else branch
+        output_path = profile_output_path(output_name, profile)
+        args += ["-map", branch_map] + (["-map", branch_audio_map, "-c:a", audio_codec] if branch_audio_map else []) + list(per_output_args)
+        profile_crf = crf if profile.crf is None else profile.crf
+        args += video_encoder_args(codec, profile.preset or preset, profile_crf, threads, profile.max_bitrate)
+        args += ["-movflags", "+faststart", output_path]
+        output_paths[profile.name] = output_path
+    return filters, args, output_paths
+
+
+class FFmpegWriter:
+    """Streams raw BGR frames into an ffmpeg subprocess so frames never have to be held in memory.
+
+    An already assembled audio track can be muxed in, by default it is copied without re-encoding. With
+    output_profiles every frame is fanned out to one encoder per profile inside the same ffmpeg process.
+    """
+
+    def __init__(
+        self,
+        output_name,
+        width,
+        height,
+        fps,
+        audio_path=None,
+        codec="libx264",
+        preset="medium",
+        crf=23,
+        threads=None,
+        audio_codec="copy",
+        output_profiles=None,
+    ):
+        self.output_name = output_name
+        self.width = width
+        self.height = height
+        self.frame_size = width * height * 3
+        self.frames_written = 0
+
+        args = ["-f", "rawvideo", "-pix_fmt", "bgr24", "-s", f"{width}x{height}", "-r", fps, "-i", "-"]
+        if audio_path:
+            args += ["-i", audio_path]
+        filters, output_args, self.output_paths = fan_out_args(
+            "[0:v]", "1:a" if audio_path else None, output_name, output_profiles, codec, preset, crf, threads, audio_codec
+        )
+        if filters:
+            args += ["-filter_complex", ";".join(filters)]
+        args += output_args
+
+        command = ffmpeg_command(args)
+        logger.debug(f"Starting encoder: {' '.join(command)}")
+        self._stderr = tempfile.TemporaryFile()
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=self._stderr)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def write_frame(self, frame):
+        """Writes a single BGR frame of the writer's size to the encoder"""
+        if frame.shape[0] != self.height or frame.shape[1] != self.width:
+            raise ValueError(f"Frame of shape {frame.shape} does not match writer size {self.width}x{self.height}")
+        try:
+            self.process.stdin.write(np.ascontiguousarray(frame[:, :, :3]).data)
+        except BrokenPipeError:
+            self.process.wait()
+            raise RuntimeError(f"ffmpeg stopped accepting frames: {self._read_stderr()}")
+        self.frames_written += 1
+
+    def close(self):
+        """Flushes the encoder and waits for the output file to be finalised"""
+        self.process.stdin.close()
+        return_code = self.process.wait()
+        stderr = self._read_stderr()
+        self._stderr.close()
+        if return_code != 0:
+            raise RuntimeError(f"ffmpeg exited with code {return_code} while writing {self.output_name}: {stderr}")
+        logger.info(f"Wrote {self.frames_written} frames to {', '.join(self.output_paths.values())}")
+
+    def abort(self):
+        """Stops the encoder without waiting for it to finish the file"""
+        self.process.kill()
+        self.process.wait()
+        self._stderr.close()
+
+    def _read_stderr(self):
+        self._stderr.seek(0)
+        return self._stderr.read().decode(errors="replace").strip()
@@ -0,0 +1,91 @@
+import logging
+import os
+
+from viddit.core.audio import AudioBuffer, assemble_narration
+from viddit.core.ffmpeg_writer import fan_out_args
+from viddit.utils.ffmpeg_utils import run_ffmpeg
+
+logger = logging.getLogger(__name__)
+
+
+def build_filtergraph_args(timeline, output_name, encoder_settings=None, output_profiles=None, narration_path=None):
+    """Turns a timeline into the arguments of a single ffmpeg invocation, returning (args, output_paths).
+
+    Every card is a timed overlay on the background and every narration file is padded to its segment and
+    concatenated, so compositing, audio assembly and encoding all happen inside ffmpeg. The composited video
+    is split into one encoder per output profile. With narration_path an already assembled narration track
+    is used instead of the per segment files.
+    """
+    segments = timeline.segments
+    fps = timeline.fps
+    # Input 0 is the background, seeked to the start of the plan and looped in case the video outlasts it,
+    # then one input per card and per narration
+    args = ["-stream_loop", "-1", "-ss", f"{timeline.background_start_frame / fps:.6f}", "-t", f"{timeline.duration:.6f}", "-i", timeline.background.path]
+    for segment in segments:
+        args += ["-i", segment.png_path]
+    if narration_path:
+        args += ["-i", narration_path]
+    else:
+        for segment in segments:
+            args += ["-i", segment.audio_path]
+
+    filters = []
+    video_label = "0:v"
+    for k, segment in enumerate(segments):
+        start = timeline.segment_start_time(segment)
+        end = start + timeline.segment_duration(segment)
+        filters.append(
+            f"[{video_label}][{k + 1}:v]overlay=x=(main_w-overlay_w)/2:y=(main_h-overlay_h)/2"
+            f":enable='gte(t,{start:.6f})*lt(t,{end:.6f})'[v{k}]"
+        )
+        video_label = f"v{k}"
+    if narration_path:
+        audio_label = f"{len(segments) + 1}:a"
+    else:
+        for k, segment in enumerate(segments):
+            duration = timeline.segment_duration(segment)
+            filters.append(f"[{len(segments) + k + 1}:a]apad=whole_dur={duration:.6f},atrim=duration={duration:.6f}[a{k}]")
+        concat_inputs = "".join(f"[a{k}]" for k in range(len(segments)))
+        filters.append(f"{concat_inputs}concat=n={len(segments)}:v=0:a=1[aout]")
+        audio_label = "[aout]"
+
+    output_filters, output_args, output_paths = fan_out_args(
+        f"[{video_label}]",
+        audio_label,
+        output_name,
+        output_profiles,
+        audio_codec="aac",
+        per_output_args=["-frames:v", timeline.total_frames, "-r", fps],
+        **(encoder_settings or {}),
+    )
+    args += ["-filter_complex", ";".join(filters + output_filters)] + output_args
+    return args, output_paths
+
+
+class FilterGraphBackend:
+    """Executes a timeline as one ffmpeg filter_complex, with no Python frame loop"""
+
+    def __init__(self, encoder_settings=None):
+        self.encoder_settings = encoder_settings or {}
+
+    def render(self, timeline, output_name, output_profiles=None):
+        logger.info(
+            f"Rendering {len(timeline.segments)} segments to {output_name} with a single ffmpeg filtergraph, "
+            f"expected length: {str(timeline.duration)} seconds"
+        )
+        audio_inputs = [segment.audio_path for segment in timeline.segments]
+        if not any(isinstance(audio, AudioBuffer) for audio in audio_inputs) and not all(
+            os.path.splitext(audio)[1].lower() == ".wav" for audio in audio_inputs
+        ):
+            args, output_paths = build_filtergraph_args(timeline, output_name, self.encoder_settings, output_profiles)
+            run_ffmpeg(args)
+            return output_paths
+        # Narration held in memory, or PCM that can be joined without decoding, is assembled up front
+        narration_path = os.path.splitext(output_name)[0] + ".narration.wav"
+        assemble_narration(audio_inputs, [timeline.segment_duration(segment) for segment in timeline.segments], narration_path)
+        try:
+            args, output_paths = build_filtergraph_args(timeline, output_name, self.encoder_settings, output_profiles, narration_path)
+            run_ffmpeg(args)
+            return output_paths
+        finally:
+            os.remove(narration_path)
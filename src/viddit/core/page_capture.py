@@ -0,0 +1,110 @@
+import base64
+import logging
+import math
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Chrome cannot capture arbitrarily tall surfaces, taller spans are captured as several bands
+MAX_CAPTURE_HEIGHT = 8000
+
+# Page coordinates of each element, in one round trip
+_ELEMENT_RECTS_SCRIPT = """
+return Array.from(arguments[0], (element) => {
+    const rect = element.getBoundingClientRect();
+    return [rect.left + window.scrollX, rect.top + window.scrollY, rect.width, rect.height];
+});
+"""
+
+
+def element_rects(driver, elements):
+    """Returns (x, y, width, height) in page coordinates of each element"""
+    return [tuple(rect) for rect in driver.execute_script(_ELEMENT_RECTS_SCRIPT, list(elements))]
+
+
+def capture_region(driver, x, y, width, height):
+    """Captures a region of the page in CSS pixels through the DevTools protocol, including anything outside the viewport"""
+    result = driver.execute_cdp_cmd(
+        "Page.captureScreenshot",
+        {
+            "format": "png",
+            "captureBeyondViewport": True,
+            "fromSurface": True,
+            "clip": {"x": x, "y": y, "width": width, "height": height, "scale": 1},
+        },
+    )
+    image = cv2.imdecode(np.frombuffer(base64.b64decode(result["data"]), dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise RuntimeError("Chrome returned a screenshot that could not be decoded")
+    return image
+
+
+def _pixel_box(rect):
+    # Whole CSS pixels that fully contain the rect
+    x, y, width, height = rect
+    left, top = math.floor(x), math.floor(y)
+    return left, top, math.ceil(x + width) - left, math.ceil(y + height) - top
+
+
+def plan_capture_bands(rects, max_height=MAX_CAPTURE_HEIGHT):
+    """Groups rects into as few vertical bands as possible, each at most max_height tall unless a single rect is taller.
+
+    Returns a list of ((x, y, width, height), [indices of the rects in the band]).
+    """
+    boxes = [_pixel_box(rect) for rect in rects]
+    order = sorted(range(len(boxes)), key=lambda k: boxes[k][1])
+    bands = []
+    for k in order:
+        left, top, width, height = boxes[k]
+        if bands:
+            members = bands[-1]
+            band_top = min(boxes[m][1] for m in members)
+            if top + height - band_top <= max_height:
+                members.append(k)
+                continue
+        bands.append([k])
+
+    planned = []
+    for members in bands:
+        left = min(boxes[m][0] for m in members)
+        top = min(boxes[m][1] for m in members)
+        right = max(boxes[m][0] + boxes[m][2] for m in members)
+        bottom = max(boxes[m][1] + boxes[m][3] for m in members)
+        planned.append(((left, top, right - left, bottom - top), members))
+    return planned
+
+
+def capture_cards(driver, rects, output_paths, max_height=MAX_CAPTURE_HEIGHT):
+    """Saves the region of each rect as a PNG, cutting them all out of as few full-page captures as possible
+    Parameters
+    ----------
+    driver : WebDriver
+        A Chrome driver, which supports DevTools commands
+    rects : list
+        (x, y, width, height) of each card in page coordinates, e.g. from element_rects
+    output_paths : list
+        Where to save each card
+    max_height : int, optional
+        Tallest single capture in CSS pixels, by default MAX_CAPTURE_HEIGHT
+    Returns
+    -------
+    int
+        The number of captures taken
+    """
+    if len(rects) != len(output_paths):
+        raise ValueError(f"Got {len(rects)} rects but {len(output_paths)} output paths")
+    bands = plan_capture_bands(rects, max_height)
+    for (band_x, band_y, band_width, band_height), members in bands:
+        image = capture_region(driver, band_x, band_y, band_width, band_height)
+        # The capture is in device pixels, which differ from CSS pixels on high DPI displays
+        scale = image.shape[0] / band_height
+        for k in members:
+            left, top, width, height = _pixel_box(rects[k])
+            y0, x0 = round((top - band_y) * scale), round((left - band_x) * scale)
+            card = image[y0 : y0 + round(height * scale), x0 : x0 + round(width * scale)]
+            if not cv2.imwrite(output_paths[k], card):
+                raise IOError(f"Could not write card to {output_paths[k]}")
+    logger.debug(f"Cut {len(rects)} cards out of {len(bands)} page captures")
+    return len(bands)
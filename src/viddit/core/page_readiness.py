@@ -0,0 +1,79 @@
+import logging
+
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.support.ui import WebDriverWait
+
+logger = logging.getLogger(__name__)
+
+OLD_LAYOUT = "old"  # The .Post React layout
+NEW_LAYOUT = "new"  # The shreddit-post web component layout
+LAYOUT_SELECTORS = {OLD_LAYOUT: ".Post", NEW_LAYOUT: "shreddit-post"}
+COMMENT_SELECTORS = {OLD_LAYOUT: "div[id^=t1_][tabindex]", NEW_LAYOUT: "shreddit-comment"}
+
+POLL_INTERVAL = 0.05
+
+# Returns [layout, post element] for whichever layout has rendered its post, or null if neither has yet
+_DETECT_LAYOUT_SCRIPT = """
+const selectors = arguments[0];
+for (const [layout, selector] of Object.entries(selectors)) {
+    const post = document.querySelector(selector);
+    if (post) return [layout, post];
+}
+return null;
+"""
+
+# A signature of the position and size of every matching element, it stops changing once their layout has settled
+_LAYOUT_SIGNATURE_SCRIPT = """
+const elements = arguments[0] ? document.querySelectorAll(arguments[0]) : arguments[1];
+return Array.from(elements, (element) => {
+    const rect = element.getBoundingClientRect();
+    return [Math.round(rect.top + window.scrollY), Math.round(rect.left), Math.round(rect.width), Math.round(rect.height)].join(",");
+}).join(";");
+"""
+
+# Centres an element and resolves once the scroll has been painted, in one round trip
+_SCROLL_INTO_VIEW_SCRIPT = """
+const done = arguments[arguments.length - 1];
+arguments[0].scrollIntoView({block: "center", inline: "nearest"});
+requestAnimationFrame(() => requestAnimationFrame(() => done(true)));
+"""
+
+
+def detect_layout(driver, timeout=15):
+    """Waits for either post layout to render, returning (layout, post element) from a single probe per poll"""
+    try:
+        return WebDriverWait(driver, timeout, poll_frequency=POLL_INTERVAL).until(
+            lambda d: d.execute_script(_DETECT_LAYOUT_SCRIPT, LAYOUT_SELECTORS)
+        )
+    except TimeoutException:
+        raise TimeoutException(f"Neither post layout rendered within {timeout} seconds") from None
+
+
+class _LayoutStable:
+    """Wait condition that is met once the signature of a set of elements is non-empty and unchanged across polls"""
+
+    def __init__(self, selector=None, elements=None, stable_polls=2):
+        self.selector = selector
+        self.elements = elements
+        self.stable_polls = stable_polls
+        self._last = None
+        self._unchanged = 0
+
+    def __call__(self, driver):
+        signature = driver.execute_script(_LAYOUT_SIGNATURE_SCRIPT, self.selector, self.elements)
+        if signature and signature == self._last:
+            self._unchanged += 1
+        else:
+            self._unchanged = 0
+        self._last = signature
+        return signature and self._unchanged >= self.stable_polls
+
+
+def wait_for_stable_layout(driver, selector=None, elements=None, timeout=20, stable_polls=2):
+    """Waits until elements matching selector, or the given elements, are attached and have stopped moving"""
+    WebDriverWait(driver, timeout, poll_frequency=POLL_INTERVAL).until(_LayoutStable(selector, elements, stable_polls))
+
+
+def scroll_into_view(driver, element):
+    """Centres an element in the viewport and waits for the scroll to be painted, within the driver's script timeout"""
+    driver.execute_async_script(_SCROLL_INTO_VIEW_SCRIPT, element)
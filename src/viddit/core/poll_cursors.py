@@ -0,0 +1,64 @@
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+POLL_CURSORS_PATH = os.path.join(os.path.expanduser("~"), ".cache", "viddit", "subreddit_cursors.json")
+
+
+class PollCursorStore:
+    """Remembers, per subreddit, which posts incremental polling has already evaluated and their score at the time.
+
+    Each subreddit's cursor holds the fullname of the newest post seen and a snapshot per fullname:
+    {"score", "created_utc", "passed", "final"}. Polling pages back through /new until it reaches a post that has a
+    snapshot or is too old to matter. A post is only marked passed once its video is done, with mark_passed, and
+    final marks posts that fail a filter their score can't change. The store is a JSON file that is rewritten
+    atomically after every update, so it survives between runs.
+    """
+
+    def __init__(self, path=POLL_CURSORS_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._cursors = {}
+        if path and os.path.exists(path):
+            try:
+                with open(path) as f:
+                    self._cursors = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Could not read poll cursors from {path}, starting afresh: {e}")
+
+    def get(self, subreddit_name):
+        """Returns a copy of a subreddit's cursor, empty if it has never been polled"""
+        with self._lock:
+            cursor = self._cursors.get(subreddit_name.lower(), {})
+            return {"newest": cursor.get("newest"), "seen": dict(cursor.get("seen", {}))}
+
+    def update(self, subreddit_name, newest, seen, max_age_seconds=None):
+        """Replaces a subreddit's cursor, dropping snapshots of posts older than max_age_seconds, and saves the store"""
+        if max_age_seconds is not None:
+            cutoff = time.time() - max_age_seconds
+            seen = {fullname: snapshot for fullname, snapshot in seen.items() if snapshot["created_utc"] >= cutoff}
+        with self._lock:
+            self._cursors[subreddit_name.lower()] = {"newest": newest if newest in seen else None, "seen": seen}
+            self._save()
+
+    def mark_passed(self, subreddit_name, fullname):
+        """Records that a post has been made into a video, so polling never offers it again"""
+        with self._lock:
+            snapshot = self._cursors.get(subreddit_name.lower(), {}).get("seen", {}).get(fullname)
+            if snapshot is None:
+                return
+            snapshot["passed"] = True
+            self._save()
+
+    def _save(self):
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        temp_path = self.path + ".partial"
+        with open(temp_path, "w") as f:
+            json.dump(self._cursors, f)
+        os.replace(temp_path, self.path)
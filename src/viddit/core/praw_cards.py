@@ -0,0 +1,119 @@
+import logging
+import os
+import threading
+from collections import deque
+
+from viddit.core.audio import AUDIO_EXTENSIONS
+from viddit.core.card_renderer import AUTOMOD_AUTHOR, CardRenderer, save_card, strip_markdown
+from viddit.core.tts import voice_for_text
+from viddit.core.tts_pipeline import TTSPipeline
+from viddit.utils.file_util import delete_content_of_dir, make_dir_if_not_exists
+from viddit.utils.timing_utils import MAX_PAGE_TIMINGS, PageTimings
+
+logger = logging.getLogger(__name__)
+
+REMOVED_BODIES = {"[deleted]", "[removed]"}
+
+
+class PrawCardSource:
+    """Builds the post and comment cards from the Reddit API and draws them locally, with no browser.
+
+    A drop-in alternative to RedditPostImageScraper: scrape_post writes the same files to the same directories
+    and returns the same (number of comments, post_data).
+    Parameters
+    ----------
+    reddit : praw.Reddit
+        An authenticated client, e.g. SubRedditInfoScraper.reddit
+    directories : dict
+        Default output directories, keyed like RedditPostImageScraper's
+    tts_module : object
+        Narrates the text, see TTSPipeline
+    renderer : CardRenderer, optional
+        Draws the cards, by default a CardRenderer with its default template
+    tts_workers : int, optional
+        Number of narrations in flight at once, by default 4
+    tts_ssml_marks : bool, optional
+        Narrate each post with one SSML request split at <mark>s, by default False
+    """
+
+    def __init__(self, reddit, directories, tts_module, renderer=None, tts_workers=4, tts_ssml_marks=False):
+        self.reddit = reddit
+        self.directories = directories
+        self.renderer = renderer or CardRenderer()
+        # Narration files are named for the encoding the TTS module produces
+        self.audio_extension = AUDIO_EXTENSIONS[getattr(tts_module, "audio_encoding", "MP3")]
+        self.tts_pipeline = TTSPipeline(tts_module, workers=tts_workers, language_code="en-US", speaking_rate=1.25, ssml_marks=tts_ssml_marks)
+        self.page_timings = deque(maxlen=MAX_PAGE_TIMINGS)  # Of the most recent posts, like RedditPostImageScraper
+        # praw clients are not thread safe, concurrent scrapes take turns at the API and render in parallel
+        self._reddit_lock = threading.Lock()
+        [make_dir_if_not_exists(directory) for directory in self.directories.values()]
+
+    def delete_data(self, directories=None):
+        [delete_content_of_dir(directory) for directory in (directories or self.directories).values()]
+
+    def teardown(self):
+        self.tts_pipeline.close()
+        self.delete_data()
+
+    def fetch_post(self, post_url, no_comments):
+        """Returns the submission and its first no_comments top level comments, skipping moderator and removed ones"""
+        with self._reddit_lock:
+            submission = self.reddit.submission(url=post_url)
+            submission.comment_sort = "top"
+            # Only the comments in the first response, "load more" stubs would each cost another request
+            submission.comments.replace_more(limit=0)
+            comments = []
+            for comment in submission.comments:
+                author = comment.author.name if comment.author else "[deleted]"
+                if comment.stickied or comment.distinguished == "moderator" or author == AUTOMOD_AUTHOR or comment.body in REMOVED_BODIES:
+                    continue
+                comments.append(comment)
+                if len(comments) == no_comments:
+                    break
+            # Read the lazily loaded fields while holding the lock
+            submission_info = {
+                "subreddit": submission.subreddit.display_name,
+                "author": submission.author.name if submission.author else "[deleted]",
+                "title": submission.title,
+                "selftext": submission.selftext,
+                "score": submission.score,
+                "num_comments": submission.num_comments,
+            }
+            comment_infos = [{"author": comment.author.name if comment.author else "[deleted]", "body": comment.body, "score": comment.score} for comment in comments]
+        return submission_info, comment_infos
+
+    def scrape_post(self, post_url, no_comments=5, directories=None):
+        """Draws and narrates a post and up to no_comments top level comments, returning (number of comments, post_data)"""
+        directories = directories or self.directories
+        timings = PageTimings(post_url)
+        [make_dir_if_not_exists(directory) for directory in directories.values()]
+        self.delete_data(directories)
+        tts_batch = self.tts_pipeline.batch()
+        post_data = {}
+        try:
+            logger.info("Fetching post with URL: " + post_url)
+            with timings.step("fetch"):
+                post, comments = self.fetch_post(post_url, no_comments)
+
+            post_text = f"{post['title']}\n{strip_markdown(post['selftext'])}".strip()
+            post_data["Post"] = post_text
+            tts_batch.submit(0, post_text, os.path.join(directories["post_audio"], f"0{self.audio_extension}"), voice_for_text(post_text))
+            with timings.step("render_cards"):
+                card = self.renderer.render_post(post["subreddit"], post["author"], post["title"], post["selftext"], post["score"], post["num_comments"])
+                save_card(card, os.path.join(directories["post_image"], "0.png"))
+
+            for i, comment in enumerate(comments):
+                text = strip_markdown(comment["body"])
+                post_data[f"Comment_{str(i)}"] = text
+                tts_batch.submit(i + 1, text, os.path.join(directories["comment_audio"], f"{i}{self.audio_extension}"), voice_for_text(text))
+                with timings.step("render_cards"):
+                    card = self.renderer.render_comment(comment["author"], comment["body"], comment["score"])
+                    save_card(card, os.path.join(directories["comment_image"], f"{i}.png"))
+        except Exception:
+            tts_batch.abandon()
+            raise
+        with timings.step("tts_wait"):
+            tts_batch.wait()
+        logger.info(f"Post and {len(comments)} comments drawn and text to speech-ed, timings: {timings.summary()}")
+        self.page_timings.append(timings)
+        return len(comments), post_data
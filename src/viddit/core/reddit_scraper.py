@@ -1,90 +1,134 @@
 import logging
 import os
-import random
+import threading
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
 
 import praw
 from gtts import gTTS
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.ui import WebDriverWait
 
+from viddit.core.audio import AUDIO_EXTENSIONS
+from viddit.core.dom_extraction import extract_comments, select_comments
+from viddit.core.driver_pool import WebDriverPool, create_chrome_driver
+from viddit.core.page_capture import capture_cards, element_rects
+from viddit.core.page_readiness import COMMENT_SELECTORS, NEW_LAYOUT, detect_layout, scroll_into_view, wait_for_stable_layout
+from viddit.core.tts import voice_for_text
+from viddit.core.tts_pipeline import TTSPipeline
 from viddit.utils.file_util import delete_content_of_dir, make_dir_if_not_exists
-
-# TODO: Remove Automod comments
+from viddit.utils.rate_limit import REDDIT_REQUESTS_PER_MINUTE, RateLimitedRequestor, TokenBucket
+from viddit.utils.timing_utils import MAX_PAGE_TIMINGS, PageTimings
 
 logger = logging.getLogger(__name__)
 
-LANG_BASE_MODEL = "en-US-Standard-"
-MODELS = ["A", "B", "C", "D", "E", "F"]
+# "element" screenshots each card after scrolling to it, "page" cuts every card out of a few full-page captures
+CAPTURE_MODES = ["element", "page"]
+
+
+def accept_cookies(driver):
+    """Accepts Reddit's cookie banner, once per browser"""
+    logger.info("Accepting Reddit cookies.")
+    driver.get("https://www.reddit.com/")
+    WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.XPATH, "//button[contains(text(), 'Accept all')]")))
+    driver.find_element("xpath", "//button[contains(text(), 'Accept all')]").click()
+    logger.info("Cookies accepted")
+    driver.switch_to.default_content()
 
 
 class RedditPostImageScraper:
-    def __init__(self, directories, tts_module, path_to_driver="chromedriver.exe", headless=True, operating_sys="linux"):
+    """Screenshots a post and its top comments and narrates them, using a pool of Chrome instances.
+
+    Each scrape_post call borrows one driver from the pool, so up to pool_size posts can be scraped at once
+    as long as each call is given its own output directories. With capture_mode "page" the cards are cut out
+    of full-page captures rather than screenshotted one by one.
+    """
+
+    def __init__(
+        self,
+        directories,
+        tts_module,
+        path_to_driver="chromedriver.exe",
+        headless=True,
+        operating_sys="linux",
+        pool_size=1,
+        max_pages_per_driver=50,
+        capture_mode="element",
+        tts_workers=4,
+        tts_ssml_marks=False,
+    ):
         # check driver exists
         if operating_sys not in ["windows", "linux"]:
             raise ValueError("os must be 'windows' or 'linux'")
+        if capture_mode not in CAPTURE_MODES:
+            raise ValueError(f"capture_mode must be one of {CAPTURE_MODES}")
+        self.capture_mode = capture_mode
         if not os.path.exists(path_to_driver):
             raise FileNotFoundError("Could not find chromedriver at path: " + path_to_driver)
-        options = Options()
-        if operating_sys == "linux":
-            options.add_argument("--disable-dev-shm-usage")
-            options.add_argument("--remote-debugging-port=0")
-            options.add_argument(
-                "--no-sandbox"
-            )  # Discouraged - It is way better to run the Docker container as a non-root user. Problem for another day.
-            options.add_argument("--start-maximized")
-            options.add_argument("--disable-infobars")
-            options.add_argument("--disable-extensions")
-        if headless:
-            if operating_sys == "windows":
-                options.add_argument("--disable-gpu")
-            options.add_argument("--headless")
-        self.driver = webdriver.Chrome(path_to_driver, options=options)
         self.directories = directories
         self.tts_module = tts_module
-        self.setup()
-
-    def setup(self):
+        # Narration files are named for the encoding the TTS module produces
+        self.audio_extension = AUDIO_EXTENSIONS[getattr(tts_module, "audio_encoding", "MP3")]
+        # Narration runs on worker threads while the browser carries on extracting and capturing
+        self.tts_pipeline = TTSPipeline(tts_module, workers=tts_workers, language_code="en-US", speaking_rate=1.25, ssml_marks=tts_ssml_marks)
+        self.page_timings = deque(maxlen=MAX_PAGE_TIMINGS)  # PageTimings of the most recently scraped posts
         [make_dir_if_not_exists(directory) for directory in self.directories.values()]
-        self.accept_cookies()
+        logger.info(f"Starting {pool_size} Chrome instance(s)")
+        self.driver_pool = WebDriverPool(
+            partial(create_chrome_driver, path_to_driver, headless=headless, operating_sys=operating_sys),
+            size=pool_size,
+            warmup=accept_cookies,
+            max_pages_per_driver=max_pages_per_driver,
+        )
 
-    def delete_data(self):
-        [delete_content_of_dir(directory) for directory in self.directories.values()]
+    def delete_data(self, directories=None):
+        [delete_content_of_dir(directory) for directory in (directories or self.directories).values()]
 
     def teardown(self):
+        self.tts_pipeline.close()
         self.delete_data()
-        self.driver.close()
-        self.driver.quit()
-
-    def accept_cookies(self):
-        logger.info("Accepting Reddit cookies.")
-        self.driver.get("https://www.reddit.com/")
-        WebDriverWait(self.driver, 10).until(EC.presence_of_element_located((By.XPATH, "//button[contains(text(), 'Accept all')]")))
-        self.driver.find_element("xpath", "//button[contains(text(), 'Accept all')]").click()
-        logger.info("Cookies accepted")
-        self.driver.switch_to.default_content()
-
-    def scrape_post(self, post_url, no_comments=5):
-        post_data = {}
+        self.driver_pool.close()
+
+    def scrape_post(self, post_url, no_comments=5, directories=None):
+        """Screenshots and narrates a post and up to no_comments top level comments, returning (number of comments, post_data).
+
+        Files are written to directories, by default the scraper's own. Concurrent calls must each pass their own.
+        """
+        directories = directories or self.directories
+        timings = PageTimings(post_url)
         logger.debug("Deleting old data...")
-        self.delete_data()
-        logger.info("Fetching post with URL: " + post_url)
-        self.driver.get(post_url)
-        new_css = False
+        [make_dir_if_not_exists(directory) for directory in directories.values()]
+        self.delete_data(directories)
+        tts_batch = self.tts_pipeline.batch()
         try:
-            post = WebDriverWait(self.driver, 8).until(EC.presence_of_element_located((By.CSS_SELECTOR, ".Post")))
-        except Exception as e:
-            logger.info("Could not find post, trying alternate CSS styling...")
-            try:
-                post = WebDriverWait(self.driver, 8).until(EC.presence_of_element_located((By.TAG_NAME, "shreddit-post")))
-                new_css = True
-            except Exception as e:
-                logger.error("Could not find post..")
-                raise e
+            with self.driver_pool.acquire() as driver:
+                no_scraped, post_data = self._scrape_post(driver, post_url, no_comments, directories, timings, tts_batch)
+        except Exception:
+            # Let the queued narrations finish so none are written after the caller has moved on
+            tts_batch.abandon()
+            raise
+        # The driver is already back in the pool while the last narrations finish
+        with timings.step("tts_wait"):
+            tts_batch.wait()
+        logger.info("Post and top comments screenshoted and text to speech-ed.")
+        logger.info(f"Page timings for {post_url}: {timings.summary()}")
+        self.page_timings.append(timings)
+        return no_scraped, post_data
+
+    def _scrape_post(self, driver, post_url, no_comments, directories, timings, tts_batch):
+        """Extracts and captures the post and comments, queueing their narration on tts_batch"""
+        post_data = {}
+        logger.info("Fetching post with URL: " + post_url)
+        with timings.step("navigate"):
+            driver.get(post_url)
+        with timings.step("detect_layout"):
+            layout, post = detect_layout(driver)
+        new_css = layout == NEW_LAYOUT
+        logger.debug(f"Reddit served the {layout} layout")
 
         if new_css:
             title_text = post.get_attribute("post-title")
@@ -103,77 +147,94 @@ class RedditPostImageScraper:
 
         full_post_text = f"{title_text}\n{post_text}"
         post_data["Post"] = full_post_text
-        post.screenshot(os.path.join(self.directories["post_image"], "0.png"))
+        if self.capture_mode == "element":
+            with timings.step("screenshot"):
+                post.screenshot(os.path.join(directories["post_image"], "0.png"))
         logger.info("Post text: " + full_post_text)
-        logger.info("Post fetched, performing text to speech for main post...")
-        self.tts_module.text_to_speech(
-            full_post_text,
-            os.path.join(self.directories["post_audio"], "0.mp3"),
-            language_code="en-US",
-            voice_name=LANG_BASE_MODEL + random.choice(MODELS),
-            speaking_rate=1.25,
-        )
+        logger.info("Post fetched, queueing text to speech for main post...")
+        tts_batch.submit(0, full_post_text, os.path.join(directories["post_audio"], f"0{self.audio_extension}"), voice_for_text(full_post_text))
         logger.debug("Waiting for comments to load...")
-        self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-        time.sleep(3)  # TODO Can be a WebDriverWait
+        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+        with timings.step("comments_ready"):
+            # Resolves as soon as the comments are attached and have stopped moving
+            wait_for_stable_layout(driver, COMMENT_SELECTORS[layout])
+        with timings.step("extract_comments"):
+            # Text, position, depth and mod flags of every comment in one round trip, filtered here
+            comments = select_comments(extract_comments(driver, layout), no_comments)
 
-        if new_css:
-            comments = WebDriverWait(self.driver, 20).until(EC.presence_of_all_elements_located((By.CSS_SELECTOR, "shreddit-comment")))
-            mod_flag = comments[0].find_element(By.XPATH, (".//*[not(self::icon-mod)]"))
-        else:
-            comments = WebDriverWait(self.driver, 20).until(
-                EC.presence_of_all_elements_located((By.CSS_SELECTOR, "div[id^=t1_][tabindex]"))
-            )
-            mod_flag = comments[0].find_element(By.CSS_SELECTOR, (".icon.icon-lock_fill"))
-
-        allowed_style = comments[0].get_attribute("style")  # Filter for top level comments
-        comments = [comment for comment in comments if comment.get_attribute("style") == allowed_style][: no_comments + 1]
-        logger.info(f"Found {len(comments)} comments, filtering for top level comments...")
-        if mod_flag:
-            logger.info("Mod comment found, removing")
-            comments.pop(0)
-        else:
-            logger.info("Mod comment not found, removing last comment")
-            comments.pop()
-
-        for i in range(len(comments)):
-            desired_y = (comments[i].size["height"] / 2) + comments[i].location["y"]
-            window_h = self.driver.execute_script("return window.innerHeight")
-            window_y = self.driver.execute_script("return window.pageYOffset")
-            current_y = (window_h / 2) + window_y
-            scroll_y_by = desired_y - current_y
-            self.driver.execute_script("window.scrollBy(0, arguments[0]);", scroll_y_by)
-            time.sleep(0.2)
-            if new_css:
-                text = comments[i].find_element(By.CSS_SELECTOR, "#-post-rtjson-content").text.strip()
-                # comments[i] = self.driver.execute_script('return arguments[0].shadowRoot.querySelector("details")', comments[i]) # This isolates the individual comment, otherwise we screenshot the tree
-
-            else:
-                text = "\n".join([element.text for element in comments[i].find_elements(By.CSS_SELECTOR, ".RichTextJSON-root")])
-            logger.debug(f"Performing TTS for comment {str(i)}, text: " + text)
-            self.tts_module.text_to_speech(
-                text,
-                os.path.join(self.directories["comment_audio"], f"{i}.mp3"),
-                language_code="en-US",
-                voice_name=LANG_BASE_MODEL + random.choice(MODELS),
-                speaking_rate=1.25,
-            )
+        for i, comment in enumerate(comments):
+            if self.capture_mode == "element":
+                with timings.step("comment_scroll"):
+                    scroll_into_view(driver, comment.element)
+            text = comment.text
+            logger.debug(f"Queueing TTS for comment {str(i)}, text: " + text)
+            tts_batch.submit(i + 1, text, os.path.join(directories["comment_audio"], f"{i}{self.audio_extension}"), voice_for_text(text))
             post_data[f"Comment_{str(i)}"] = text
             # Screenshot & save text
-            comments[i].screenshot(os.path.join(self.directories["comment_image"], f"{i}.png"))
-        logger.info("Post and top comments screenshoted and text to speech-ed.")
+            if self.capture_mode == "element":
+                with timings.step("screenshot"):
+                    comment.element.screenshot(os.path.join(directories["comment_image"], f"{i}.png"))
+        if self.capture_mode == "page":
+            with timings.step("screenshot"):
+                # No scrolling, the cards are cut out of captures that extend beyond the viewport
+                rects = element_rects(driver, [post] + [comment.element for comment in comments])
+                output_paths = [os.path.join(directories["post_image"], "0.png")]
+                output_paths += [os.path.join(directories["comment_image"], f"{i}.png") for i in range(len(comments))]
+                capture_cards(driver, rects, output_paths)
         return len(comments), post_data
 
 
 class SubRedditInfoScraper:
-    def __init__(self, client_id, client_secret, password, user_agent, username):
-        self.reddit = praw.Reddit(
-            client_id=client_id,
-            client_secret=client_secret,
-            password=password,
-            user_agent=user_agent,
-            username=username,
-        )
+    """Lists and filters the top posts of subreddits.
+
+    Every praw client the scraper creates, one per fetching thread, takes its requests from one shared token
+    bucket that follows Reddit's rate limit headers.
+    """
+
+    def __init__(self, client_id, client_secret, password, user_agent, username, requests_per_minute=REDDIT_REQUESTS_PER_MINUTE):
+        self._credentials = {
+            "client_id": client_id,
+            "client_secret": client_secret,
+            "password": password,
+            "user_agent": user_agent,
+            "username": username,
+        }
+        self.rate_limiter = TokenBucket(requests_per_minute / 60, capacity=10)
+        self._thread_clients = threading.local()
+        self.reddit = self.new_client()
+
+    def new_client(self):
+        """Returns a new praw client that shares the scraper's rate limit budget"""
+        return praw.Reddit(**self._credentials, requestor_class=RateLimitedRequestor, requestor_kwargs={"bucket": self.rate_limiter})
+
+    def _thread_client(self):
+        # praw clients are not thread safe, each fetching thread gets its own
+        if not hasattr(self._thread_clients, "reddit"):
+            self._thread_clients.reddit = self.new_client()
+        return self._thread_clients.reddit
+
+    def iter_subreddits_info(self, subreddit_names, max_workers=4, cursor_store=None, **filters):
+        """Fetches the listings of several subreddits at once, yielding (subreddit_name, info_list) as each completes.
+
+        Takes the same filters as get_subreddit_info. With a cursor_store the subreddits are polled incrementally,
+        see poll_subreddit_info. A subreddit that fails is logged and yields an empty list.
+        """
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="subreddit") as executor:
+            futures = {
+                executor.submit(self._get_subreddit_info_in_thread, subreddit_name, cursor_store, filters): subreddit_name
+                for subreddit_name in subreddit_names
+            }
+            for future in as_completed(futures):
+                try:
+                    yield futures[future], future.result()
+                except Exception as e:
+                    logger.error(f"Could not fetch subreddit {futures[future]}: {e}")
+                    yield futures[future], []
+
+    def _get_subreddit_info_in_thread(self, subreddit_name, cursor_store, filters):
+        if cursor_store is not None:
+            return self.poll_subreddit_info(subreddit_name, cursor_store, reddit=self._thread_client(), **filters)
+        return self.get_subreddit_info(subreddit_name, reddit=self._thread_client(), **filters)
 
     def get_subreddit_info(
         self,
@@ -188,42 +249,174 @@ class SubRedditInfoScraper:
         min_upvotes=None,
         min_num_comments=None,
         min_upvote_ratio=None,
+        reddit=None,
     ):
         if time_filter not in ["all", "day", "hour", "month", "week", "year"]:
             raise ValueError("time_filter must be one of 'all', 'day', 'hour', 'month', 'week', 'year'")
-        subreddit = self.reddit.subreddit(subreddit_name)
+        subreddit = (reddit or self.reddit).subreddit(subreddit_name)
         logger.info(f"Getting top {limit} posts from {subreddit_name} in {time_filter} time filter")
-        info_list = []
-        for submission in subreddit.top(limit=limit, time_filter=time_filter):
-            if (
-                (not filter_locked or not submission.locked)
-                and (not filter_mod or submission.distinguished is None)
-                and (not filter_stickied or not submission.stickied)
-                and (not filter_original_content or submission.is_original_content)
-                and (not filter_nsfw or not submission.over_18)
-                and (min_upvotes is None or submission.score >= min_upvotes)
-                and (min_num_comments is None or submission.num_comments >= min_num_comments)
-                and (min_upvote_ratio is None or submission.upvote_ratio >= min_upvote_ratio)
-            ):
-                info_dict = {
-                    "created_utc": submission.created_utc,
-                    "distinguished": submission.distinguished,
-                    "id": submission.id,
-                    "is_original_content": submission.is_original_content,
-                    "link_flair_text": submission.link_flair_text,
-                    "locked": submission.locked,
-                    "name": submission.name,
-                    "num_comments": submission.num_comments,
-                    "nsfw": submission.over_18,
-                    "permalink": submission.permalink,
-                    "score": submission.score,
-                    "selftext": submission.selftext,
-                    "spoiler": submission.spoiler,
-                    "stickied": submission.stickied,
-                    "title": submission.title,
-                    "upvote_ratio": submission.upvote_ratio,
-                    "url": submission.url,
-                }
-                info_list.append(info_dict)
+        filters = _filter_args(locals())
+        info_list = [submission_info(submission) for submission in subreddit.top(limit=limit, time_filter=time_filter) if passes_filters(submission, **filters)]
         logger.info(f"Found {len(info_list)} posts in {subreddit_name} with the given filters")
         return info_list
+
+    def poll_subreddit_info(
+        self,
+        subreddit_name,
+        cursor_store,
+        limit=10,
+        time_filter="day",
+        min_score_change=10,
+        filter_locked=True,
+        filter_mod=False,
+        filter_stickied=True,
+        filter_original_content=False,
+        filter_nsfw=False,
+        min_upvotes=None,
+        min_num_comments=None,
+        min_upvote_ratio=None,
+        reddit=None,
+    ):
+        """Like get_subreddit_info, but only evaluates posts that are new or whose score has moved since the last poll.
+
+        The cursor_store remembers every post evaluated within the time filter along with its score. A poll pages
+        through the posts newer than the newest one seen, refreshes the scores of up to MAX_REFRESHED_POSTS posts that
+        have not passed with a single reddit.info request, and re-evaluates those whose score changed by at least
+        min_score_change. Posts that fail a filter their score can't change, e.g. locked or stickied, are not
+        refreshed. A returned post is offered again by later polls until the caller confirms it with
+        cursor_store.mark_passed, so a post whose job failed is retried.
+        Returns
+        -------
+        list
+            Up to limit passing posts, highest score first, as dicts like get_subreddit_info's
+        """
+        if time_filter not in POLL_MAX_AGE_HOURS:
+            raise ValueError(f"time_filter must be one of {list(POLL_MAX_AGE_HOURS)}")
+        reddit = reddit or self.reddit
+        filters = _filter_args(locals())
+        max_age_seconds = POLL_MAX_AGE_HOURS[time_filter] * 3600 if POLL_MAX_AGE_HOURS[time_filter] else None
+        cursor = cursor_store.get(subreddit_name)
+        seen = cursor["seen"]
+        subreddit = reddit.subreddit(subreddit_name)
+        first_poll = not cursor["newest"] and not seen
+
+        def in_window(submission):
+            return max_age_seconds is None or time.time() - submission.created_utc <= max_age_seconds
+
+        # Pages back from the newest post until one already seen, or one too old to matter, is reached
+        new_submissions = []
+        for submission in subreddit.new(limit=100 if first_poll else None):
+            if submission.name in seen or not in_window(submission):
+                break
+            new_submissions.append(submission)
+        newest = new_submissions[0].name if new_submissions else cursor["newest"]
+        candidates = {submission.name: submission for submission in new_submissions}
+        if first_poll:
+            # Also pick up the day's top posts that are older than the newest hundred
+            candidates.update({submission.name: submission for submission in subreddit.top(limit=100, time_filter=time_filter)})
+
+        # Refresh the scores of posts that have not passed yet, those closest to passing first, and only evaluate
+        # again the ones that moved enough. A None score is a post that passed before and must be offered again.
+        pending = [
+            fullname
+            for fullname, snapshot in seen.items()
+            if not snapshot["passed"] and not snapshot.get("final") and fullname not in candidates
+        ]
+        pending.sort(key=lambda fullname: (seen[fullname]["score"] is not None, -(seen[fullname]["score"] or 0)))
+        pending = pending[:MAX_REFRESHED_POSTS]
+        refreshed = 0
+        for submission in reddit.info(fullnames=pending) if pending else []:
+            refreshed += 1
+            snapshot_score = seen[submission.name]["score"]
+            if snapshot_score is None or abs(submission.score - snapshot_score) >= min_score_change:
+                candidates[submission.name] = submission
+
+        passing = []
+        for fullname, submission in candidates.items():
+            passed = in_window(submission) and passes_filters(submission, **filters)
+            final = not passes_filters(submission, **_score_free_filters(filters))
+            seen[fullname] = {"score": submission.score, "created_utc": submission.created_utc, "passed": False, "final": final}
+            if passed:
+                passing.append(submission)
+        passing.sort(key=lambda submission: submission.score, reverse=True)
+        for submission in passing:
+            # Not passed until the caller says so, a None score gets it evaluated again next poll
+            seen[submission.name]["score"] = None
+        cursor_store.update(subreddit_name, newest, seen, max_age_seconds)
+        logger.info(
+            f"Polled {subreddit_name}: {len(new_submissions)} new posts, {refreshed} scores refreshed, "
+            f"{len(candidates)} evaluated, {min(len(passing), limit)} passing"
+        )
+        return [submission_info(submission) for submission in passing[:limit]]
+
+
+# One reddit.info request's worth, so refreshing scores costs a single request per poll
+MAX_REFRESHED_POSTS = 100
+
+# How far back polling keeps track of posts for each time filter, None keeps everything
+POLL_MAX_AGE_HOURS = {"hour": 1, "day": 24, "week": 24 * 7, "month": 24 * 30, "year": 24 * 365, "all": None}
+
+_FILTER_ARGS = [
+    "filter_locked",
+    "filter_mod",
+    "filter_stickied",
+    "filter_original_content",
+    "filter_nsfw",
+    "min_upvotes",
+    "min_num_comments",
+    "min_upvote_ratio",
+]
+
+
+def _filter_args(arguments):
+    return {name: arguments[name] for name in _FILTER_ARGS}
+
+
+def _score_free_filters(filters):
+    """The filters without the ones a post can come to pass as it gathers votes and comments"""
+    return dict(filters, min_upvotes=None, min_num_comments=None, min_upvote_ratio=None)
+
+
+def passes_filters(
+    submission,
+    filter_locked=True,
+    filter_mod=False,
+    filter_stickied=True,
+    filter_original_content=False,
+    filter_nsfw=False,
+    min_upvotes=None,
+    min_num_comments=None,
+    min_upvote_ratio=None,
+):
+    return (
+        (not filter_locked or not submission.locked)
+        and (not filter_mod or submission.distinguished is None)
+        and (not filter_stickied or not submission.stickied)
+        and (not filter_original_content or submission.is_original_content)
+        and (not filter_nsfw or not submission.over_18)
+        and (min_upvotes is None or submission.score >= min_upvotes)
+        and (min_num_comments is None or submission.num_comments >= min_num_comments)
+        and (min_upvote_ratio is None or submission.upvote_ratio >= min_upvote_ratio)
+    )
+
+
+def submission_info(submission):
+    return {
+        "created_utc": submission.created_utc,
+        "distinguished": submission.distinguished,
+        "id": submission.id,
+        "is_original_content": submission.is_original_content,
+        "link_flair_text": submission.link_flair_text,
+        "locked": submission.locked,
+        "name": submission.name,
+        "num_comments": submission.num_comments,
+        "nsfw": submission.over_18,
+        "permalink": submission.permalink,
+        "score": submission.score,
+        "selftext": submission.selftext,
+        "spoiler": submission.spoiler,
+        "stickied": submission.stickied,
+        "title": submission.title,
+        "upvote_ratio": submission.upvote_ratio,
+        "url": submission.url,
+    }
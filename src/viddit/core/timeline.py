@@ -0,0 +1,128 @@
+import logging
+import random
+from dataclasses import dataclass, field
+from typing import List, Optional, Union
+
+from viddit.core.audio import AudioBuffer, get_audio_duration
+from viddit.core.background import get_video_properties
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BackgroundInfo:
+    """The background video a timeline is composited onto"""
+
+    path: str
+    fps: float
+    width: int
+    height: int
+    frame_count: int
+
+    @property
+    def duration(self) -> float:
+        return self.frame_count / self.fps
+
+    @classmethod
+    def from_video(cls, path: str) -> "BackgroundInfo":
+        fps, width, height, frame_count = get_video_properties(path)
+        return cls(path, fps, width, height, frame_count)
+
+
+@dataclass
+class TimelineSegment:
+    """One card shown over the background while its narration plays, followed by the wait_time gap"""
+
+    png_path: str
+    audio_path: Union[str, AudioBuffer]  # A file, or narration held in memory
+    audio_duration: float
+    start_frame: int  # Offset of the segment in the output video
+    num_frames: int
+
+
+@dataclass
+class Timeline:
+    """A render plan: which background frames to use and when each card and narration is shown.
+
+    Timelines contain no pixel data, any backend can execute the same plan.
+    """
+
+    background: BackgroundInfo
+    background_start_frame: int
+    segments: List[TimelineSegment] = field(default_factory=list)
+
+    @property
+    def fps(self) -> float:
+        return self.background.fps
+
+    @property
+    def width(self) -> int:
+        return self.background.width
+
+    @property
+    def height(self) -> int:
+        return self.background.height
+
+    @property
+    def total_frames(self) -> int:
+        return sum(segment.num_frames for segment in self.segments)
+
+    @property
+    def duration(self) -> float:
+        return self.total_frames / self.fps
+
+    def segment_start_time(self, segment: TimelineSegment) -> float:
+        return segment.start_frame / self.fps
+
+    def segment_duration(self, segment: TimelineSegment) -> float:
+        return segment.num_frames / self.fps
+
+    def background_frame(self, segment: TimelineSegment) -> int:
+        """The background frame the segment starts on, the background loops when the video outlasts it"""
+        return (self.background_start_frame + segment.start_frame) % max(self.background.frame_count, 1)
+
+
+def build_timeline(
+    background_video_path: str,
+    png_paths: List[str],
+    audio_paths: List[Union[str, AudioBuffer]],
+    wait_time: float = 2,
+    background_start_frame: Optional[int] = None,
+) -> Timeline:
+    """Plans a video from a background, one PNG per segment and one audio file per segment
+    Parameters
+    ----------
+    background_video_path : str
+        Path to the background video
+    png_paths : List[str]
+        The cards to overlay, one per segment
+    audio_paths : List[Union[str, AudioBuffer]]
+        The narration of each segment, as files or AudioBuffers whose durations are already known
+    wait_time : float, optional
+        Seconds to keep each card on screen after its narration ends, by default 2
+    background_start_frame : int, optional
+        Background frame to start on, by default a random frame that leaves room for the whole video
+    Returns
+    -------
+    Timeline
+        The render plan
+    """
+    if len(png_paths) != len(audio_paths):
+        raise ValueError(f"Got {len(png_paths)} images but {len(audio_paths)} audio files, there must be one of each per segment")
+    background = BackgroundInfo.from_video(background_video_path)
+    logger.debug(f"Video properties: {background.fps} fps, {background.width}x{background.height} pixels")
+
+    segments = []
+    start_frame = 0
+    for png_path, audio_path in zip(png_paths, audio_paths):
+        # Durations come from the audio headers, nothing is decoded while planning
+        audio_duration = get_audio_duration(audio_path)
+        num_frames = int((audio_duration + wait_time) * background.fps)
+        segments.append(TimelineSegment(png_path, audio_path, audio_duration, start_frame, num_frames))
+        start_frame += num_frames
+
+    if background_start_frame is None:
+        # Choose a random starting point for the background video, shorter backgrounds start at 0 and loop
+        max_start_frame = background.frame_count - start_frame
+        background_start_frame = random.randint(0, max_start_frame) if max_start_frame > 0 else 0
+    return Timeline(background, background_start_frame, segments)
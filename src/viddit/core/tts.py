@@ -1,13 +1,45 @@
 import os
+import zlib
 from google.oauth2 import service_account
 from google.cloud import texttospeech
+from google.cloud import texttospeech_v1beta1
+
+from viddit.core.audio import AudioBuffer
+
+LANG_BASE_MODEL = "en-US-Standard-"
+MODELS = ["A", "B", "C", "D", "E", "F"]
+
+
+def voice_for_text(text):
+    """Picks one of the voices for a piece of text, always the same one so repeated text can be served from the TTS cache"""
+    return LANG_BASE_MODEL + MODELS[zlib.crc32(text.encode("utf-8")) % len(MODELS)]
+
 
 class GoogleCloudTTS:
-    def __init__(self, json_key_file_path):
-        credentials = service_account.Credentials.from_service_account_file(json_key_file_path)
-        self.client = texttospeech.TextToSpeechClient(credentials=credentials)
+    audio_encoding = 'MP3'
+
+    def __init__(self, json_key_file_path, audio_encoding=None):
+        # MP3, LINEAR16 or OGG_OPUS, LINEAR16 lets the renderer join the narration without decoding it
+        if audio_encoding:
+            self.audio_encoding = audio_encoding
+        self.credentials = service_account.Credentials.from_service_account_file(json_key_file_path)
+        self.client = texttospeech.TextToSpeechClient(credentials=self.credentials)
+        self._beta_client = None
+
+    def text_to_speech(self, input_text, output_filename, language_code='en-US', voice_name='en-US-Wavenet-A', speaking_rate=1.0, pitch=0.0, audio_encoding=None):
+        audio_content = self._synthesize_speech(input_text, language_code, voice_name, speaking_rate, pitch, audio_encoding)
+
+        # Write the resulting audio to a file
+        with open(output_filename, 'wb') as out:
+            out.write(audio_content)
+            print(f'Audio content written to "{output_filename}"')
+
+    def synthesize_to_buffer(self, input_text, language_code='en-US', voice_name='en-US-Wavenet-A', speaking_rate=1.0, pitch=0.0, audio_encoding=None):
+        """Synthesises text into an AudioBuffer held in memory, with its exact duration read from the response"""
+        audio_content = self._synthesize_speech(input_text, language_code, voice_name, speaking_rate, pitch, audio_encoding)
+        return AudioBuffer.from_bytes(audio_content, audio_encoding or self.audio_encoding)
 
-    def text_to_speech(self, input_text, output_filename, language_code='en-US', voice_name='en-US-Wavenet-A', speaking_rate=1.0, pitch=0.0):
+    def _synthesize_speech(self, input_text, language_code, voice_name, speaking_rate, pitch, audio_encoding):
         # Set the input text
         synthesis_input = texttospeech.SynthesisInput(text=input_text)
 
@@ -19,7 +51,7 @@ class GoogleCloudTTS:
 
         # Set the audio configuration
         audio_config = texttospeech.AudioConfig(
-            audio_encoding=texttospeech.AudioEncoding.MP3,
+            audio_encoding=texttospeech.AudioEncoding[audio_encoding or self.audio_encoding],
             speaking_rate=speaking_rate,
             pitch=pitch
         )
@@ -28,11 +60,25 @@ class GoogleCloudTTS:
         response = self.client.synthesize_speech(
             input=synthesis_input, voice=voice, audio_config=audio_config
         )
+        return response.audio_content
 
-        # Write the resulting audio to a file
-        with open(output_filename, 'wb') as out:
-            out.write(response.audio_content)
-            print(f'Audio content written to "{output_filename}"')
+    def synthesize_with_marks(self, ssml, language_code='en-US', voice_name='en-US-Wavenet-A', speaking_rate=1.0, pitch=0.0):
+        """Synthesises an SSML document to LINEAR16, returning the WAV bytes and the offset in seconds of every <mark>"""
+        # Only the v1beta1 API reports timepoints
+        if self._beta_client is None:
+            self._beta_client = texttospeech_v1beta1.TextToSpeechClient(credentials=self.credentials)
+        request = texttospeech_v1beta1.SynthesizeSpeechRequest(
+            input=texttospeech_v1beta1.SynthesisInput(ssml=ssml),
+            voice=texttospeech_v1beta1.VoiceSelectionParams(language_code=language_code, name=voice_name),
+            audio_config=texttospeech_v1beta1.AudioConfig(
+                audio_encoding=texttospeech_v1beta1.AudioEncoding.LINEAR16,
+                speaking_rate=speaking_rate,
+                pitch=pitch
+            ),
+            enable_time_pointing=[texttospeech_v1beta1.SynthesizeSpeechRequest.TimepointType.SSML_MARK],
+        )
+        response = self._beta_client.synthesize_speech(request=request)
+        return response.audio_content, {timepoint.mark_name: timepoint.time_seconds for timepoint in response.timepoints}
 
     def list_voices(self):
         voices = self.client.list_voices()
@@ -0,0 +1,172 @@
+import asyncio
+import logging
+import random
+import threading
+
+import grpc
+from google.api_core import exceptions
+from google.api_core.client_options import ClientOptions
+from google.auth.credentials import AnonymousCredentials
+from google.cloud import texttospeech
+from google.cloud.texttospeech_v1.services.text_to_speech.transports import TextToSpeechGrpcAsyncIOTransport
+from google.oauth2 import service_account
+
+from viddit.core.audio import AudioBuffer
+from viddit.utils.rate_limit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# Google's default Text-to-Speech quota
+TTS_REQUESTS_PER_MINUTE = 1000
+TRANSIENT_ERRORS = (
+    exceptions.ServiceUnavailable,
+    exceptions.DeadlineExceeded,
+    exceptions.InternalServerError,
+    exceptions.ResourceExhausted,
+    exceptions.Aborted,
+)
+
+
+class AsyncGoogleCloudTTS:
+    """Google Cloud Text-to-Speech over the async client, with every request sharing one channel, one concurrency
+    limit and one per-minute quota.
+
+    The client runs on an event loop of its own thread, so synchronous callers such as TTSPipeline can use
+    text_to_speech as a drop-in for GoogleCloudTTS, while synthesize_batch runs a whole batch of jobs at once.
+    Transient errors are retried with exponential backoff and jitter.
+    Parameters
+    ----------
+    json_key_file_path : str, optional
+        Service account key, not needed with insecure
+    concurrency : int, optional
+        Most requests in flight at once, by default 8
+    requests_per_minute : float, optional
+        Quota the requests are spread over, by default TTS_REQUESTS_PER_MINUTE
+    max_attempts : int, optional
+        Attempts per request before a transient error is raised, by default 5
+    backoff : float, optional
+        Seconds before the first retry, doubling for every retry after it up to max_backoff, by default 0.5
+    endpoint : str, optional
+        host:port to send requests to instead of Google's, e.g. a local fake server in tests
+    insecure : bool, optional
+        Talk to endpoint over a plaintext channel without credentials, by default False
+    audio_encoding : str, optional
+        MP3, LINEAR16 or OGG_OPUS, by default MP3
+    """
+
+    audio_encoding = "MP3"
+
+    def __init__(
+        self,
+        json_key_file_path=None,
+        concurrency=8,
+        requests_per_minute=TTS_REQUESTS_PER_MINUTE,
+        max_attempts=5,
+        backoff=0.5,
+        max_backoff=16.0,
+        endpoint=None,
+        insecure=False,
+        audio_encoding=None,
+    ):
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        if insecure and not endpoint:
+            raise ValueError("insecure needs an endpoint")
+        if audio_encoding:
+            self.audio_encoding = audio_encoding
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.quota = TokenBucket(rate=requests_per_minute / 60, capacity=concurrency)
+        self.retries = 0
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="tts-async", daemon=True)
+        self._thread.start()
+        self._run(self._start(json_key_file_path, concurrency, endpoint, insecure))
+
+    def _run(self, coroutine):
+        """Runs a coroutine on the client's loop and blocks until it finishes"""
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    async def _start(self, json_key_file_path, concurrency, endpoint, insecure):
+        # grpc.aio channels belong to the loop they are created on, so the client is made on ours
+        self._semaphore = asyncio.Semaphore(concurrency)
+        if insecure:
+            transport = TextToSpeechGrpcAsyncIOTransport(host=endpoint, credentials=AnonymousCredentials(), channel=grpc.aio.insecure_channel(endpoint))
+            self.client = texttospeech.TextToSpeechAsyncClient(transport=transport)
+        else:
+            credentials = service_account.Credentials.from_service_account_file(json_key_file_path) if json_key_file_path else None
+            client_options = ClientOptions(api_endpoint=endpoint) if endpoint else None
+            self.client = texttospeech.TextToSpeechAsyncClient(credentials=credentials, client_options=client_options)
+
+    async def _wait_for_quota(self):
+        while True:
+            wait = self.quota.try_acquire()
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+    async def synthesize(
+        self, input_text, output_filename, language_code="en-US", voice_name="en-US-Wavenet-A", speaking_rate=1.0, pitch=0.0, audio_encoding=None
+    ):
+        """Synthesises one piece of text and writes the audio to output_filename as soon as it arrives"""
+        audio_content = await self._synthesize_speech(input_text, language_code, voice_name, speaking_rate, pitch, audio_encoding)
+        with open(output_filename, "wb") as out:
+            out.write(audio_content)
+        logger.debug(f"Audio content written to {output_filename}")
+
+    async def _synthesize_speech(self, input_text, language_code, voice_name, speaking_rate, pitch, audio_encoding):
+        request = texttospeech.SynthesizeSpeechRequest(
+            input=texttospeech.SynthesisInput(text=input_text),
+            voice=texttospeech.VoiceSelectionParams(language_code=language_code, name=voice_name),
+            audio_config=texttospeech.AudioConfig(
+                audio_encoding=texttospeech.AudioEncoding[audio_encoding or self.audio_encoding], speaking_rate=speaking_rate, pitch=pitch
+            ),
+        )
+        for attempt in range(self.max_attempts):
+            try:
+                async with self._semaphore:
+                    await self._wait_for_quota()
+                    # Retries are ours, so they also respect the concurrency limit and quota
+                    response = await self.client.synthesize_speech(request=request, retry=None)
+                break
+            except TRANSIENT_ERRORS as e:
+                if attempt == self.max_attempts - 1:
+                    raise
+                delay = min(self.max_backoff, self.backoff * 2**attempt) * random.uniform(0.5, 1.0)
+                self.retries += 1
+                logger.warning(f"Text to speech failed with {e.__class__.__name__}, retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+        return response.audio_content
+
+    async def _synthesize_all(self, jobs, language_code, speaking_rate):
+        return await asyncio.gather(
+            *[self.synthesize(job.text, job.output_path, language_code, job.voice_name, speaking_rate) for job in jobs], return_exceptions=True
+        )
+
+    def synthesize_batch(self, jobs, language_code="en-US", speaking_rate=1.0):
+        """Synthesises a batch of TTSJobs concurrently, each file is written as its response arrives.
+
+        Returns a list with None for every job that succeeded and the exception for every job that failed.
+        """
+        results = self._run(self._synthesize_all(jobs, language_code, speaking_rate))
+        return [result if isinstance(result, BaseException) else None for result in results]
+
+    def text_to_speech(
+        self, input_text, output_filename, language_code="en-US", voice_name="en-US-Wavenet-A", speaking_rate=1.0, pitch=0.0, audio_encoding=None
+    ):
+        """Blocking equivalent of GoogleCloudTTS.text_to_speech, concurrent callers share the limits"""
+        self._run(self.synthesize(input_text, output_filename, language_code, voice_name, speaking_rate, pitch, audio_encoding))
+
+    def synthesize_to_buffer(
+        self, input_text, language_code="en-US", voice_name="en-US-Wavenet-A", speaking_rate=1.0, pitch=0.0, audio_encoding=None
+    ):
+        """Synthesises text into an AudioBuffer held in memory, with its exact duration read from the response"""
+        audio_content = self._run(self._synthesize_speech(input_text, language_code, voice_name, speaking_rate, pitch, audio_encoding))
+        return AudioBuffer.from_bytes(audio_content, audio_encoding or self.audio_encoding)
+
+    def close(self):
+        self._run(self.client.transport.close())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
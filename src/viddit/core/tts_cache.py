@@ -0,0 +1,101 @@
+import logging
+import os
+import tempfile
+import threading
+
+from viddit.utils.disk_cache import DiskLRUCache, make_key
+
+logger = logging.getLogger(__name__)
+
+TTS_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "viddit", "tts")
+TTS_CACHE_MAX_MB = 256
+AUDIO_FILE = "audio"
+# synthesize_with_marks always returns LINEAR16, whatever the module's own encoding
+MARKED_ENCODING = "LINEAR16"
+
+
+class CachedTTS:
+    """Wraps a TTS module so identical requests are served from disk instead of being synthesised again.
+
+    Requests are keyed on their text, language, voice, speaking rate, pitch and the module's audio encoding,
+    and the audio is kept in a size bounded DiskLRUCache shared between runs. SSML requests through
+    synthesize_with_marks are cached whole, with their timepoints, so a rerun splits them the same way.
+    Parameters
+    ----------
+    tts_module : object
+        Anything with a text_to_speech(text, output_path, language_code, voice_name, speaking_rate, pitch) method
+    directory : str, optional
+        Where the audio is kept, by default TTS_CACHE_DIR
+    max_mb : int, optional
+        Size the cache may grow to before the least recently used audio is evicted, by default TTS_CACHE_MAX_MB
+    """
+
+    def __init__(self, tts_module, directory=TTS_CACHE_DIR, max_mb=TTS_CACHE_MAX_MB):
+        self.tts_module = tts_module
+        self.cache = DiskLRUCache(directory, max_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        # Anything else, e.g. list_voices, goes to the wrapped module
+        if name == "tts_module":
+            raise AttributeError(name)
+        return getattr(self.tts_module, name)
+
+    def text_to_speech(
+        self, input_text, output_filename, language_code="en-US", voice_name="en-US-Wavenet-A", speaking_rate=1.0, pitch=0.0, audio_encoding=None
+    ):
+        encoding = audio_encoding or getattr(self.tts_module, "audio_encoding", None)
+        key = make_key(input_text, language_code, voice_name, float(speaking_rate), float(pitch), encoding)
+        if self.cache.copy_out(key, lambda metadata: {AUDIO_FILE: output_filename}) is not None:
+            with self._lock:
+                self.hits += 1
+            logger.debug(f"TTS cache hit for {output_filename}")
+            return
+        with self._lock:
+            self.misses += 1
+        kwargs = {"audio_encoding": audio_encoding} if audio_encoding else {}
+        self.tts_module.text_to_speech(
+            input_text, output_filename, language_code=language_code, voice_name=voice_name, speaking_rate=speaking_rate, pitch=pitch, **kwargs
+        )
+        try:
+            self.cache.put(key, {AUDIO_FILE: output_filename}, {"voice_name": voice_name, "characters": len(input_text)})
+        except OSError as e:
+            logger.warning(f"Could not cache the audio of {output_filename}: {e}")
+
+    def synthesize_with_marks(self, ssml, language_code="en-US", voice_name="en-US-Wavenet-A", speaking_rate=1.0, pitch=0.0):
+        """Cached equivalent of GoogleCloudTTS.synthesize_with_marks, returning the WAV bytes and every <mark>'s offset"""
+        key = make_key("ssml", ssml, language_code, voice_name, float(speaking_rate), float(pitch), MARKED_ENCODING)
+        with tempfile.TemporaryDirectory(prefix="viddit_tts_") as work_dir:
+            wav_path = os.path.join(work_dir, "marked.wav")
+            entry = self.cache.copy_out(key, lambda metadata: {AUDIO_FILE: wav_path})
+            if entry is not None:
+                with self._lock:
+                    self.hits += 1
+                with open(wav_path, "rb") as f:
+                    return f.read(), entry.metadata["timepoints"]
+            with self._lock:
+                self.misses += 1
+            wav_bytes, timepoints = self.tts_module.synthesize_with_marks(
+                ssml, language_code=language_code, voice_name=voice_name, speaking_rate=speaking_rate, pitch=pitch
+            )
+            try:
+                with open(wav_path, "wb") as f:
+                    f.write(wav_bytes)
+                self.cache.put(key, {AUDIO_FILE: wav_path}, {"voice_name": voice_name, "characters": len(ssml), "timepoints": timepoints})
+            except OSError as e:
+                logger.warning(f"Could not cache the audio of an SSML request: {e}")
+        return wav_bytes, timepoints
+
+    def stats(self):
+        """Returns the hits, misses and hit rate so far, and the size of the cache"""
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / requests if requests else 0.0,
+                "entries": len(self.cache),
+                "megabytes": self.cache.total_bytes / (1024 * 1024),
+            }
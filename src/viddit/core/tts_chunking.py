@@ -0,0 +1,157 @@
+import logging
+import os
+import re
+import shutil
+import tempfile
+import wave
+from concurrent.futures import ThreadPoolExecutor
+
+from viddit.utils.ffmpeg_utils import run_ffmpeg
+
+logger = logging.getLogger(__name__)
+
+# Google Text-to-Speech rejects requests whose input is over 5000 bytes
+MAX_INPUT_BYTES = 5000
+# Smaller chunks finish sooner, so a long text is not held up by one slow request
+DEFAULT_CHUNK_BYTES = 1500
+
+# How the joined samples are encoded for each audio encoding the wrapped module may be asked for
+_ENCODER_ARGS = {
+    "MP3": ["-c:a", "libmp3lame", "-q:a", 2, "-f", "mp3"],
+    "OGG_OPUS": ["-c:a", "libopus", "-f", "ogg"],
+}
+
+# Tried in order until every piece fits, paragraphs first, then lines, sentences and finally words
+_SEPARATORS = [
+    (re.compile(r"\n\s*\n"), "\n\n"),
+    (re.compile(r"\n"), "\n"),
+    (re.compile(r"(?<=[.!?…])\s+|(?<=[.!?…][\"')\]])\s+"), " "),
+    (re.compile(r"\s+"), " "),
+]
+
+
+def _byte_length(text):
+    return len(text.encode("utf-8"))
+
+
+def _pack(pieces, joiner, max_bytes):
+    """Greedily joins consecutive pieces while they stay within max_bytes"""
+    chunks = []
+    for piece in pieces:
+        if chunks and _byte_length(chunks[-1] + joiner + piece) <= max_bytes:
+            chunks[-1] += joiner + piece
+        else:
+            chunks.append(piece)
+    return chunks
+
+
+def _split_characters(text, max_bytes):
+    chunks = [""]
+    for character in text:
+        if _byte_length(chunks[-1] + character) > max_bytes:
+            chunks.append("")
+        chunks[-1] += character
+    return chunks
+
+
+def _split_to_fit(text, max_bytes, separators):
+    if _byte_length(text) <= max_bytes:
+        return [text]
+    if not separators:
+        # A single word over the budget, nothing better than splitting it
+        return _split_characters(text, max_bytes)
+    pattern, joiner = separators[0]
+    pieces = [piece.strip() for piece in pattern.split(text) if piece.strip()]
+    return _pack([fitted for piece in pieces for fitted in _split_to_fit(piece, max_bytes, separators[1:])], joiner, max_bytes)
+
+
+def split_text(text, max_bytes=DEFAULT_CHUNK_BYTES):
+    """Splits text into chunks of at most max_bytes of UTF-8, breaking at paragraphs where it can and at sentences,
+    then words, where it must. Consecutive pieces are packed together so there are as few chunks as possible.
+    """
+    if max_bytes > MAX_INPUT_BYTES:
+        raise ValueError(f"max_bytes must be at most {MAX_INPUT_BYTES}")
+    text = text.strip()
+    if not text:
+        return []
+    return _split_to_fit(text, max_bytes, _SEPARATORS)
+
+
+def concatenate_wavs(wav_paths, output_path):
+    """Joins WAV files with the same format by concatenating their samples, so there is nothing to smear at the seams"""
+    with wave.open(output_path, "wb") as output:
+        for k, wav_path in enumerate(wav_paths):
+            with wave.open(wav_path, "rb") as chunk:
+                params = chunk.getparams()
+                if k == 0:
+                    output.setnchannels(params.nchannels)
+                    output.setsampwidth(params.sampwidth)
+                    output.setframerate(params.framerate)
+                elif (params.nchannels, params.sampwidth, params.framerate) != (output.getnchannels(), output.getsampwidth(), output.getframerate()):
+                    raise ValueError(f"{wav_path} does not match the format of {wav_paths[0]}")
+                output.writeframes(chunk.readframes(params.nframes))
+
+
+def encode_wav(wav_path, output_path, encoding):
+    """Encodes a WAV file to one of the Text-to-Speech audio encodings, LINEAR16 is moved into place as it is"""
+    if encoding == "LINEAR16":
+        shutil.move(wav_path, output_path)
+    else:
+        run_ffmpeg(["-i", wav_path] + _ENCODER_ARGS[encoding] + [output_path])
+
+
+class ChunkedTTS:
+    """Wraps a TTS module so long texts are split into chunks that are synthesised in parallel and joined in order.
+
+    Texts within the chunk budget go straight to the wrapped module. Longer ones are synthesised as LINEAR16,
+    their samples concatenated and the result encoded once, so the seams carry no encoder padding or artefacts.
+    Parameters
+    ----------
+    tts_module : object
+        Anything with text_to_speech(text, output_path, language_code, voice_name, speaking_rate, pitch, audio_encoding)
+    max_bytes : int, optional
+        Largest chunk sent in one request, by default DEFAULT_CHUNK_BYTES
+    workers : int, optional
+        Chunks of one text in flight at once, by default 4
+    """
+
+    def __init__(self, tts_module, max_bytes=DEFAULT_CHUNK_BYTES, workers=4):
+        if max_bytes > MAX_INPUT_BYTES:
+            raise ValueError(f"max_bytes must be at most {MAX_INPUT_BYTES}")
+        self.tts_module = tts_module
+        self.max_bytes = max_bytes
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tts-chunk")
+
+    def __getattr__(self, name):
+        if name == "tts_module":
+            raise AttributeError(name)
+        return getattr(self.tts_module, name)
+
+    def text_to_speech(
+        self, input_text, output_filename, language_code="en-US", voice_name="en-US-Wavenet-A", speaking_rate=1.0, pitch=0.0, audio_encoding=None
+    ):
+        kwargs = dict(language_code=language_code, voice_name=voice_name, speaking_rate=speaking_rate, pitch=pitch)
+        chunks = split_text(input_text, self.max_bytes)
+        if len(chunks) <= 1:
+            if audio_encoding:
+                kwargs["audio_encoding"] = audio_encoding
+            return self.tts_module.text_to_speech(input_text, output_filename, **kwargs)
+
+        logger.debug(f"Synthesising {_byte_length(input_text)} bytes of text as {len(chunks)} chunks for {output_filename}")
+        work_dir = tempfile.mkdtemp(prefix="viddit_tts_", dir=os.path.dirname(os.path.abspath(output_filename)))
+        try:
+            chunk_paths = [os.path.join(work_dir, f"{k}.wav") for k in range(len(chunks))]
+            futures = [
+                self._executor.submit(self.tts_module.text_to_speech, chunk, chunk_path, audio_encoding="LINEAR16", **kwargs)
+                for chunk, chunk_path in zip(chunks, chunk_paths)
+            ]
+            for future in futures:
+                future.result()
+            joined_path = os.path.join(work_dir, "joined.wav")
+            concatenate_wavs(chunk_paths, joined_path)
+            encode_wav(joined_path, output_filename, audio_encoding or getattr(self.tts_module, "audio_encoding", "MP3"))
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    def close(self):
+        self._executor.shutdown()
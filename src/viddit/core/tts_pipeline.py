@@ -0,0 +1,154 @@
+import logging
+import queue
+import threading
+from dataclasses import dataclass
+
+from google.api_core.exceptions import GoogleAPIError
+
+from viddit.core.tts_ssml import supports_marks, synthesize_segments
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class TTSJob:
+    """One piece of text to narrate into an audio file"""
+
+    index: int
+    text: str
+    output_path: str
+    voice_name: str
+
+
+class TTSBatch:
+    """The TTS jobs of one post, which can be waited on separately from other posts sharing the pipeline"""
+
+    def __init__(self, pipeline):
+        self._pipeline = pipeline
+        self._pending = 0
+        self._errors = []
+        self._condition = threading.Condition()
+
+    def submit(self, index, text, output_path, voice_name):
+        """Queues a job and returns straight away, the audio is written by a worker"""
+        with self._condition:
+            self._pending += 1
+        self._pipeline._jobs.put((self, TTSJob(index, text, output_path, voice_name)))
+
+    def _job_done(self, job, error=None):
+        with self._condition:
+            self._pending -= 1
+            if error is not None:
+                self._errors.append((job, error))
+            self._condition.notify_all()
+
+    def wait(self, raise_errors=True):
+        """Blocks until every submitted job has finished, raising if any of them failed"""
+        with self._condition:
+            self._condition.wait_for(lambda: self._pending == 0)
+            errors = list(self._errors)
+        if errors and raise_errors:
+            failed = ", ".join(str(job.index) for job, _ in errors)
+            raise RuntimeError(f"Text to speech failed for job(s) {failed}") from errors[0][1]
+
+    def abandon(self):
+        """Waits for the jobs already under way without raising, for when the post is being given up on"""
+        self.wait(raise_errors=False)
+
+
+class MarkedTTSBatch(TTSBatch):
+    """A batch that holds its jobs until wait and then narrates them all with one SSML request split at <mark>s.
+
+    Every segment is read in the first job's voice. If the document is too long for one request, a mark is
+    missing from the response, or the API returns an error, the jobs go through the pipeline's workers one
+    request each. TTSPipeline only makes these batches for clients that can report marks.
+    """
+
+    def __init__(self, pipeline):
+        super().__init__(pipeline)
+        self._held = []
+
+    def submit(self, index, text, output_path, voice_name):
+        """Holds a job until wait, returning straight away"""
+        self._held.append(TTSJob(index, text, output_path, voice_name))
+
+    def wait(self, raise_errors=True):
+        jobs, self._held = sorted(self._held, key=lambda job: job.index), []
+        if jobs:
+            try:
+                synthesize_segments(self._pipeline.tts_module, jobs, self._pipeline.language_code, self._pipeline.speaking_rate)
+                logger.debug(f"Narrated {len(jobs)} segments with one SSML request")
+            except (ValueError, GoogleAPIError) as e:
+                logger.warning(f"Falling back to a text to speech request per segment: {e}")
+                for job in jobs:
+                    super().submit(job.index, job.text, job.output_path, job.voice_name)
+        super().wait(raise_errors)
+
+    def abandon(self):
+        # Held jobs have not started, there is nothing to narrate for a post being given up on
+        self._held = []
+        super().wait(raise_errors=False)
+
+
+class TTSPipeline:
+    """A pool of worker threads narrating queued text, so network bound TTS calls overlap with browser work
+    Parameters
+    ----------
+    tts_module : object
+        Anything with a text_to_speech(text, output_path, language_code, voice_name, speaking_rate) method
+    workers : int, optional
+        Number of requests in flight at once, by default 4
+    language_code : str, optional
+        Language of every job, by default "en-US"
+    speaking_rate : float, optional
+        Speaking rate of every job, by default 1.25
+    ssml_marks : bool, optional
+        Narrate each batch with a single SSML request split at <mark>s, see MarkedTTSBatch, by default False
+    """
+
+    def __init__(self, tts_module, workers=4, language_code="en-US", speaking_rate=1.25, ssml_marks=False):
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        self.tts_module = tts_module
+        self.language_code = language_code
+        self.speaking_rate = speaking_rate
+        self.ssml_marks = ssml_marks
+        if ssml_marks and not supports_marks(tts_module):
+            logger.warning(f"{type(tts_module).__name__} cannot report <mark> timepoints, narrating a request per segment instead")
+            self.ssml_marks = False
+        self._jobs = queue.Queue()
+        self._workers = [threading.Thread(target=self._work, name=f"tts-{k}", daemon=True) for k in range(workers)]
+        for worker in self._workers:
+            worker.start()
+
+    def batch(self):
+        """Starts a new batch of jobs"""
+        return MarkedTTSBatch(self) if self.ssml_marks else TTSBatch(self)
+
+    def _work(self):
+        while True:
+            item = self._jobs.get()
+            if item is None:
+                return
+            batch, job = item
+            try:
+                logger.debug(f"Performing TTS for job {job.index}, text: {job.text}")
+                self.tts_module.text_to_speech(
+                    job.text,
+                    job.output_path,
+                    language_code=self.language_code,
+                    voice_name=job.voice_name,
+                    speaking_rate=self.speaking_rate,
+                )
+            except Exception as e:
+                logger.error(f"Text to speech failed for job {job.index}: {e}")
+                batch._job_done(job, e)
+            else:
+                batch._job_done(job)
+
+    def close(self):
+        """Finishes the queued jobs and stops the workers"""
+        for _ in self._workers:
+            self._jobs.put(None)
+        for worker in self._workers:
+            worker.join()
@@ -0,0 +1,75 @@
+import io
+import logging
+import os
+import wave
+from xml.sax.saxutils import escape
+
+from viddit.core.tts_chunking import MAX_INPUT_BYTES, encode_wav
+
+logger = logging.getLogger(__name__)
+
+MARK_PREFIX = "segment_"
+
+
+def supports_marks(tts_module):
+    """Whether the client under any wrappers, e.g. CachedTTS or ChunkedTTS, can report <mark> timepoints.
+
+    The wrappers forward unknown attributes to what they wrap, so hasattr on them is always true.
+    """
+    while "tts_module" in vars(tts_module):
+        tts_module = tts_module.tts_module
+    return callable(getattr(tts_module, "synthesize_with_marks", None))
+
+
+def build_ssml(texts):
+    """Joins texts into one SSML document with a <mark> in front of each, returning the document and the mark names"""
+    mark_names = [f"{MARK_PREFIX}{k}" for k in range(len(texts))]
+    body = "\n".join(f'<mark name="{mark_name}"/>{escape(text)}' for mark_name, text in zip(mark_names, texts))
+    return f"<speak>{body}</speak>", mark_names
+
+
+def fits_in_one_request(ssml):
+    return len(ssml.encode("utf-8")) <= MAX_INPUT_BYTES
+
+
+def split_wav_at_offsets(wav_bytes, offsets, output_paths, encoding="MP3"):
+    """Cuts WAV audio into one file per segment, segment k running from offsets[k] to offsets[k + 1] seconds.
+
+    The first segment also keeps any audio before its offset and the last runs to the end, so no sample is lost.
+    """
+    with wave.open(io.BytesIO(wav_bytes), "rb") as audio:
+        params = audio.getparams()
+        samples = audio.readframes(params.nframes)
+    frame_size = params.sampwidth * params.nchannels
+    boundaries = [0] + [min(params.nframes, round(offset * params.framerate)) for offset in offsets[1:]] + [params.nframes]
+    for k, output_path in enumerate(output_paths):
+        wav_path = output_path if encoding == "LINEAR16" else os.path.splitext(output_path)[0] + ".segment.wav"
+        with wave.open(wav_path, "wb") as segment:
+            segment.setnchannels(params.nchannels)
+            segment.setsampwidth(params.sampwidth)
+            segment.setframerate(params.framerate)
+            segment.writeframes(samples[boundaries[k] * frame_size : boundaries[k + 1] * frame_size])
+        if wav_path != output_path:
+            try:
+                encode_wav(wav_path, output_path, encoding)
+            finally:
+                os.remove(wav_path)
+
+
+def synthesize_segments(tts_module, jobs, language_code="en-US", speaking_rate=1.0):
+    """Narrates TTSJobs with a single SSML request in the first job's voice, split into each job's output file.
+
+    Raises ValueError if the document is over the API's input limit or a mark is missing from the response,
+    in which case the caller should fall back to a request per job.
+    """
+    ssml, mark_names = build_ssml([job.text for job in jobs])
+    if not fits_in_one_request(ssml):
+        raise ValueError(f"The SSML for {len(jobs)} segments is over {MAX_INPUT_BYTES} bytes")
+    wav_bytes, timepoints = tts_module.synthesize_with_marks(
+        ssml, language_code=language_code, voice_name=jobs[0].voice_name, speaking_rate=speaking_rate
+    )
+    missing = [mark_name for mark_name in mark_names if mark_name not in timepoints]
+    if missing:
+        raise ValueError(f"The response has no timepoints for {', '.join(missing)}")
+    offsets = [timepoints[mark_name] for mark_name in mark_names]
+    split_wav_at_offsets(wav_bytes, offsets, [job.output_path for job in jobs], getattr(tts_module, "audio_encoding", "MP3"))
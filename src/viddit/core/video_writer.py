@@ -1,97 +1,247 @@
 import logging
+import multiprocessing
 import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
 import cv2
-import numpy as np
 from moviepy.editor import AudioFileClip, concatenate_videoclips
 from moviepy.video.io.ImageSequenceClip import ImageSequenceClip
-import random
+
+from viddit.core.audio import assemble_narration
+from viddit.core.background import PROXY_CACHE_DIR, BackgroundFrameSource, get_background_proxy
+from viddit.core.compositor import OverlayCompositor
+from viddit.core.ffmpeg_writer import DEFAULT_PROFILE_NAME, FFmpegWriter, profile_output_path
+from viddit.core.filtergraph_backend import FilterGraphBackend
+from viddit.core.timeline import build_timeline
+from viddit.utils.ffmpeg_utils import concat_files
 
 logger = logging.getLogger(__name__)
 
-def generate_video_from_content(background_video_path, png_paths, audio_paths, output_name="output.mp4", wait_time=2):
+# "moviepy" keeps every frame in memory and lets moviepy encode, "stream" pipes each frame straight into ffmpeg,
+# "parallel" streams every segment from its own process and joins them without re-encoding,
+# "filtergraph" hands the whole timeline to a single ffmpeg invocation with no Python frame loop
+RENDER_MODES = ["moviepy", "stream", "parallel", "filtergraph"]
+
+
+def generate_video_from_content(
+    background_video_path,
+    png_paths,
+    audio_paths,
+    output_name="output.mp4",
+    wait_time=2,
+    render_mode="moviepy",
+    max_workers=None,
+    output_size=None,
+    use_background_proxy=True,
+    proxy_cache_dir=PROXY_CACHE_DIR,
+    output_profiles=None,
+    encoder_settings=None,
+    background_start_frame=None,
+):
+    """Renders the cards and narration over the background, returning a dict of profile name to output path.
+
+    With output_profiles every variant is encoded from the same decode and compositing pass, and the
+    background is rendered at the largest profile's resolution unless output_size is given. encoder_settings,
+    e.g. the tuner's from load_encoder_settings, apply to every output except where a profile sets its own
+    preset or crf. Nothing is loaded implicitly, so a render does not depend on the machine's saved settings.
+    The background starts on a random frame unless background_start_frame pins it.
+    """
+    backend = get_render_backend(render_mode, max_workers=max_workers, encoder_settings=encoder_settings)
+    if output_profiles and output_size is None:
+        sized_profiles = [profile for profile in output_profiles if profile.width and profile.height]
+        if sized_profiles:
+            largest = max(sized_profiles, key=lambda profile: profile.width * profile.height)
+            output_size = (largest.width, largest.height)
     # Check background video exists
     if not os.path.exists(background_video_path):
         raise FileNotFoundError(f"Background video {background_video_path} does not exist.")
-    
-    # Open the background video file
-    cap = cv2.VideoCapture(background_video_path)
+    if use_background_proxy:
+        # Seeking and decoding a dense-keyframe proxy at the output resolution is far cheaper than the source
+        background_video_path = get_background_proxy(background_video_path, output_size=output_size, cache_dir=proxy_cache_dir)
+    elif output_size is not None:
+        raise ValueError("output_size requires use_background_proxy, the background is otherwise rendered at its own resolution")
+
     logger.info(f"Generating video from {len(png_paths)} images and {len(audio_paths)} audio files")
-    # Get the video properties
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-    logger.debug(f"Video properties: {fps} fps, {width}x{height} pixels")
-
-
-    all_audio = [AudioFileClip(audio_path) for audio_path in audio_paths]
-    total_audio_duration = sum([audio.duration for audio in all_audio]) + len(audio_paths) * wait_time
-    total_video_duration = cap.get(cv2.CAP_PROP_FRAME_COUNT) / cap.get(cv2.CAP_PROP_FPS)
-        
-    # Choose a random starting point for the background video
-    max_start_time = total_video_duration - total_audio_duration
-    if max_start_time > 0:
-        random_start_time = random.uniform(0, max_start_time)
-    else:
-        random_start_time = 0
-    # Set the starting frame for the background video
-    start_frame = int(random_start_time * cap.get(cv2.CAP_PROP_FPS))
-    cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
-    
-    clips = []
-    total_frames = 0
-    for j in range(len(png_paths)):
-        # Read the PNG image to be overlayed
-        png = cv2.imread(png_paths[j], cv2.IMREAD_UNCHANGED)
+    timeline = build_timeline(background_video_path, png_paths, audio_paths, wait_time=wait_time, background_start_frame=background_start_frame)
+    return backend.render(timeline, output_name, output_profiles=output_profiles)
 
-        # Calculate the total number of frames to display the PNG image using the audio duration
-        audio_clip = all_audio[j]
-        expected_duration = all_audio[j].duration + wait_time
-        num_frames = int(expected_duration * fps)
 
-        # Calculate the coordinates to place the PNG image in the center of the video frame
-        png_height, png_width, png_channels = png.shape
-        x = int((width - png_width) / 2)
-        y = int((height - png_height) / 2)
+def get_render_backend(render_mode, max_workers=None, encoder_settings=None):
+    """Returns the backend that executes timelines for the given render mode with the given encoder settings"""
+    if render_mode not in RENDER_MODES:
+        raise ValueError(f"render_mode must be one of {RENDER_MODES}")
+    if render_mode == "filtergraph":
+        return FilterGraphBackend(encoder_settings)
+    return OpenCVBackend(render_mode, max_workers=max_workers, encoder_settings=encoder_settings)
 
-        # Create a mask for the PNG image alpha channel
-        alpha_mask = png[:, :, 3] / 255.0
 
-        # Extract the RGB channels of the PNG image
-        png_rgb = png[:, :, :3]
-        frames = []
-        logger.info(f"Creating clip {j} of {len(png_paths)}, there are {num_frames} frames.")
-        for i in range(num_frames):
-            logger.debug(f"Frame {str(i)} of {str(num_frames)}")
-            ret, frame = cap.read()
-            if ret:
-                # Overlay the PNG image on the video frame using the alpha mask and NumPy operations
-                frame[y:y+png_height, x:x+png_width, :3] = np.where(
-                    alpha_mask[..., np.newaxis],
-                    png_rgb,
-                    frame[y:y+png_height, x:x+png_width, :3]
-                )
+class OpenCVBackend:
+    """Executes a timeline by decoding the background with OpenCV and compositing every frame in Python.
+
+    The frames are then encoded by moviepy, streamed to ffmpeg, or rendered per segment in a process pool.
+    """
+
+    def __init__(self, mode="moviepy", max_workers=None, encoder_settings=None):
+        if mode not in ["moviepy", "stream", "parallel"]:
+            raise ValueError("mode must be 'moviepy', 'stream' or 'parallel'")
+        self.mode = mode
+        self.max_workers = max_workers
+        self.encoder_settings = encoder_settings or {}
 
-                # Add the frame to the list of frames
-                frames.append(frame)
-            else:
+    def render(self, timeline, output_name, output_profiles=None):
+        if output_profiles and self.mode == "moviepy":
+            raise ValueError("Output profiles need one of the ffmpeg based render modes")
+        # The narration is padded to whole frames so audio and video stay in sync across segments.
+        # moviepy re-encodes the audio anyway so it gets PCM, the ffmpeg modes get AAC they can mux without re-encoding
+        narration_path = os.path.splitext(output_name)[0] + (".narration.wav" if self.mode == "moviepy" else ".narration.m4a")
+        assemble_narration(
+            [segment.audio_path for segment in timeline.segments],
+            [timeline.segment_duration(segment) for segment in timeline.segments],
+            narration_path,
+        )
+        try:
+            if self.mode == "parallel":
+                return _render_parallel(timeline, narration_path, output_name, self.max_workers, output_profiles, self.encoder_settings)
+            # Decode the background ahead on its own thread from the starting frame, looping if the narration outlasts it
+            with BackgroundFrameSource(timeline.background.path, timeline.background_start_frame) as source:
+                if self.mode == "stream":
+                    return _stream_video(source, timeline, narration_path, output_name, output_profiles, self.encoder_settings)
+                _moviepy_video(source, timeline, narration_path, output_name, self.encoder_settings)
+                return {DEFAULT_PROFILE_NAME: output_name}
+        finally:
+            os.remove(narration_path)
+
+
+def _moviepy_video(source, timeline, narration_path, output_name, encoder_settings=None):
+    """Collects every composited frame in memory and lets moviepy encode them"""
+    clips = []
+    total_frames = 0
+    for j, segment in enumerate(timeline.segments):
+        # Read the PNG image to be overlayed, the compositor centres it in the video frame
+        compositor = OverlayCompositor.from_file(segment.png_path, timeline.width, timeline.height)
+
+        frames = []
+        logger.info(f"Creating clip {j} of {len(timeline.segments)}, there are {segment.num_frames} frames.")
+        for i in range(segment.num_frames):
+            logger.debug(f"Frame {str(i)} of {str(segment.num_frames)}")
+            frame = source.read()
+            if frame is None:
                 break
+            # Add a copy of the frame to the list of frames, the source reuses its buffers
+            frames.append(compositor.apply(frame.copy()))
         total_frames += len(frames)
 
-        # create_video(f"temp_{str(i)}.mp4")
-        video_clip = ImageSequenceClip(frames, fps=fps).set_audio(all_audio[j])
-        clips.append(video_clip)
-        del video_clip
-    del all_audio
-    logger.info(f"Concatenating clips and writing file to {output_name}, expected length: {str(total_frames / fps)} seconds")
-    result_clip = concatenate_videoclips(clips)
-    result_clip.write_videofile(output_name)
+        clips.append(ImageSequenceClip(frames, fps=timeline.fps))
+    logger.info(f"Concatenating clips and writing file to {output_name}, expected length: {str(total_frames / timeline.fps)} seconds")
+    narration = AudioFileClip(narration_path)
+    result_clip = concatenate_videoclips(clips).set_audio(narration)
+    # moviepy would otherwise put its temporary audio in the working directory, where concurrent renders collide
+    temp_audiofile = os.path.splitext(output_name)[0] + ".temp_audio.mp3"
+    result_clip.write_videofile(output_name, temp_audiofile=temp_audiofile, **_moviepy_encoder_kwargs(encoder_settings or {}))
     result_clip.close()
-    cap.release()
-    del cap
+    narration.close()
     del result_clip
     del clips
 
 
+def _moviepy_encoder_kwargs(encoder_settings):
+    """Translates writer encoder settings into write_videofile arguments, moviepy's defaults are kept for anything unset"""
+    kwargs = {key: encoder_settings[key] for key in ["codec", "preset", "threads"] if encoder_settings.get(key)}
+    if "crf" in encoder_settings:
+        kwargs["ffmpeg_params"] = ["-crf", str(encoder_settings["crf"])]
+    return kwargs
+
+
+def _composited_frames(source, png_path, width, height, num_frames):
+    """Yields up to num_frames background frames from source with the PNG overlaid, stopping early if a non-looping background runs out.
+
+    Each frame is only valid until the next one is requested.
+    """
+    compositor = OverlayCompositor.from_file(png_path, width, height)
+    for i in range(num_frames):
+        frame = source.read()
+        if frame is None:
+            logger.warning(f"Background video ran out after {i} of {num_frames} frames")
+            return
+        yield compositor.apply(frame)
+
+
+def _stream_video(source, timeline, narration_path, output_name, output_profiles=None, encoder_settings=None):
+    """Composites each frame and pipes it straight to ffmpeg, so memory use does not grow with the video length"""
+    logger.info(f"Streaming {timeline.total_frames} frames to {output_name}, expected length: {str(timeline.duration)} seconds")
+    with FFmpegWriter(
+        output_name,
+        timeline.width,
+        timeline.height,
+        timeline.fps,
+        audio_path=narration_path,
+        output_profiles=output_profiles,
+        **(encoder_settings or {}),
+    ) as writer:
+        for j, segment in enumerate(timeline.segments):
+            logger.info(f"Streaming clip {j} of {len(timeline.segments)}, there are {segment.num_frames} frames.")
+            for frame in _composited_frames(source, segment.png_path, timeline.width, timeline.height, segment.num_frames):
+                writer.write_frame(frame)
+    return writer.output_paths
+
+
+def _render_segment(background_video_path, png_path, start_frame, num_frames, fps, width, height, segment_path, output_profiles, encoder_settings):
+    """Renders the video of one segment in a worker process, decoding its own copy of the background"""
+    with BackgroundFrameSource(background_video_path, start_frame) as source:
+        with FFmpegWriter(segment_path, width, height, fps, output_profiles=output_profiles, **encoder_settings) as writer:
+            for frame in _composited_frames(source, png_path, width, height, num_frames):
+                writer.write_frame(frame)
+    return segment_path
+
+
+def _render_parallel(timeline, narration_path, output_name, max_workers=None, output_profiles=None, encoder_settings=None):
+    """Renders every segment in a process pool and joins them with a stream copy concat, muxing in the narration.
+
+    With output_profiles each worker encodes its segment once per profile and each profile is joined separately.
+    """
+    segments = timeline.segments
+    cpu_count = os.cpu_count() or 1
+    workers = max_workers or min(len(segments), cpu_count)
+    # Share the cores between the encoders rather than letting every libx264 instance spawn a thread per core
+    encoder_settings = dict(encoder_settings or {}, threads=max(1, cpu_count // workers))
+    segment_dir = tempfile.mkdtemp(prefix="viddit_segments_", dir=os.path.dirname(os.path.abspath(output_name)))
+    segment_paths = [os.path.join(segment_dir, f"segment_{j}.mp4") for j in range(len(segments))]
+    logger.info(f"Rendering {len(segments)} segments with {workers} workers, {timeline.total_frames} frames in total.")
+    try:
+        # Spawn rather than fork so workers do not inherit the parent's decoder and thread state
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+            futures = [
+                executor.submit(
+                    _render_segment,
+                    timeline.background.path,
+                    segment.png_path,
+                    timeline.background_frame(segment),
+                    segment.num_frames,
+                    timeline.fps,
+                    timeline.width,
+                    timeline.height,
+                    segment_path,
+                    output_profiles,
+                    encoder_settings,
+                )
+                for segment, segment_path in zip(segments, segment_paths)
+            ]
+            for future in futures:
+                future.result()
+        if not output_profiles:
+            logger.info(f"Concatenating {len(segment_paths)} segments into {output_name}")
+            concat_files(segment_paths, output_name, audio_path=narration_path)
+            return {DEFAULT_PROFILE_NAME: output_name}
+        output_paths = {}
+        for profile in output_profiles:
+            output_paths[profile.name] = profile_output_path(output_name, profile)
+            logger.info(f"Concatenating {len(segment_paths)} segments into {output_paths[profile.name]}")
+            concat_files([profile_output_path(path, profile) for path in segment_paths], output_paths[profile.name], audio_path=narration_path)
+        return output_paths
+    finally:
+        shutil.rmtree(segment_dir, ignore_errors=True)
 
 
 def create_video(frames, output, fps=30):
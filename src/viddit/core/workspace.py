@@ -0,0 +1,122 @@
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+TMPFS_ROOT = "/dev/shm"
+# A job needs its cards, narration and every rendered profile at once, so this much tmpfs is reserved for every
+# live workspace there and a new one only goes on tmpfs if it still has this much room on top
+MIN_FREE_MB = 1024
+MB = 1024 * 1024
+
+
+def dir_size(path):
+    """Total size of the files under path in bytes"""
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+class JobWorkspace:
+    """A directory belonging to a single job, holding its scraped artifacts and rendered output
+    Parameters
+    ----------
+    path : str
+        The job's directory
+    layout : dict
+        Directory keys to paths relative to path, e.g. {"post_audio": "post/audio"}
+    """
+
+    def __init__(self, path, layout):
+        self.path = path
+        self.directories = {key: os.path.join(path, relative_path) for key, relative_path in layout.items()}
+        for directory in self.directories.values():
+            os.makedirs(directory, exist_ok=True)
+
+    def file(self, name):
+        """Path of a file at the top of the workspace"""
+        return os.path.join(self.path, name)
+
+    def disk_usage(self):
+        return dir_size(self.path)
+
+    def cleanup(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+class WorkspaceManager:
+    """Hands every job a workspace of its own, on tmpfs when it has room and on disk otherwise, so jobs running
+    at the same time never share a path
+    Parameters
+    ----------
+    disk_root : str
+        Where workspaces go when tmpfs is unavailable or full
+    layout : dict
+        Directory keys to relative paths created in every workspace
+    tmpfs_root : str, optional
+        A tmpfs mount to put workspaces on, by default TMPFS_ROOT, None always uses disk_root
+    min_free_mb : int, optional
+        Space reserved on tmpfs for each workspace, less what it has already written, by default MIN_FREE_MB
+    keep : bool, optional
+        Leave workspaces in place when their job ends, for debugging, by default False
+    """
+
+    def __init__(self, disk_root, layout, tmpfs_root=TMPFS_ROOT, min_free_mb=MIN_FREE_MB, keep=False):
+        self.disk_root = disk_root
+        self.layout = layout
+        self.tmpfs_root = tmpfs_root
+        self.min_free_mb = min_free_mb
+        self.keep = keep
+        self.usage = {}  # Job name -> bytes its workspace held when it ended
+        self._tmpfs_workspaces = set()  # Live workspaces on tmpfs, still to write the rest of their reservation
+        self._lock = threading.Lock()
+
+    def _reserved_bytes(self):
+        return sum(max(0, self.min_free_mb * MB - workspace.disk_usage()) for workspace in self._tmpfs_workspaces)
+
+    def _pick_root(self):
+        if self.tmpfs_root and os.path.isdir(self.tmpfs_root) and os.access(self.tmpfs_root, os.W_OK):
+            free_mb = (shutil.disk_usage(self.tmpfs_root).free - self._reserved_bytes()) / MB
+            if free_mb >= self.min_free_mb:
+                return os.path.join(self.tmpfs_root, "viddit")
+            logger.info(f"Only {free_mb:.0f} MB unreserved on {self.tmpfs_root}, using {self.disk_root} for the next workspace")
+        return self.disk_root
+
+    def create(self, name):
+        """Creates a fresh workspace for the job called name, the caller is responsible for releasing it"""
+        # Held while the workspace is made, so jobs starting together can't both claim the last of tmpfs
+        with self._lock:
+            root = self._pick_root()
+            os.makedirs(root, exist_ok=True)
+            workspace = JobWorkspace(tempfile.mkdtemp(prefix=f"{name}_", dir=root), self.layout)
+            if root != self.disk_root:
+                self._tmpfs_workspaces.add(workspace)
+        logger.debug(f"Created workspace {workspace.path} for {name}")
+        return workspace
+
+    def release(self, name, workspace):
+        """Records how much the job's workspace held and removes it unless keep is set"""
+        usage = workspace.disk_usage()
+        with self._lock:
+            self.usage[name] = usage
+            self._tmpfs_workspaces.discard(workspace)
+        logger.info(f"Job {name} used {usage / MB:.1f} MB in {workspace.path}")
+        if not self.keep:
+            workspace.cleanup()
+
+    @contextmanager
+    def job(self, name):
+        """Yields a workspace for the job called name, released when the block exits however it exits"""
+        workspace = self.create(name)
+        try:
+            yield workspace
+        finally:
+            self.release(name, workspace)
+
+    def summary(self):
+        with self._lock:
+            if not self.usage:
+                return "no jobs"
+            return f"{len(self.usage)} jobs, {sum(self.usage.values()) / MB:.1f} MB in total, {max(self.usage.values()) / MB:.1f} MB at most"
@@ -1,11 +1,13 @@
 from __future__ import annotations
 from typing import List
 import logging
-from argparse import ArgumentParser
+from argparse import ArgumentParser, ArgumentTypeError
 from dataclasses import dataclass, field
 from pathlib import Path
 from typing import OrderedDict
 
+from viddit.core.ffmpeg_writer import OUTPUT_PROFILES
+
 logger = logging.getLogger("discord")
 
 
@@ -46,6 +48,35 @@ class Args:
     max_comments: int = 3
     local_mode: bool = False
     operating_sys: str = "linux"
+    render_mode: str = "moviepy"
+    render_workers: int = 0
+    output_profiles: str = ""
+    driver_pool_size: int = 1
+    driver_max_pages: int = 50
+    capture_mode: str = "element"
+    tts_workers: int = 4
+    card_source: str = "selenium"
+    subreddit_workers: int = 4
+    incremental: bool = False
+    artifact_cache_mb: int = 1024
+    parallel_jobs: int = 1
+    workspace_root: str = "/dev/shm"
+    keep_workspaces: bool = False
+    tts_cache_mb: int = 256
+    tts_client: str = "sync"
+    tts_concurrency: int = 8
+    tts_chunk_bytes: int = 1500
+    tts_ssml_marks: bool = False
+    tts_encoding: str = "MP3"
+    tuned_encoder: bool = False
+
+
+def output_profile_names(value: str) -> str:
+    """Checks every name in a |-separated list of output profiles exists, so a typo fails before any setup runs"""
+    unknown = [name for name in value.split("|") if name not in OUTPUT_PROFILES]
+    if value and unknown:
+        raise ArgumentTypeError(f"Unknown output profiles {', '.join(unknown)}, expected some of {'|'.join(OUTPUT_PROFILES)}")
+    return value
 
 
 def parse_args() -> Args:
@@ -96,6 +127,166 @@ def parse_args() -> Args:
         dest="operating_sys",
         help="The operating system to run the program on",
     )
+    arg_parser.add_argument(
+        "-rm",
+        "--render-mode",
+        type=str,
+        default="moviepy",
+        choices=["moviepy", "stream", "parallel", "filtergraph"],
+        dest="render_mode",
+        help="How frames are encoded, 'stream' pipes each frame to ffmpeg instead of holding the video in memory, 'parallel' renders each segment in its own process, 'filtergraph' composites and encodes in a single ffmpeg call",
+    )
+    arg_parser.add_argument(
+        "-rw",
+        "--render-workers",
+        type=int,
+        default=0,
+        dest="render_workers",
+        help="The number of processes used by the parallel render mode, 0 uses one per segment up to the number of cores",
+    )
+    arg_parser.add_argument(
+        "-op",
+        "--output-profiles",
+        type=output_profile_names,
+        default="",
+        dest="output_profiles",
+        help="Video variants to encode from one render, separated by |, e.g. shorts|tiktok|preview. By default a single video at the background resolution",
+    )
+    arg_parser.add_argument(
+        "-dp",
+        "--driver-pool-size",
+        type=int,
+        default=1,
+        dest="driver_pool_size",
+        help="The number of Chrome instances, and so the number of posts scraped at once",
+    )
+    arg_parser.add_argument(
+        "-dm",
+        "--driver-max-pages",
+        type=int,
+        default=50,
+        dest="driver_max_pages",
+        help="The number of posts after which a Chrome instance is restarted to release its memory, 0 never restarts",
+    )
+    arg_parser.add_argument(
+        "-cm",
+        "--capture-mode",
+        type=str,
+        default="element",
+        choices=["element", "page"],
+        dest="capture_mode",
+        help="How cards are screenshotted, 'page' cuts them all out of a few full-page captures instead of scrolling to each one",
+    )
+    arg_parser.add_argument(
+        "-tw",
+        "--tts-workers",
+        type=int,
+        default=4,
+        dest="tts_workers",
+        help="The number of text to speech requests in flight at once, they run alongside the browser work",
+    )
+    arg_parser.add_argument(
+        "-cs",
+        "--card-source",
+        type=str,
+        default="selenium",
+        choices=["selenium", "praw"],
+        dest="card_source",
+        help="Where the post and comment cards come from, 'praw' fetches them from the Reddit API and draws them locally without Chrome",
+    )
+    arg_parser.add_argument(
+        "-sw",
+        "--subreddit-workers",
+        type=int,
+        default=4,
+        dest="subreddit_workers",
+        help="The number of subreddit listings fetched at once, they share one Reddit rate limit budget",
+    )
+    arg_parser.add_argument(
+        "-ac",
+        "--artifact-cache-mb",
+        type=int,
+        default=1024,
+        dest="artifact_cache_mb",
+        help="Size of the cache of scraped cards and narration kept between runs, in MB, 0 disables it",
+    )
+    arg_parser.add_argument(
+        "-pj",
+        "--parallel-jobs",
+        type=int,
+        default=1,
+        dest="parallel_jobs",
+        help="The number of posts rendered and uploaded at once, each in its own workspace",
+    )
+    arg_parser.add_argument(
+        "-wr",
+        "--workspace-root",
+        type=str,
+        default="/dev/shm",
+        dest="workspace_root",
+        help="A tmpfs to put job workspaces on while it has room, an empty string keeps them under output/",
+    )
+    arg_parser.add_argument(
+        "-tc",
+        "--tts-cache-mb",
+        type=int,
+        default=256,
+        dest="tts_cache_mb",
+        help="Size of the cache of synthesised narration kept between runs, in MB, 0 disables it",
+    )
+    arg_parser.add_argument(
+        "-tcl",
+        "--tts-client",
+        type=str,
+        default="sync",
+        choices=["sync", "async"],
+        dest="tts_client",
+        help="Which Google Text-to-Speech client to use, 'async' shares one connection, concurrency limit and quota between every request",
+    )
+    arg_parser.add_argument(
+        "-tcc",
+        "--tts-concurrency",
+        type=int,
+        default=8,
+        dest="tts_concurrency",
+        help="The most text to speech requests the async client has in flight at once, across all posts",
+    )
+    arg_parser.add_argument(
+        "-tcb",
+        "--tts-chunk-bytes",
+        type=int,
+        default=1500,
+        dest="tts_chunk_bytes",
+        help="Texts longer than this many bytes are narrated as sentence aligned chunks in parallel, at most 5000, 0 sends every text whole",
+    )
+    arg_parser.add_argument(
+        "-te",
+        "--tts-encoding",
+        type=str,
+        default="MP3",
+        choices=["MP3", "LINEAR16", "OGG_OPUS"],
+        dest="tts_encoding",
+        help="Audio encoding of the narration, LINEAR16 is joined by the renderer without decoding or a lossy round trip",
+    )
+    add_boolean_arg(
+        arg_parser,
+        "tts-ssml-marks",
+        "Narrate each post and its comments with one SSML request split at <mark>s, falling back to a request each when it is too long",
+        default=False,
+    )
+    add_boolean_arg(
+        arg_parser,
+        "tuned-encoder",
+        "Encode with the settings saved by viddit-tune-encoder, a profile's own preset and crf still win",
+        default=False,
+    )
+    add_boolean_arg(arg_parser, "keep-workspaces", "Leave each job's workspace in place when it ends", default=False)
+    add_boolean_arg(
+        arg_parser,
+        "incremental",
+        "Only consider posts that are new or whose score has moved since the last run, cursors are kept between runs",
+        default=False,
+    )
     add_boolean_arg(arg_parser, "local-mode", "Run in local mode", default=False)
     add_boolean_arg(arg_parser, "console-log", "Log to console", default=True)
     return Args(**OrderedDict(vars(arg_parser.parse_args())))
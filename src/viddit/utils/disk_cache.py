@@ -0,0 +1,183 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+logger = logging.getLogger(__name__)
+
+METADATA_FILE = "metadata.json"
+PARTIAL_SUFFIX = ".partial"
+# Partial entries untouched for this long were left by a put that died, younger ones may still be being written
+STALE_PARTIAL_SECONDS = 3600
+
+
+def make_key(*parts):
+    """Hashes the parts into a key, so entries are addressed by their content rather than by a name"""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _dir_size(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+@dataclass
+class CacheEntry:
+    """A cached entry, its files live under path"""
+
+    key: str
+    path: str
+    metadata: dict
+
+    def file(self, name):
+        return os.path.join(self.path, name)
+
+
+class DiskLRUCache:
+    """A persistent cache of small groups of files, evicting the least recently used entries past max_bytes.
+
+    Every entry is a directory named by its key holding the cached files and a metadata.json. Entries are built
+    in a partial directory and renamed into place, so a crash never leaves a half written entry behind, and
+    recency is kept in the metadata file's modification time so it survives between runs.
+    Parameters
+    ----------
+    directory : str
+        Where the entries are kept
+    max_bytes : int
+        Total size the entries may take up, the most recently used entry is always kept
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> size in bytes, least recently used first
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.endswith(PARTIAL_SUFFIX):
+                # Left over from an interrupted put, unless another process sharing the directory is mid put
+                try:
+                    if time.time() - os.path.getmtime(path) > STALE_PARTIAL_SECONDS:
+                        shutil.rmtree(path, ignore_errors=True)
+                except OSError:
+                    pass  # Already renamed into place or cleaned up
+                continue
+            metadata_path = os.path.join(path, METADATA_FILE)
+            if not os.path.isfile(metadata_path):
+                continue
+            entries.append((os.path.getmtime(metadata_path), name, _dir_size(path)))
+        for _, key, size in sorted(entries):
+            self._entries[key] = size
+            self.total_bytes += size
+        with self._lock:
+            self._evict()
+
+    def _entry_path(self, key):
+        return os.path.join(self.directory, key)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def get(self, key):
+        """Returns the CacheEntry for key and marks it as recently used, or None if it is not cached.
+
+        The entry's files can be evicted by a later put, use copy_out to read them safely.
+        """
+        with self._lock:
+            return self._get(key)
+
+    def copy_out(self, key, destinations):
+        """Copies an entry's files out of the cache and marks it as recently used.
+
+        destinations is called with the entry's metadata and returns a dict of name within the entry to
+        destination path. The lock is held while copying, so no put can evict the entry midway. Returns the
+        CacheEntry, or None on a miss, including an entry whose files another process has already removed.
+        """
+        with self._lock:
+            entry = self._get(key)
+            if entry is None:
+                return None
+            try:
+                for name, destination in destinations(entry.metadata).items():
+                    shutil.copyfile(entry.file(name), destination)
+            except FileNotFoundError as e:
+                logger.warning(f"Dropping cache entry {key} with missing files: {e}")
+                self._remove(key)
+                return None
+            return entry
+
+    def _get(self, key):
+        if key not in self._entries:
+            return None
+        self._entries.move_to_end(key)
+        path = self._entry_path(key)
+        metadata_path = os.path.join(path, METADATA_FILE)
+        try:
+            with open(metadata_path) as f:
+                metadata = json.load(f)
+            os.utime(metadata_path)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Dropping unreadable cache entry {key}: {e}")
+            self._remove(key)
+            return None
+        return CacheEntry(key, path, metadata)
+
+    def put(self, key, files, metadata=None):
+        """Copies files, a dict of name within the entry to source path, into the cache under key.
+
+        Replaces any entry already cached under key and returns the new CacheEntry.
+        """
+        metadata = metadata or {}
+        partial_path = self._entry_path(f"{key}.{os.getpid()}.{threading.get_ident()}{PARTIAL_SUFFIX}")
+        shutil.rmtree(partial_path, ignore_errors=True)
+        os.makedirs(partial_path)
+        try:
+            for name, source_path in files.items():
+                destination = os.path.join(partial_path, name)
+                os.makedirs(os.path.dirname(destination), exist_ok=True)
+                shutil.copyfile(source_path, destination)
+            with open(os.path.join(partial_path, METADATA_FILE), "w") as f:
+                json.dump(metadata, f)
+            size = _dir_size(partial_path)
+            with self._lock:
+                if key in self._entries:
+                    self.total_bytes -= self._entries.pop(key)
+                shutil.rmtree(self._entry_path(key), ignore_errors=True)
+                os.replace(partial_path, self._entry_path(key))
+                self._entries[key] = size
+                self.total_bytes += size
+                self._evict()
+        except BaseException:
+            shutil.rmtree(partial_path, ignore_errors=True)
+            raise
+        return CacheEntry(key, self._entry_path(key), metadata)
+
+    def _remove(self, key):
+        self.total_bytes -= self._entries.pop(key)
+        shutil.rmtree(self._entry_path(key), ignore_errors=True)
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+            key = next(iter(self._entries))
+            logger.debug(f"Evicting cache entry {key} from {self.directory}")
+            self._remove(key)
+
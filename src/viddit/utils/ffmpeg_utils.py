@@ -0,0 +1,63 @@
+import logging
+import os
+import shutil
+import subprocess
+
+logger = logging.getLogger(__name__)
+
+
+def get_ffmpeg_exe():
+    """Returns the path to the ffmpeg binary, preferring the one moviepy uses (imageio-ffmpeg) over the one on PATH"""
+    try:
+        import imageio_ffmpeg
+
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception:
+        ffmpeg_exe = shutil.which("ffmpeg")
+        if ffmpeg_exe is None:
+            raise FileNotFoundError("Could not find an ffmpeg binary, install imageio-ffmpeg or add ffmpeg to PATH")
+        return ffmpeg_exe
+
+
+def ffmpeg_command(args):
+    """Builds a quiet, overwriting ffmpeg command line from a list of arguments"""
+    return [get_ffmpeg_exe(), "-hide_banner", "-nostats", "-loglevel", "error", "-y"] + [str(arg) for arg in args]
+
+
+def run_ffmpeg(args, input=None):
+    """Runs ffmpeg to completion with the given arguments
+    Parameters
+    ----------
+    args : list
+        Arguments to pass to ffmpeg, excluding the binary itself
+    input : bytes, optional
+        Data to feed ffmpeg on stdin, for an input of "pipe:0"
+    Raises
+    ------
+    RuntimeError
+        If ffmpeg exits with a non-zero return code
+    """
+    command = ffmpeg_command(args)
+    logger.debug(f"Running {' '.join(command)}")
+    result = subprocess.run(command, input=input, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg exited with code {result.returncode}: {result.stderr.decode(errors='replace').strip()}")
+
+
+def concat_files(input_paths, output_path, audio_path=None):
+    """Joins media files with identical stream parameters using the concat demuxer, copying streams without re-encoding.
+
+    If audio_path is given its audio replaces any audio in the inputs, which suits joining video-only segments.
+    """
+    list_path = output_path + ".concat.txt"
+    with open(list_path, "w") as f:
+        for input_path in input_paths:
+            escaped_path = os.path.abspath(input_path).replace("'", "'\\''")
+            f.write(f"file '{escaped_path}'\n")
+    try:
+        args = ["-f", "concat", "-safe", "0", "-i", list_path]
+        if audio_path:
+            args += ["-i", audio_path, "-map", "0:v", "-map", "1:a"]
+        run_ffmpeg(args + ["-c", "copy", "-movflags", "+faststart", output_path])
+    finally:
+        os.remove(list_path)
@@ -1,8 +1,8 @@
 import os
 
 def make_dir_if_not_exists(dir_name):
-    if not os.path.exists(dir_name):
-        os.makedirs(dir_name)
+    # exist_ok rather than checking first, concurrent scrapes may create the same directories
+    os.makedirs(dir_name, exist_ok=True)
 
 def delete_content_of_dir(dir_name):
     if os.path.exists(dir_name):
@@ -0,0 +1,85 @@
+import logging
+import threading
+import time
+
+import prawcore
+
+logger = logging.getLogger(__name__)
+
+# Reddit allows 100 OAuth requests a minute per client id, averaged over a ten minute window
+REDDIT_REQUESTS_PER_MINUTE = 100
+
+
+class TokenBucket:
+    """A thread safe token bucket, every request takes a token and tokens refill at rate per second
+    Parameters
+    ----------
+    rate : float
+        Tokens added per second
+    capacity : float
+        Most tokens that can be saved up, i.e. the largest burst
+    """
+
+    def __init__(self, rate, capacity, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._last = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def try_acquire(self, tokens=1):
+        """Takes tokens if there are enough, returning 0, otherwise returns the seconds until there will be"""
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0
+            return (tokens - self._tokens) / self.rate
+
+    def acquire(self, tokens=1):
+        """Takes tokens, sleeping until enough have refilled, and returns the seconds spent waiting"""
+        waited = 0.0
+        while True:
+            wait = self.try_acquire(tokens)
+            if not wait:
+                return waited
+            self._sleep(wait)
+            waited += wait
+
+    def update_limits(self, remaining, reset_seconds):
+        """Spreads the requests the server says are left evenly over the time until its window resets"""
+        with self._lock:
+            self._refill()
+            # With nothing left, one request is allowed once the window has reset
+            self.rate = max(remaining, 1) / max(reset_seconds, 1)
+            self._tokens = min(self._tokens, remaining)
+
+
+class RateLimitedRequestor(prawcore.Requestor):
+    """A prawcore requestor that takes a token from a shared bucket before every request and feeds the
+    X-Ratelimit headers of every response back into it, so any number of praw clients share one budget.
+
+    Pass it to praw with requestor_class=RateLimitedRequestor, requestor_kwargs={"bucket": bucket}.
+    """
+
+    def __init__(self, *args, bucket, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.bucket = bucket
+
+    def request(self, *args, **kwargs):
+        waited = self.bucket.acquire()
+        if waited:
+            logger.debug(f"Waited {waited:.2f}s for the Reddit rate limit")
+        response = super().request(*args, **kwargs)
+        remaining = response.headers.get("x-ratelimit-remaining")
+        reset = response.headers.get("x-ratelimit-reset")
+        if remaining is not None and reset is not None:
+            self.bucket.update_limits(float(remaining), float(reset))
+        return response
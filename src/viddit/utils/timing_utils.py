@@ -0,0 +1,29 @@
+import time
+from contextlib import contextmanager
+
+# How many recent PageTimings a long running scraper keeps, older ones are dropped
+MAX_PAGE_TIMINGS = 100
+
+
+class PageTimings:
+    """Seconds spent in each named step of loading a page, to see where page time goes"""
+
+    def __init__(self, url=None):
+        self.url = url
+        self.steps = {}
+
+    @contextmanager
+    def step(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            # Repeated steps, e.g. one per comment, are added up
+            self.steps[name] = self.steps.get(name, 0.0) + time.perf_counter() - start
+
+    @property
+    def total(self):
+        return sum(self.steps.values())
+
+    def summary(self):
+        return ", ".join(f"{name} {seconds:.2f}s" for name, seconds in self.steps.items()) + f", total {self.total:.2f}s"
@@ -0,0 +1,85 @@
+import os
+import tempfile
+import unittest
+import wave
+
+from viddit.core.audio import AudioBuffer, assemble_narration, get_audio_duration, mp3_duration, ogg_opus_duration
+from viddit.utils.ffmpeg_utils import run_ffmpeg
+
+
+def make_mp3(path, duration, extra_args=()):
+    run_ffmpeg(["-f", "lavfi", "-i", "sine=sample_rate=24000", "-t", duration, "-c:a", "libmp3lame", *extra_args, path])
+
+
+class TestAudio(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_mp3_duration_uses_gapless_info(self):
+        path = os.path.join(self.tmp_dir.name, "info.mp3")
+        make_mp3(path, 1.5)
+        self.assertAlmostEqual(mp3_duration(path), 1.5, places=3)
+
+    def test_mp3_duration_walks_frames_without_xing_header(self):
+        path = os.path.join(self.tmp_dir.name, "plain.mp3")
+        make_mp3(path, 1.5, ["-write_xing", "0", "-id3v2_version", "0"])
+        # Without a gapless tag the encoder delay and padding are counted, which is at most three frames
+        self.assertAlmostEqual(mp3_duration(path), 1.5, delta=3 * 576 / 24000)
+
+    def test_mp3_duration_rejects_non_mp3(self):
+        path = os.path.join(self.tmp_dir.name, "bad.mp3")
+        with open(path, "wb") as f:
+            f.write(b"not an mp3" * 10)
+        with self.assertRaises(ValueError):
+            mp3_duration(path)
+
+    def test_assemble_narration_pads_segments(self):
+        paths = [os.path.join(self.tmp_dir.name, f"{i}.mp3") for i in range(2)]
+        make_mp3(paths[0], 0.5)
+        make_mp3(paths[1], 1.0)
+        output_path = os.path.join(self.tmp_dir.name, "narration.wav")
+        assemble_narration(paths, [1.5, 2.0], output_path)
+        self.assertAlmostEqual(get_audio_duration(output_path), 3.5, places=2)
+
+    def test_buffers_have_exact_durations(self):
+        wav_path = os.path.join(self.tmp_dir.name, "speech.wav")
+        opus_path = os.path.join(self.tmp_dir.name, "speech.ogg")
+        run_ffmpeg(["-f", "lavfi", "-i", "sine=sample_rate=24000", "-t", 1.25, "-c:a", "pcm_s16le", wav_path])
+        run_ffmpeg(["-f", "lavfi", "-i", "sine=sample_rate=24000", "-t", 1.25, "-c:a", "libopus", opus_path])
+        pcm = AudioBuffer.from_file(wav_path)
+        self.assertEqual((pcm.duration, pcm.sample_rate, len(pcm.data)), (1.25, 24000, 1.25 * 24000 * 2))
+        self.assertAlmostEqual(AudioBuffer.from_file(opus_path).duration, 1.25, places=3)
+        self.assertAlmostEqual(get_audio_duration(opus_path), 1.25, places=3)
+
+    def test_opus_duration_walks_the_pages(self):
+        def ogg_page(granule_position, body):
+            segments = [255] * (len(body) // 255) + [len(body) % 255]
+            return b"OggS\x00\x00" + granule_position.to_bytes(8, "little", signed=True) + b"\x01\x00\x00\x00" + bytes(8) + bytes([len(segments)] + segments) + body
+
+        head = b"OpusHead\x01\x01" + (312).to_bytes(2, "little") + (24000).to_bytes(4, "little") + bytes(3)
+        # A packet that happens to contain the capture pattern must not be taken for a page
+        packet = b"\xfc" + b"OggS" + bytes(300)
+        data = ogg_page(0, head) + ogg_page(0, b"OpusTags" + bytes(8)) + ogg_page(48000 + 312, packet) + ogg_page(-1, bytes(10))
+        self.assertAlmostEqual(ogg_opus_duration(data), 1.0)
+
+    def test_assemble_narration_joins_pcm_buffers_without_ffmpeg(self):
+        buffers = [AudioBuffer(b"\x01\x00" * 1000, "LINEAR16", 0.1, 10000), AudioBuffer(b"\x02\x00" * 3000, "LINEAR16", 0.3, 10000)]
+        output_path = os.path.join(self.tmp_dir.name, "narration.wav")
+        assemble_narration(buffers, [0.15, 0.2], output_path)
+        with wave.open(output_path, "rb") as f:
+            samples = f.readframes(f.getnframes())
+        # The first segment is padded with silence and the second trimmed, sample for sample
+        self.assertEqual(samples, b"\x01\x00" * 1000 + b"\x00\x00" * 500 + b"\x02\x00" * 2000)
+
+    def test_assemble_narration_encodes_pcm_once(self):
+        buffers = [AudioBuffer(b"\x01\x00" * 24000, "LINEAR16", 1.0, 24000)]
+        output_path = os.path.join(self.tmp_dir.name, "narration.m4a")
+        assemble_narration(buffers, [1.5], output_path)
+        self.assertTrue(os.path.getsize(output_path) > 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import os
+import tempfile
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from viddit.core.background import BackgroundFrameSource, get_background_proxy, get_video_properties
+from viddit.core.ffmpeg_writer import FFmpegWriter
+
+
+class TestBackgroundProxy(unittest.TestCase):
+    def _write_source(self, path):
+        with FFmpegWriter(path, 128, 96, 10, preset="ultrafast") as writer:
+            for i in range(20):
+                writer.write_frame(np.full((96, 128, 3), i * 10, dtype=np.uint8))
+
+    def test_proxy_is_scaled_and_cached(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            source_path = os.path.join(tmp_dir, "background.mp4")
+            self._write_source(source_path)
+            cache_dir = os.path.join(tmp_dir, "cache")
+
+            proxy_path = get_background_proxy(source_path, output_size=(48, 64), cache_dir=cache_dir)
+            fps, width, height, frame_count = get_video_properties(proxy_path)
+            self.assertEqual((width, height, frame_count), (48, 64, 20))
+
+            modified = os.path.getmtime(proxy_path)
+            self.assertEqual(get_background_proxy(source_path, output_size=(48, 64), cache_dir=cache_dir), proxy_path)
+            self.assertEqual(os.path.getmtime(proxy_path), modified)
+            self.assertNotEqual(get_background_proxy(source_path, cache_dir=cache_dir), proxy_path)
+
+    def test_processes_creating_the_same_proxy_do_not_collide(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            source_path = os.path.join(tmp_dir, "background.mp4")
+            self._write_source(source_path)
+            cache_dir = os.path.join(tmp_dir, "cache")
+
+            with ProcessPoolExecutor(max_workers=2) as executor:
+                futures = [executor.submit(get_background_proxy, source_path, (48, 64), cache_dir=cache_dir) for _ in range(2)]
+                proxy_paths = {future.result() for future in futures}
+            self.assertEqual(len(proxy_paths), 1)
+            self.assertEqual(get_video_properties(proxy_paths.pop())[1:], (48, 64, 20))
+            self.assertEqual([name for name in os.listdir(cache_dir) if "partial" in name], [])
+
+
+class TestBackgroundFrameSource(unittest.TestCase):
+    def _write_background(self, path, num_frames):
+        with FFmpegWriter(path, 64, 48, 10, preset="ultrafast", crf=0) as writer:
+            for i in range(num_frames):
+                writer.write_frame(np.full((48, 64, 3), i * 20, dtype=np.uint8))
+
+    def test_loops_past_the_end(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "background.mp4")
+            self._write_background(path, 5)
+            with BackgroundFrameSource(path, start_frame=3, buffer_size=2) as source:
+                values = [int(source.read()[0, 0, 0]) for _ in range(9)]
+            self.assertEqual(source.loops, 2)
+            expected = [60, 80, 0, 20, 40, 60, 80, 0, 20]
+            for value, expected_value in zip(values, expected):
+                self.assertAlmostEqual(value, expected_value, delta=8)
+
+    def test_stops_at_the_end_without_loop(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "background.mp4")
+            self._write_background(path, 3)
+            with BackgroundFrameSource(path, loop=False) as source:
+                frames = [source.read() for _ in range(5)]
+            self.assertEqual([frame is None for frame in frames], [False, False, False, True, True])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import cv2
+
+from viddit.core.card_renderer import CardRenderer, load_font, strip_markdown
+from viddit.core.praw_cards import PrawCardSource
+
+
+class FakeTTS:
+    def text_to_speech(self, input_text, output_filename, language_code="en-US", voice_name="en-US-Wavenet-A", speaking_rate=1.0):
+        with open(output_filename, "w") as f:
+            f.write(input_text)
+
+
+class FakeComments(list):
+    def replace_more(self, limit=32):
+        self.replaced_with = limit
+
+
+def fake_comment(body, author="someone", stickied=False, distinguished=None, score=10):
+    return SimpleNamespace(body=body, author=SimpleNamespace(name=author), stickied=stickied, distinguished=distinguished, score=score)
+
+
+class FakeReddit:
+    def __init__(self, comments):
+        self.submission_comments = FakeComments(comments)
+
+    def submission(self, url):
+        return SimpleNamespace(
+            comments=self.submission_comments,
+            subreddit=SimpleNamespace(display_name="AskReddit"),
+            author=SimpleNamespace(name="op"),
+            title="What is a question?",
+            selftext="Asking for a **friend**",
+            score=1234,
+            num_comments=56,
+        )
+
+
+class TestCardRenderer(unittest.TestCase):
+    def test_strips_markdown(self):
+        self.assertEqual(strip_markdown("> **Bold** and [a link](https://reddit.com) &amp; `code`"), "Bold and a link & code")
+
+    def test_font_falls_back_to_the_fixed_size_default_on_old_pillow(self):
+        default_font = object()
+
+        def load_default(**kwargs):
+            if kwargs:
+                raise TypeError("load_default() got an unexpected keyword argument 'size'")
+            return default_font
+
+        with mock.patch("viddit.core.card_renderer.FONT_FILES", {"regular": ["missing.ttf"]}), mock.patch(
+            "viddit.core.card_renderer.ImageFont.load_default", load_default
+        ):
+            load_font.cache_clear()
+            try:
+                self.assertIs(load_font("regular", 23), default_font)
+            finally:
+                load_font.cache_clear()
+
+    def test_renders_rgba_card_with_wrapped_text(self):
+        renderer = CardRenderer(width=400, font_size=20)
+        lines = renderer.wrap("word " * 50, renderer.body_font, 360)
+        self.assertGreater(len(lines), 1)
+        self.assertTrue(all(renderer.body_font.getlength(line) <= 360 for line in lines))
+        card = renderer.render_comment("someone", "word " * 50, score=12345)
+        self.assertEqual((card.mode, card.width), ("RGBA", 400))
+        # Rounded corners are transparent, the middle is opaque
+        self.assertEqual(card.getpixel((0, 0))[3], 0)
+        self.assertEqual(card.getpixel((200, card.height // 2))[3], 255)
+
+    def test_praw_source_writes_cards_and_narration(self):
+        reddit = FakeReddit(
+            [
+                fake_comment("Read the rules", author="AutoModerator"),
+                fake_comment("Pinned", stickied=True, distinguished="moderator"),
+                fake_comment("[removed]"),
+                fake_comment("First *answer*"),
+                fake_comment("Second answer"),
+                fake_comment("Third answer"),
+            ]
+        )
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            directories = {key: os.path.join(tmp_dir, key) for key in ["post_audio", "post_image", "comment_audio", "comment_image"]}
+            source = PrawCardSource(reddit, directories, FakeTTS(), renderer=CardRenderer(width=400, font_size=20), tts_workers=2)
+            no_comments, post_data = source.scrape_post("https://www.reddit.com/r/AskReddit/comments/abc/test/", no_comments=2)
+            self.assertEqual(no_comments, 2)
+            self.assertEqual(post_data, {"Post": "What is a question?\nAsking for a friend", "Comment_0": "First answer", "Comment_1": "Second answer"})
+            self.assertEqual(reddit.submission_comments.replaced_with, 0)
+            for path in [os.path.join(directories["post_image"], "0.png"), os.path.join(directories["comment_image"], "1.png")]:
+                self.assertEqual(cv2.imread(path, cv2.IMREAD_UNCHANGED).shape[2], 4)
+            with open(os.path.join(directories["comment_audio"], "1.mp3")) as f:
+                self.assertEqual(f.read(), "Second answer")
+            source.teardown()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+import unittest
+
+import numpy as np
+
+from viddit.core.compositor import OverlayCompositor
+
+
+class TestOverlayCompositor(unittest.TestCase):
+    def test_blends_partial_alpha(self):
+        png = np.zeros((4, 4, 4), dtype=np.uint8)
+        png[:, :, :3] = 200
+        png[:2, :, 3] = 255  # opaque band
+        png[2:, :, 3] = 128  # half transparent band
+        frame = np.full((8, 8, 3), 100, dtype=np.uint8)
+        OverlayCompositor(png, 8, 8).apply(frame)
+        self.assertTrue((frame[2:4, 2:6] == 200).all())
+        expected = round(200 * 128 / 255 + 100 * (1 - 128 / 255))
+        self.assertTrue((frame[4:6, 2:6] == expected).all())
+        # Pixels outside the card are untouched
+        self.assertTrue((frame[:2] == 100).all())
+        self.assertTrue((frame[:, :2] == 100).all())
+
+    def test_transparent_border_is_skipped(self):
+        png = np.zeros((6, 6, 4), dtype=np.uint8)
+        png[2:4, 2:4] = (10, 20, 30, 255)
+        compositor = OverlayCompositor(png, 10, 10)
+        self.assertEqual(compositor.region, (slice(4, 6), slice(4, 6)))
+        frame = np.zeros((10, 10, 3), dtype=np.uint8)
+        compositor.apply(frame)
+        self.assertTrue((frame[4:6, 4:6] == (10, 20, 30)).all())
+        self.assertEqual(int(frame.sum()), 4 * 60)
+
+    def test_clips_overlay_larger_than_frame(self):
+        png = np.full((20, 20, 3), 50, dtype=np.uint8)
+        frame = np.zeros((10, 10, 3), dtype=np.uint8)
+        OverlayCompositor(png, 10, 10).apply(frame)
+        self.assertTrue((frame == 50).all())
+
+
+if __name__ == '__main__':
+    unittest.main()
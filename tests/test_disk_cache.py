@@ -0,0 +1,115 @@
+import os
+import tempfile
+import time
+import unittest
+
+from viddit.core.artifact_cache import ScrapeArtifactCache
+from viddit.utils.disk_cache import DiskLRUCache, make_key
+
+
+def write_file(path, size):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(os.urandom(size))
+
+
+class FakeScraper:
+    def __init__(self, audio_extension=".mp3"):
+        self.scrapes = 0
+        self.audio_extension = audio_extension
+
+    def scrape_post(self, post_url, no_comments, directories):
+        self.scrapes += 1
+        write_file(os.path.join(directories["post_image"], "0.png"), 100)
+        write_file(os.path.join(directories["post_audio"], f"0{self.audio_extension}"), 100)
+        for i in range(no_comments):
+            write_file(os.path.join(directories["comment_image"], f"{i}.png"), 100)
+            write_file(os.path.join(directories["comment_audio"], f"{i}{self.audio_extension}"), 100)
+        return no_comments, {"Post": post_url}
+
+
+class TestDiskCache(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.source = os.path.join(self.temp_dir.name, "source.bin")
+        write_file(self.source, 1000)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_evicts_least_recently_used(self):
+        cache = DiskLRUCache(os.path.join(self.temp_dir.name, "cache"), max_bytes=2500)
+        for key in "abc":
+            cache.put(key, {"data.bin": self.source}, {"key": key})
+            if key == "b":
+                self.assertEqual(cache.get("a").metadata, {"key": "a"})
+        self.assertNotIn("b", cache)
+        self.assertEqual(len(cache), 2)
+        # Recency is on disk, a fresh instance sees the same entries
+        reopened = DiskLRUCache(os.path.join(self.temp_dir.name, "cache"), max_bytes=2500)
+        self.assertEqual(set(reopened._entries), {"a", "c"})
+        with open(reopened.get("c").file("data.bin"), "rb") as f, open(self.source, "rb") as g:
+            self.assertEqual(f.read(), g.read())
+
+    def test_entries_whose_files_are_gone_are_misses(self):
+        cache = DiskLRUCache(os.path.join(self.temp_dir.name, "cache"), max_bytes=10000)
+        entry = cache.put("a", {"data.bin": self.source})
+        destination = os.path.join(self.temp_dir.name, "copy.bin")
+        self.assertIsNotNone(cache.copy_out("a", lambda metadata: {"data.bin": destination}))
+        self.assertEqual(os.path.getsize(destination), 1000)
+        # e.g. evicted by another process sharing the directory
+        os.remove(entry.file("data.bin"))
+        self.assertIsNone(cache.copy_out("a", lambda metadata: {"data.bin": destination}))
+        self.assertNotIn("a", cache)
+
+    def test_only_stale_partial_entries_are_removed(self):
+        directory = os.path.join(self.temp_dir.name, "cache")
+        fresh, stale = os.path.join(directory, "a.1.1.partial"), os.path.join(directory, "b.2.2.partial")
+        for path in [fresh, stale]:
+            os.makedirs(path)
+        two_hours_ago = time.time() - 2 * 3600
+        os.utime(stale, (two_hours_ago, two_hours_ago))
+        DiskLRUCache(directory, max_bytes=10000)
+        self.assertTrue(os.path.isdir(fresh))
+        self.assertFalse(os.path.exists(stale))
+
+    def test_keys_depend_on_every_part(self):
+        self.assertEqual(make_key("a", 1), make_key("a", 1))
+        self.assertNotEqual(make_key("a", 1), make_key("a1"))
+
+    def test_artifacts_are_reused_by_the_next_run(self):
+        post = {"permalink": "/r/test/comments/1/", "title": "Title", "selftext": ""}
+        directories = {key: os.path.join(self.temp_dir.name, "job", key) for key in ["post_audio", "post_image", "comment_audio", "comment_image"]}
+        scraper = FakeScraper()
+        cache_dir = os.path.join(self.temp_dir.name, "artifacts")
+        self.assertEqual(ScrapeArtifactCache(cache_dir).scrape_post(scraper, post, 2, directories), (2, {"Post": "https://www.reddit.com/r/test/comments/1/"}))
+
+        for directory in directories.values():
+            for name in os.listdir(directory):
+                os.remove(os.path.join(directory, name))
+        result = ScrapeArtifactCache(cache_dir).scrape_post(scraper, post, 2, directories)
+        self.assertEqual(scraper.scrapes, 1)
+        self.assertEqual(result[0], 2)
+        self.assertEqual(sorted(os.listdir(directories["comment_audio"])), ["0.mp3", "1.mp3"])
+
+        # An edited post is scraped again
+        ScrapeArtifactCache(cache_dir).scrape_post(scraper, dict(post, selftext="Edit: thanks"), 2, directories)
+        self.assertEqual(scraper.scrapes, 2)
+
+    def test_artifacts_of_another_encoding_are_not_reused(self):
+        post = {"permalink": "/r/test/comments/1/", "title": "Title", "selftext": ""}
+        directories = {key: os.path.join(self.temp_dir.name, "job", key) for key in ["post_audio", "post_image", "comment_audio", "comment_image"]}
+        cache_dir = os.path.join(self.temp_dir.name, "artifacts")
+        mp3_scraper, wav_scraper = FakeScraper(".mp3"), FakeScraper(".wav")
+        ScrapeArtifactCache(cache_dir, audio_encoding="MP3").scrape_post(mp3_scraper, post, 2, directories)
+        ScrapeArtifactCache(cache_dir, audio_encoding="LINEAR16").scrape_post(wav_scraper, post, 2, directories)
+        self.assertEqual(wav_scraper.scrapes, 1)
+        self.assertEqual(sorted(os.listdir(directories["comment_audio"])), ["0.wav", "1.wav"])
+
+        # An entry under the right key without the narration the renderer expects is a miss too
+        ScrapeArtifactCache(cache_dir, audio_encoding="OGG_OPUS").scrape_post(mp3_scraper, post, 2, directories)
+        self.assertIsNone(ScrapeArtifactCache(cache_dir, audio_encoding="OGG_OPUS").load(post, 2, directories))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+import json
+import shutil
+import subprocess
+import unittest
+
+from viddit.core.dom_extraction import _EXTRACT_COMMENTS_SCRIPT, extract_comments, select_comments
+from viddit.core.page_readiness import COMMENT_SELECTORS, NEW_LAYOUT, OLD_LAYOUT
+
+# Just enough of the DOM for the extraction script: elements with attributes, own text and children, and
+# selector lists of tags, [attr], [attr='v'], [attr^='v'], [attr$='v'] and .class
+FAKE_DOM = r"""
+class Element {
+    constructor(tagName, attrs = {}, children = [], text = "") {
+        Object.assign(this, { tagName, attrs, children, text, parentElement: null, style: {} });
+        children.forEach((child) => { child.parentElement = this; });
+    }
+    getAttribute(name) { return name in this.attrs ? this.attrs[name] : null; }
+    get innerText() { return [this.text, ...this.children.map((child) => child.innerText)].filter((text) => text).join("\n"); }
+    descendants() { return this.children.flatMap((child) => [child, ...child.descendants()]); }
+    matches(selectors) { return selectors.split(",").some((selector) => matchesSimple(this, selector.trim())); }
+    querySelectorAll(selectors) { return this.descendants().filter((element) => element.matches(selectors)); }
+    querySelector(selectors) { return this.querySelectorAll(selectors)[0] || null; }
+    closest(selectors) {
+        for (let element = this; element; element = element.parentElement) if (element.matches(selectors)) return element;
+        return null;
+    }
+    contains(other) {
+        for (let element = other; element; element = element.parentElement) if (element === this) return true;
+        return false;
+    }
+    getBoundingClientRect() { return { left: 0, top: 0, width: 500, height: 80 }; }
+}
+function matchesSimple(element, selector) {
+    const parts = selector.match(/^([\w-]*)((?:\[[^\]]+\]|\.[\w-]+)*)$/);
+    if (!parts) throw new Error(`Unsupported selector ${selector}`);
+    if (parts[1] && parts[1] !== element.tagName) return false;
+    for (const [, name, op, value] of parts[2].matchAll(/\[([\w-]+)(?:([$^]?=)'?([^'\]]*)'?)?\]/g)) {
+        const actual = element.getAttribute(name);
+        if (actual === null || (op === "=" && actual !== value)) return false;
+        if ((op === "^=" && !actual.startsWith(value)) || (op === "$=" && !actual.endsWith(value))) return false;
+    }
+    const classes = (element.attrs.class || "").split(" ");
+    return [...parts[2].replace(/\[[^\]]+\]/g, "").matchAll(/\.([\w-]+)/g)].every(([, name]) => classes.includes(name));
+}
+const el = (tagName, attrs, children, text) => new Element(tagName, attrs, children, text);
+const window = { scrollX: 0, scrollY: 0 };
+"""
+
+# A new layout comment whose rtjson content sits inside its comment slot, with a reply nested in it
+NESTED_NEW_LAYOUT = """
+const document = el("body", {}, [
+    el("shreddit-comment", { depth: "0", author: "someone" }, [
+        el("div", { slot: "comment" }, [el("div", { id: "t1_abc-post-rtjson-content" }, [el("p", {}, [], "Said once")])]),
+        el("shreddit-comment", { depth: "1", author: "replier" }, [el("div", { slot: "comment" }, [], "A reply")]),
+    ]),
+]);
+"""
+
+
+class FakeDriver:
+    def __init__(self, entries):
+        self.entries = entries
+        self.calls = 0
+
+    def execute_script(self, script, *args):
+        self.calls += 1
+        return [dict(entry) for entry in self.entries]
+
+
+def entry(index, text, depth, author="someone", is_mod=False):
+    return {"index": index, "element": f"element{index}", "text": text, "rect": [0, index * 100, 500, 80], "depth": depth, "author": author, "is_mod": is_mod}
+
+
+class TestDomExtraction(unittest.TestCase):
+    def test_selects_top_level_comments_from_one_call(self):
+        driver = FakeDriver(
+            [
+                entry(0, "Please follow the rules", 0, author="AutoModerator"),
+                entry(1, "Pinned by the mods", 0, is_mod=True),
+                entry(2, "First", 0),
+                entry(3, "A reply", 1),
+                entry(4, "", 0),
+                entry(5, "Second", 0),
+                entry(6, "Third", 0),
+            ]
+        )
+        comments = select_comments(extract_comments(driver, NEW_LAYOUT), 2)
+        self.assertEqual(driver.calls, 1)
+        self.assertEqual([comment.text for comment in comments], ["First", "Second"])
+        self.assertEqual(comments[0].element, "element2")
+
+    def test_old_layout_indentation_becomes_depth(self):
+        driver = FakeDriver([entry(0, "Top", 16), entry(1, "Reply", 37), entry(2, "Nested reply", 58), entry(3, "Top again", 16)])
+        comments = extract_comments(driver, OLD_LAYOUT)
+        self.assertEqual([comment.depth for comment in comments], [0, 1, 2, 0])
+        self.assertEqual([comment.text for comment in select_comments(comments, 5)], ["Top", "Top again"])
+
+
+@unittest.skipUnless(shutil.which("node"), "needs node to run the extraction script")
+class TestExtractionScript(unittest.TestCase):
+    def run_script(self, fixture, layout):
+        program = (
+            FAKE_DOM
+            + fixture
+            + f"const entries = (function () {{ {_EXTRACT_COMMENTS_SCRIPT} }}).apply(null, {json.dumps([layout, COMMENT_SELECTORS[layout]])});\n"
+            + "console.log(JSON.stringify(entries.map(({ element, ...entry }) => entry)));\n"
+        )
+        return json.loads(subprocess.run(["node", "-e", program], capture_output=True, text=True, check=True).stdout)
+
+    def test_nested_text_selectors_are_read_once(self):
+        entries = self.run_script(NESTED_NEW_LAYOUT, NEW_LAYOUT)
+        self.assertEqual([(entry["text"], entry["depth"], entry["author"]) for entry in entries], [("Said once", 0, "someone"), ("A reply", 1, "replier")])
+
+
+if __name__ == '__main__':
+    unittest.main()
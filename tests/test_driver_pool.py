@@ -0,0 +1,75 @@
+import threading
+import unittest
+
+from viddit.core.driver_pool import WebDriverPool
+
+
+class FakeDriver:
+    def __init__(self):
+        self.alive = True
+        self.warmed_up = False
+
+    def execute_script(self, script):
+        if not self.alive:
+            raise ConnectionError("browser has gone away")
+        return 1
+
+    def quit(self):
+        self.alive = False
+
+
+class TestWebDriverPool(unittest.TestCase):
+    def test_warms_up_each_driver_once(self):
+        def warmup(driver):
+            driver.warmed_up = True
+
+        with WebDriverPool(FakeDriver, size=3, warmup=warmup) as pool:
+            self.assertEqual(pool.drivers_created, 3)
+            drivers = set()
+            for _ in range(6):
+                with pool.acquire() as driver:
+                    self.assertTrue(driver.warmed_up)
+                    drivers.add(driver)
+            self.assertEqual(len(drivers), 3)
+            self.assertEqual(pool.drivers_created, 3)
+
+    def test_recycles_after_page_limit_and_replaces_dead_drivers(self):
+        with WebDriverPool(FakeDriver, size=1, max_pages_per_driver=2) as pool:
+            with pool.acquire() as first:
+                pass
+            with pool.acquire() as driver:
+                self.assertIs(driver, first)
+            self.assertFalse(first.alive)
+            self.assertEqual(pool.drivers_recycled, 1)
+
+            with pool.acquire() as second:
+                second.quit()  # The browser crashes mid page
+            with pool.acquire() as driver:
+                self.assertIsNot(driver, second)
+                self.assertTrue(driver.alive)
+            self.assertEqual(pool.drivers_created, 3)
+
+    def test_lends_each_driver_to_one_caller_at_a_time(self):
+        in_use = set()
+        lock = threading.Lock()
+        errors = []
+
+        def scrape(pool):
+            for _ in range(20):
+                with pool.acquire() as driver:
+                    with lock:
+                        if driver in in_use:
+                            errors.append(driver)
+                        in_use.add(driver)
+                    with lock:
+                        in_use.discard(driver)
+
+        with WebDriverPool(FakeDriver, size=2) as pool:
+            threads = [threading.Thread(target=scrape, args=(pool,)) for _ in range(4)]
+            [thread.start() for thread in threads]
+            [thread.join() for thread in threads]
+        self.assertEqual(errors, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
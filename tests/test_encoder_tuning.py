@@ -0,0 +1,42 @@
+import math
+import os
+import tempfile
+import unittest
+
+from viddit.core.encoder_tuning import EncoderCandidate, parse_psnr_stats, parse_ssim_stats, select_candidate
+from viddit.core.ffmpeg_writer import load_encoder_settings, save_encoder_settings
+
+
+class TestEncoderTuning(unittest.TestCase):
+    def test_selects_fastest_candidate_within_targets(self):
+        candidates = [
+            EncoderCandidate("libx264", "ultrafast", 28, 1, encode_fps=300, bitrate_kbps=9000, ssim=0.99),
+            EncoderCandidate("libx264", "veryfast", 28, 1, encode_fps=150, bitrate_kbps=4000, ssim=0.96),
+            EncoderCandidate("libx264", "veryfast", 23, 1, encode_fps=140, bitrate_kbps=6000, ssim=0.98),
+            EncoderCandidate("libx264", "medium", 23, 1, encode_fps=60, bitrate_kbps=5000, ssim=0.985),
+        ]
+        chosen = select_candidate(candidates, max_bitrate_kbps=8000, min_ssim=0.97)
+        self.assertEqual((chosen.preset, chosen.crf), ("veryfast", 23))
+        self.assertIsNone(select_candidate(candidates, max_bitrate_kbps=1000))
+
+    def test_parses_filter_stats(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            ssim_path = os.path.join(tmp_dir, "ssim.log")
+            psnr_path = os.path.join(tmp_dir, "psnr.log")
+            with open(ssim_path, "w") as f:
+                f.write("n:1 Y:0.990000 U:0.99 V:0.99 All:0.980000 (16.98)\nn:2 Y:0.99 U:0.99 V:0.99 All:0.990000 (20.00)\n")
+            with open(psnr_path, "w") as f:
+                f.write("n:1 mse_avg:6.50 mse_y:6.50 psnr_avg:40.00 psnr_y:40.00\n")
+            self.assertAlmostEqual(parse_ssim_stats(ssim_path), 0.985)
+            self.assertAlmostEqual(parse_psnr_stats(psnr_path), 10 * math.log10(255**2 / 6.5))
+
+    def test_saved_settings_round_trip(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "viddit", "encoder_settings.json")
+            self.assertEqual(load_encoder_settings(path), {})
+            save_encoder_settings({"codec": "libx264", "preset": "veryfast", "crf": 23, "threads": 2, "candidates": []}, path)
+            self.assertEqual(load_encoder_settings(path), {"codec": "libx264", "preset": "veryfast", "crf": 23, "threads": 2})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import os
+import tempfile
+import unittest
+
+import cv2
+import numpy as np
+
+from viddit.core.ffmpeg_writer import FFmpegWriter, OutputProfile, fan_out_args, parse_bitrate, video_encoder_args
+from viddit.utils.ffmpeg_utils import concat_files
+
+
+class TestFFmpegWriter(unittest.TestCase):
+    def test_writes_streamed_frames(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            output_name = os.path.join(tmp_dir, "out.mp4")
+            with FFmpegWriter(output_name, 64, 48, 10, preset="ultrafast") as writer:
+                for i in range(12):
+                    writer.write_frame(np.full((48, 64, 3), i * 20, dtype=np.uint8))
+            cap = cv2.VideoCapture(output_name)
+            self.assertEqual(int(cap.get(cv2.CAP_PROP_FRAME_COUNT)), 12)
+            cap.release()
+
+    def test_fans_out_to_output_profiles(self):
+        profiles = [OutputProfile("full"), OutputProfile("small", 32, 24, crf=35, max_bitrate="100k")]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with FFmpegWriter(os.path.join(tmp_dir, "out.mp4"), 64, 48, 10, preset="ultrafast", output_profiles=profiles) as writer:
+                for i in range(5):
+                    writer.write_frame(np.full((48, 64, 3), i * 20, dtype=np.uint8))
+            self.assertEqual(set(writer.output_paths), {"full", "small"})
+            for name, size in [("full", (64, 48)), ("small", (32, 24))]:
+                cap = cv2.VideoCapture(writer.output_paths[name])
+                self.assertEqual((int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))), size)
+                self.assertEqual(int(cap.get(cv2.CAP_PROP_FRAME_COUNT)), 5)
+                cap.release()
+
+    def test_profile_quality_settings_win_over_encoder_settings(self):
+        profiles = [OutputProfile("tuned"), OutputProfile("own", crf=32, preset="veryfast")]
+        _, args, _ = fan_out_args("[0:v]", None, "out.mp4", profiles, preset="slow", crf=20)
+        presets = [args[k + 1] for k, arg in enumerate(args) if arg == "-preset"]
+        crfs = [args[k + 1] for k, arg in enumerate(args) if arg == "-crf"]
+        self.assertEqual((presets, crfs), (["slow", "veryfast"], [20, 32]))
+
+    def test_parses_ffmpeg_bitrates(self):
+        for rate, bits_per_second in [("400k", 400000), ("1M", 1000000), ("1.5M", 1500000), ("500000", 500000), (250000, 250000)]:
+            self.assertEqual(parse_bitrate(rate), bits_per_second)
+        with self.assertRaises(ValueError):
+            parse_bitrate("fast")
+        args = video_encoder_args(max_bitrate="1.5M")
+        self.assertEqual(args[args.index("-bufsize") + 1], 3000000)
+
+    def test_concat_files_joins_segments_without_re_encoding(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            segment_paths = []
+            for k, num_frames in enumerate([7, 5]):
+                segment_paths.append(os.path.join(tmp_dir, f"segment_{k}.mp4"))
+                with FFmpegWriter(segment_paths[-1], 64, 48, 10, preset="ultrafast") as writer:
+                    for i in range(num_frames):
+                        writer.write_frame(np.full((48, 64, 3), k * 200, dtype=np.uint8))
+            output_name = os.path.join(tmp_dir, "joined.mp4")
+            concat_files(segment_paths, output_name)
+            cap = cv2.VideoCapture(output_name)
+            self.assertEqual(int(cap.get(cv2.CAP_PROP_FRAME_COUNT)), 12)
+            frames = [cap.read()[1] for _ in range(12)]
+            cap.release()
+            self.assertLess(int(frames[6].mean()), 50)
+            self.assertGreater(int(frames[7].mean()), 150)
+            self.assertFalse(os.path.exists(output_name + ".concat.txt"))
+
+    def test_rejects_wrong_frame_size(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            writer = FFmpegWriter(os.path.join(tmp_dir, "out.mp4"), 64, 48, 10)
+            with self.assertRaises(ValueError):
+                writer.write_frame(np.zeros((10, 10, 3), dtype=np.uint8))
+            writer.abort()
+
+
+if __name__ == '__main__':
+    unittest.main()
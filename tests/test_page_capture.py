@@ -0,0 +1,55 @@
+import base64
+import os
+import tempfile
+import unittest
+
+import cv2
+import numpy as np
+
+from viddit.core.page_capture import capture_cards, plan_capture_bands
+
+
+class FakeChrome:
+    """Serves Page.captureScreenshot clips of a synthetic page at the given device pixel ratio"""
+
+    def __init__(self, page, device_pixel_ratio=1):
+        self.page = cv2.resize(page, None, fx=device_pixel_ratio, fy=device_pixel_ratio, interpolation=cv2.INTER_NEAREST)
+        self.device_pixel_ratio = device_pixel_ratio
+        self.captures = []
+
+    def execute_cdp_cmd(self, command, params):
+        assert command == "Page.captureScreenshot" and params["captureBeyondViewport"]
+        clip = params["clip"]
+        self.captures.append(clip)
+        scale = self.device_pixel_ratio
+        x, y, width, height = (int(clip[key] * scale) for key in ["x", "y", "width", "height"])
+        ok, png = cv2.imencode(".png", self.page[y : y + height, x : x + width])
+        return {"data": base64.b64encode(png.tobytes()).decode()}
+
+
+class TestPageCapture(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.page = rng.integers(0, 256, size=(3000, 400, 3), dtype=np.uint8)
+        self.rects = [(10, 20, 300, 100), (20.5, 400.25, 250, 80), (10, 2600, 300, 150)]
+
+    def test_cuts_every_card_from_few_captures(self):
+        for device_pixel_ratio in [1, 2]:
+            driver = FakeChrome(self.page, device_pixel_ratio)
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                paths = [os.path.join(tmp_dir, f"{k}.png") for k in range(len(self.rects))]
+                self.assertEqual(capture_cards(driver, self.rects, paths, max_height=1000), 2)
+                first = cv2.imread(paths[0])
+                expected = cv2.resize(self.page[20:120, 10:310], None, fx=device_pixel_ratio, fy=device_pixel_ratio, interpolation=cv2.INTER_NEAREST)
+                np.testing.assert_array_equal(first, expected)
+                self.assertEqual(cv2.imread(paths[1]).shape[:2], (81 * device_pixel_ratio, 251 * device_pixel_ratio))
+
+    def test_plans_bands_under_max_height(self):
+        bands = plan_capture_bands(self.rects, max_height=1000)
+        self.assertEqual([members for _, members in bands], [[0, 1], [2]])
+        self.assertEqual(bands[0][0], (10, 20, 300, 461))
+        self.assertEqual(len(plan_capture_bands(self.rects, max_height=5000)), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+
+from viddit.core.page_readiness import NEW_LAYOUT, detect_layout, wait_for_stable_layout
+from viddit.utils.timing_utils import PageTimings
+
+
+class FakeDriver:
+    """Returns the given script results in turn, repeating the last one"""
+
+    def __init__(self, results):
+        self.results = list(results)
+        self.calls = 0
+
+    def execute_script(self, script, *args):
+        self.calls += 1
+        return self.results.pop(0) if len(self.results) > 1 else self.results[0]
+
+
+class TestPageReadiness(unittest.TestCase):
+    def test_detects_layout_in_one_probe_per_poll(self):
+        driver = FakeDriver([None, None, [NEW_LAYOUT, "post"]])
+        self.assertEqual(detect_layout(driver, timeout=2), [NEW_LAYOUT, "post"])
+        self.assertEqual(driver.calls, 3)
+
+    def test_waits_until_layout_stops_changing(self):
+        driver = FakeDriver(["", "0,0,10,10", "0,0,10,10;0,20,10,30", "0,0,10,10;0,20,10,40", "0,0,10,10;0,20,10,40"])
+        wait_for_stable_layout(driver, "shreddit-comment", timeout=2, stable_polls=2)
+        # Attached on the 2nd poll, settled on the 4th, unchanged on the 5th and 6th
+        self.assertEqual(driver.calls, 6)
+
+    def test_times_repeated_steps(self):
+        timings = PageTimings("https://www.reddit.com/r/test")
+        for _ in range(3):
+            with timings.step("tts"):
+                pass
+        with timings.step("navigate"):
+            pass
+        self.assertEqual(list(timings.steps), ["tts", "navigate"])
+        self.assertAlmostEqual(timings.total, sum(timings.steps.values()))
+        self.assertIn("total", timings.summary())
+
+
+if __name__ == '__main__':
+    unittest.main()
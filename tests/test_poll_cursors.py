@@ -0,0 +1,133 @@
+import os
+import tempfile
+import time
+import unittest
+from types import SimpleNamespace
+
+from viddit.core.poll_cursors import PollCursorStore
+from viddit.core.reddit_scraper import SubRedditInfoScraper
+
+
+def fake_submission(k, score, age_hours=1):
+    return SimpleNamespace(
+        created_utc=time.time() - age_hours * 3600,
+        distinguished=None,
+        id=str(k),
+        is_original_content=False,
+        link_flair_text=None,
+        locked=False,
+        name=f"t3_{k}",
+        num_comments=100,
+        over_18=False,
+        permalink=f"/r/test/comments/{k}/",
+        score=score,
+        selftext="",
+        spoiler=False,
+        stickied=False,
+        title=f"Post {k}",
+        upvote_ratio=0.95,
+        url="",
+    )
+
+
+class FakeReddit:
+    """Serves a subreddit whose posts are listed newest first, recording the listing and info calls"""
+
+    def __init__(self, submissions):
+        self.submissions = submissions
+        self.calls = []
+
+    def subreddit(self, name):
+        return SimpleNamespace(new=self.new, top=self.top)
+
+    def new(self, limit):
+        self.calls.append(("new", limit))
+        return iter(self.submissions[:limit])
+
+    def top(self, limit, time_filter):
+        self.calls.append(("top", None))
+        return sorted(self.submissions, key=lambda submission: submission.score, reverse=True)[:limit]
+
+    def info(self, fullnames):
+        self.calls.append(("info", tuple(fullnames)))
+        return [submission for submission in self.submissions if submission.name in fullnames]
+
+
+class TestPollCursors(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, "cursors.json")
+        self.scraper = SubRedditInfoScraper("id", "secret", "password", "viddit tests", "username")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def poll(self, reddit, store, jobs_succeed=True):
+        names = [post["name"] for post in self.scraper.poll_subreddit_info("test", store, limit=2, min_upvotes=50, reddit=reddit)]
+        if jobs_succeed:
+            for name in names:
+                store.mark_passed("test", name)
+        return names
+
+    def test_later_polls_only_evaluate_new_and_moved_posts(self):
+        reddit = FakeReddit([fake_submission(3, 5), fake_submission(2, 40), fake_submission(1, 200), fake_submission(0, 100)])
+        store = PollCursorStore(self.path)
+        self.assertEqual(self.poll(reddit, store), ["t3_1", "t3_0"])
+
+        # A new post arrives and a post that was below min_upvotes climbs past it
+        reddit.submissions.insert(0, fake_submission(4, 80))
+        reddit.submissions[2].score = 60
+        reddit.submissions[1].score = 8
+        reddit.calls = []
+        self.assertEqual(self.poll(reddit, PollCursorStore(self.path)), ["t3_4", "t3_2"])
+        self.assertEqual(reddit.calls, [("new", None), ("info", ("t3_2", "t3_3"))])
+
+        # Nothing moved, nothing is returned twice
+        self.assertEqual(self.poll(reddit, PollCursorStore(self.path)), [])
+
+    def test_passing_posts_over_the_limit_are_kept_for_the_next_poll(self):
+        reddit = FakeReddit([fake_submission(k, 100 + k) for k in range(3)])
+        store = PollCursorStore(self.path)
+        self.assertEqual(self.poll(reddit, store), ["t3_2", "t3_1"])
+        self.assertEqual(self.poll(reddit, store), ["t3_0"])
+
+    def test_posts_whose_jobs_failed_are_offered_again(self):
+        reddit = FakeReddit([fake_submission(1, 200), fake_submission(0, 100)])
+        store = PollCursorStore(self.path)
+        self.assertEqual(self.poll(reddit, store, jobs_succeed=False), ["t3_1", "t3_0"])
+        self.assertEqual(self.poll(reddit, store), ["t3_1", "t3_0"])
+        self.assertEqual(self.poll(reddit, store), [])
+
+    def test_pages_back_to_the_cursor_and_caps_refreshes(self):
+        reddit = FakeReddit([fake_submission(k, 10) for k in range(150)][::-1])
+        store = PollCursorStore(self.path)
+        self.assertEqual(self.poll(reddit, store), [])
+
+        # More new posts than fit in one listing page, only the oldest of them passes
+        reddit.submissions = [fake_submission(k, 10) for k in range(1000, 1250)][::-1] + [fake_submission(999, 100)] + reddit.submissions
+        reddit.calls = []
+        self.assertEqual(self.poll(reddit, store), ["t3_999"])
+        self.assertEqual(len(reddit.calls[1][1]), 100)
+        self.assertTrue({"t3_1000", "t3_1249"} <= set(store.get("test")["seen"]))
+
+    def test_posts_failing_filters_votes_cannot_change_are_not_refreshed(self):
+        locked = fake_submission(1, 10)
+        locked.locked = True
+        reddit = FakeReddit([locked, fake_submission(0, 10)])
+        store = PollCursorStore(self.path)
+        self.poll(reddit, store)
+        reddit.calls = []
+        self.poll(reddit, store)
+        self.assertEqual(reddit.calls, [("new", None), ("info", ("t3_0",))])
+
+    def test_snapshots_older_than_the_window_are_pruned(self):
+        store = PollCursorStore(self.path)
+        seen = {"t3_old": {"score": 1, "created_utc": time.time() - 48 * 3600, "passed": False}, "t3_new": {"score": 1, "created_utc": time.time(), "passed": False}}
+        store.update("Test", "t3_old", seen, max_age_seconds=24 * 3600)
+        cursor = PollCursorStore(self.path).get("test")
+        self.assertEqual(set(cursor["seen"]), {"t3_new"})
+        self.assertIsNone(cursor["newest"])
+
+
+if __name__ == '__main__':
+    unittest.main()
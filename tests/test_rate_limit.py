@@ -0,0 +1,101 @@
+import threading
+import unittest
+from types import SimpleNamespace
+
+from viddit.core.reddit_scraper import SubRedditInfoScraper
+from viddit.utils.rate_limit import RateLimitedRequestor, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class FakeSession:
+    def __init__(self, headers):
+        self.headers = {}
+        self.response_headers = headers
+        self.requests = 0
+
+    def request(self, *args, **kwargs):
+        self.requests += 1
+        return SimpleNamespace(headers=self.response_headers, status_code=200)
+
+
+def fake_submission(k):
+    fields = dict(
+        created_utc=0,
+        distinguished=None,
+        id=str(k),
+        is_original_content=False,
+        link_flair_text=None,
+        locked=False,
+        name=f"t3_{k}",
+        num_comments=100,
+        over_18=False,
+        permalink=f"/r/test/comments/{k}/",
+        score=1000,
+        selftext="",
+        spoiler=False,
+        stickied=False,
+        title=f"Post {k}",
+        upvote_ratio=0.95,
+        url="",
+    )
+    return SimpleNamespace(**fields)
+
+
+class FakeReddit:
+    clients = []
+
+    def __init__(self):
+        self.thread = threading.get_ident()
+        FakeReddit.clients.append(self)
+
+    def subreddit(self, name):
+        assert threading.get_ident() == self.thread, "praw clients must not be shared between threads"
+        if name == "broken":
+            raise ConnectionError("503")
+        return SimpleNamespace(top=lambda limit, time_filter: [fake_submission(k) for k in range(limit)])
+
+
+class TestRateLimit(unittest.TestCase):
+    def test_bucket_allows_bursts_then_paces(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=2, capacity=3, clock=clock, sleep=clock.sleep)
+        self.assertEqual([bucket.acquire() for _ in range(3)], [0, 0, 0])
+        self.assertAlmostEqual(bucket.acquire(), 0.5)
+        clock.now += 10
+        self.assertEqual(bucket.acquire(), 0)
+
+    def test_requestor_follows_rate_limit_headers(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=100, capacity=10, clock=clock, sleep=clock.sleep)
+        session = FakeSession({"x-ratelimit-remaining": "4", "x-ratelimit-reset": "20"})
+        requestor = RateLimitedRequestor(user_agent="viddit tests", session=session, bucket=bucket)
+        requestor.request("GET", "https://oauth.reddit.com/r/test/top")
+        # Four requests left over twenty seconds
+        self.assertAlmostEqual(bucket.rate, 0.2)
+        waits = [bucket.acquire() for _ in range(5)]
+        self.assertEqual(waits[:4], [0, 0, 0, 0])
+        self.assertAlmostEqual(waits[4], 5)
+
+    def test_streams_listings_from_one_client_per_thread(self):
+        scraper = SubRedditInfoScraper("id", "secret", "password", "viddit tests", "username")
+        scraper.new_client = FakeReddit
+        FakeReddit.clients = []
+        results = dict(scraper.iter_subreddits_info(["a", "b", "broken", "c"], max_workers=2, limit=3, min_upvotes=50))
+        self.assertEqual(set(results), {"a", "b", "broken", "c"})
+        self.assertEqual([post["title"] for post in results["a"]], ["Post 0", "Post 1", "Post 2"])
+        self.assertEqual(results["broken"], [])
+        self.assertLessEqual(len(FakeReddit.clients), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import os
+import tempfile
+import unittest
+
+import cv2
+import numpy as np
+
+from viddit.core.ffmpeg_writer import FFmpegWriter
+from viddit.core.filtergraph_backend import FilterGraphBackend
+from viddit.core.timeline import build_timeline
+from viddit.core.video_writer import OpenCVBackend
+from viddit.utils.ffmpeg_utils import run_ffmpeg
+
+
+class TestTimeline(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.background_path = os.path.join(self.tmp_dir.name, "background.mp4")
+        with FFmpegWriter(self.background_path, 64, 64, 10, preset="ultrafast") as writer:
+            for i in range(100):
+                writer.write_frame(np.full((64, 64, 3), 40, dtype=np.uint8))
+        self.png_paths = []
+        self.audio_paths = []
+        for i, duration in enumerate([0.5, 1.0]):
+            png_path = os.path.join(self.tmp_dir.name, f"{i}.png")
+            cv2.imwrite(png_path, np.full((32, 32, 4), 255, dtype=np.uint8))
+            audio_path = os.path.join(self.tmp_dir.name, f"{i}.mp3")
+            run_ffmpeg(["-f", "lavfi", "-i", "sine=sample_rate=24000", "-t", duration, "-c:a", "libmp3lame", audio_path])
+            self.png_paths.append(png_path)
+            self.audio_paths.append(audio_path)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_build_timeline(self):
+        timeline = build_timeline(self.background_path, self.png_paths, self.audio_paths, wait_time=1, background_start_frame=20)
+        self.assertEqual([segment.num_frames for segment in timeline.segments], [15, 20])
+        self.assertEqual([segment.start_frame for segment in timeline.segments], [0, 15])
+        self.assertEqual(timeline.background_frame(timeline.segments[1]), 35)
+        self.assertAlmostEqual(timeline.duration, 3.5)
+
+    def test_random_start_leaves_room_for_video(self):
+        timeline = build_timeline(self.background_path, self.png_paths, self.audio_paths, wait_time=1)
+        self.assertLessEqual(timeline.background_start_frame + timeline.total_frames, 100)
+
+    def test_backends_render_same_plan(self):
+        timeline = build_timeline(self.background_path, self.png_paths, self.audio_paths, wait_time=1, background_start_frame=0)
+        for name, backend in [("filtergraph", FilterGraphBackend()), ("stream", OpenCVBackend("stream"))]:
+            output_name = os.path.join(self.tmp_dir.name, f"{name}.mp4")
+            backend.render(timeline, output_name)
+            cap = cv2.VideoCapture(output_name)
+            self.assertEqual(int(cap.get(cv2.CAP_PROP_FRAME_COUNT)), timeline.total_frames)
+            ret, frame = cap.read()
+            # The card covers the centre of the frame and the background shows at the edges
+            self.assertGreater(int(frame[32, 32].mean()), 200)
+            self.assertLess(int(frame[2, 2].mean()), 100)
+            cap.release()
+
+    def test_parallel_render_joins_segments(self):
+        timeline = build_timeline(self.background_path, self.png_paths, self.audio_paths, wait_time=1, background_start_frame=0)
+        output_name = os.path.join(self.tmp_dir.name, "parallel.mp4")
+        OpenCVBackend("parallel", max_workers=2).render(timeline, output_name)
+        cap = cv2.VideoCapture(output_name)
+        frame_count, fps = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)), cap.get(cv2.CAP_PROP_FPS)
+        cap.release()
+        self.assertEqual(frame_count, timeline.total_frames)
+        self.assertAlmostEqual(frame_count / fps, timeline.duration, places=2)
+        # Only the joined output is left behind
+        self.assertEqual(sorted(name for name in os.listdir(self.tmp_dir.name) if name.startswith("parallel")), ["parallel.mp4"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from concurrent import futures
+
+import grpc
+from google.cloud.texttospeech_v1.types import SynthesizeSpeechRequest, SynthesizeSpeechResponse
+
+from viddit.core.tts_async import AsyncGoogleCloudTTS
+from viddit.core.tts_pipeline import TTSJob
+
+
+class FakeTTSServer:
+    """A local Text-to-Speech gRPC server that answers after a delay, failing the first requests for some texts.
+
+    With hold_until, no request is answered until that many have been in flight at once, proving they overlap.
+    """
+
+    def __init__(self, delay=0.2, failures=None, hold_until=None):
+        self.delay = delay
+        self.failures = dict(failures or {})
+        self.hold_until = hold_until
+        self._released = threading.Event()
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        handler = grpc.method_handlers_generic_handler(
+            "google.cloud.texttospeech.v1.TextToSpeech",
+            {
+                "SynthesizeSpeech": grpc.unary_unary_rpc_method_handler(
+                    self.synthesize_speech,
+                    request_deserializer=SynthesizeSpeechRequest.deserialize,
+                    response_serializer=SynthesizeSpeechResponse.serialize,
+                )
+            },
+        )
+        self.server = grpc.server(futures.ThreadPoolExecutor(max_workers=16))
+        self.server.add_generic_rpc_handlers((handler,))
+        self.port = self.server.add_insecure_port("127.0.0.1:0")
+        self.server.start()
+
+    def synthesize_speech(self, request, context):
+        text = request.input.text
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            if self.hold_until is None or self.max_in_flight >= self.hold_until:
+                self._released.set()
+            fail = self.failures.get(text, 0) > 0
+            if fail:
+                self.failures[text] -= 1
+        try:
+            # Bounded, so a client that never overlaps fails the test rather than hanging it
+            self._released.wait(timeout=30)
+            time.sleep(self.delay)
+            if fail:
+                context.abort(grpc.StatusCode.UNAVAILABLE, "try again")
+            return SynthesizeSpeechResponse(audio_content=f"{text}|{request.voice.name}".encode())
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def stop(self):
+        self.server.stop(None)
+
+
+class TestTTSAsync(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def jobs(self, count):
+        return [TTSJob(k, f"Comment {k}", os.path.join(self.temp_dir.name, f"{k}.mp3"), "en-US-Standard-A") for k in range(count)]
+
+    def test_batch_runs_concurrently_within_the_limit(self):
+        # Nothing is answered until six requests overlap, the client must reach its limit and never pass it
+        server = FakeTTSServer(delay=0.05, hold_until=6)
+        tts = AsyncGoogleCloudTTS(endpoint=f"127.0.0.1:{server.port}", insecure=True, concurrency=6)
+        try:
+            errors = tts.synthesize_batch(self.jobs(11))
+        finally:
+            tts.close()
+            server.stop()
+        self.assertEqual(errors, [None] * 11)
+        self.assertEqual(server.max_in_flight, 6)
+        self.assertEqual(server.requests, 11)
+        with open(os.path.join(self.temp_dir.name, "10.mp3"), "rb") as f:
+            self.assertEqual(f.read(), b"Comment 10|en-US-Standard-A")
+
+    def test_transient_errors_are_retried(self):
+        server = FakeTTSServer(delay=0, failures={"Comment 0": 2, "Comment 1": 5})
+        tts = AsyncGoogleCloudTTS(endpoint=f"127.0.0.1:{server.port}", insecure=True, backoff=0.01, max_attempts=3)
+        try:
+            errors = tts.synthesize_batch(self.jobs(2))
+        finally:
+            tts.close()
+            server.stop()
+        self.assertIsNone(errors[0])
+        self.assertEqual(errors[1].__class__.__name__, "ServiceUnavailable")
+        self.assertTrue(os.path.exists(self.jobs(1)[0].output_path))
+        self.assertEqual(tts.retries, 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
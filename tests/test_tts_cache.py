@@ -0,0 +1,54 @@
+import os
+import tempfile
+import unittest
+
+from viddit.core.tts_cache import CachedTTS
+
+
+class FakeTTS:
+    audio_encoding = "MP3"
+
+    def __init__(self):
+        self.requests = []
+
+    def text_to_speech(self, input_text, output_filename, language_code="en-US", voice_name="en-US-Wavenet-A", speaking_rate=1.0, pitch=0.0):
+        self.requests.append(input_text)
+        with open(output_filename, "wb") as f:
+            f.write(f"{input_text}|{voice_name}|{speaking_rate}".encode())
+
+    def list_voices(self):
+        return ["en-US-Wavenet-A"]
+
+
+class TestTTSCache(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.temp_dir.name, "cache")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.temp_dir.name, name)
+
+    def test_identical_requests_are_synthesised_once(self):
+        fake = FakeTTS()
+        tts = CachedTTS(fake, directory=self.cache_dir)
+        tts.text_to_speech("Hello", self.path("a.mp3"), voice_name="en-US-Standard-A", speaking_rate=1.25)
+        # Another run sharing the cache directory
+        rerun = CachedTTS(fake, directory=self.cache_dir)
+        rerun.text_to_speech("Hello", self.path("b.mp3"), voice_name="en-US-Standard-A", speaking_rate=1.25)
+        rerun.text_to_speech("Hello", self.path("c.mp3"), voice_name="en-US-Standard-B", speaking_rate=1.25)
+        self.assertEqual(fake.requests, ["Hello", "Hello"])
+        with open(self.path("a.mp3"), "rb") as a, open(self.path("b.mp3"), "rb") as b:
+            self.assertEqual(a.read(), b.read())
+        stats = rerun.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["entries"]), (1, 1, 2))
+        self.assertAlmostEqual(stats["hit_rate"], 0.5)
+
+    def test_other_methods_reach_the_wrapped_module(self):
+        self.assertEqual(CachedTTS(FakeTTS(), directory=self.cache_dir).list_voices(), ["en-US-Wavenet-A"])
+
+
+if __name__ == '__main__':
+    unittest.main()
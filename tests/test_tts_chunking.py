@@ -0,0 +1,72 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+import wave
+
+from viddit.core.audio import get_audio_duration
+from viddit.core.tts_chunking import ChunkedTTS, split_text
+
+
+class FakeTTS:
+    """Writes 0.1s of 24 kHz LINEAR16 per word, sleeping to stand in for the request"""
+
+    audio_encoding = "MP3"
+
+    def __init__(self):
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def text_to_speech(self, input_text, output_filename, language_code="en-US", voice_name="en-US-Wavenet-A", speaking_rate=1.0, pitch=0.0, audio_encoding=None):
+        with self._lock:
+            self.requests.append((input_text, audio_encoding))
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(0.05)
+        with wave.open(output_filename, "wb") as f:
+            f.setnchannels(1)
+            f.setsampwidth(2)
+            f.setframerate(24000)
+            f.writeframes(b"\x10\x00" * 2400 * len(input_text.split()))
+        with self._lock:
+            self.in_flight -= 1
+
+
+class TestTTSChunking(unittest.TestCase):
+    def test_splits_at_paragraphs_then_sentences(self):
+        paragraphs = ["First paragraph. It is short.", "Second one! " * 10 + "Done.", "Third."]
+        chunks = split_text("\n\n".join(paragraphs), max_bytes=80)
+        self.assertTrue(all(len(chunk.encode("utf-8")) <= 80 for chunk in chunks))
+        self.assertEqual(chunks[0], "First paragraph. It is short.")
+        self.assertTrue(all(chunk.endswith(("!", ".")) for chunk in chunks))
+        self.assertEqual(" ".join(" ".join(chunks).split()), " ".join(" ".join(paragraphs).split()))
+
+    def test_counts_bytes_not_characters(self):
+        chunks = split_text("é" * 30, max_bytes=20)
+        self.assertEqual([len(chunk) for chunk in chunks], [10, 10, 10])
+
+    def test_short_text_is_one_request(self):
+        self.assertEqual(split_text("  Just one sentence.  "), ["Just one sentence."])
+        self.assertEqual(split_text(""), [])
+
+    def test_long_text_is_synthesised_in_parallel_and_joined_in_order(self):
+        fake = FakeTTS()
+        tts = ChunkedTTS(fake, max_bytes=60, workers=4)
+        text = " ".join(f"Sentence number {k} is here." for k in range(12))
+        with tempfile.TemporaryDirectory() as temp_dir:
+            output_path = os.path.join(temp_dir, "0.mp3")
+            tts.text_to_speech(text, output_path)
+            self.assertGreater(len(fake.requests), 1)
+            self.assertTrue(all(encoding == "LINEAR16" for _, encoding in fake.requests))
+            self.assertGreater(fake.max_in_flight, 1)
+            # 60 words at 0.1s each, encoded once
+            self.assertAlmostEqual(get_audio_duration(output_path), 6.0, delta=0.1)
+            self.assertEqual(os.listdir(temp_dir), ["0.mp3"])
+        tts.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from viddit.core.tts_pipeline import TTSPipeline
+
+
+class FakeTTS:
+    """Records how many requests overlap, every request waits for released unless it is already set"""
+
+    def __init__(self, delay=0.05, released=True):
+        self.delay = delay
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.finished = 0
+        self.released = threading.Event()
+        if released:
+            self.released.set()
+        self.lock = threading.Condition()
+
+    def wait_for_in_flight(self, count, timeout=30):
+        with self.lock:
+            return self.lock.wait_for(lambda: self.in_flight >= count, timeout)
+
+    def text_to_speech(self, input_text, output_filename, language_code="en-US", voice_name="en-US-Wavenet-A", speaking_rate=1.0):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            self.lock.notify_all()
+        try:
+            # Bounded, so a submit that blocks fails the test rather than hanging it
+            self.released.wait(timeout=30)
+            time.sleep(self.delay)
+            if input_text == "fail":
+                raise ConnectionError("quota exceeded")
+            with open(output_filename, "w") as f:
+                f.write(f"{voice_name}:{input_text}")
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+                self.finished += 1
+
+
+class TestTTSPipeline(unittest.TestCase):
+    def test_jobs_run_concurrently_and_batches_wait(self):
+        tts = FakeTTS(released=False)
+        pipeline = TTSPipeline(tts, workers=3)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            batch = pipeline.batch()
+            for k in range(6):
+                batch.submit(k, f"text {k}", os.path.join(tmp_dir, f"{k}.mp3"), "voice")
+            # Every submit returned while no request could finish, so none of them waited on one
+            self.assertEqual(tts.finished, 0)
+            self.assertTrue(tts.wait_for_in_flight(3))
+            tts.released.set()
+            batch.wait()
+            self.assertEqual(sorted(os.listdir(tmp_dir)), [f"{k}.mp3" for k in range(6)])
+        pipeline.close()
+        self.assertEqual(tts.max_in_flight, 3)
+
+    def test_wait_raises_on_failed_job(self):
+        pipeline = TTSPipeline(FakeTTS(delay=0), workers=2)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            batch = pipeline.batch()
+            batch.submit(0, "fine", os.path.join(tmp_dir, "0.mp3"), "voice")
+            batch.submit(1, "fail", os.path.join(tmp_dir, "1.mp3"), "voice")
+            with self.assertRaises(RuntimeError):
+                batch.wait()
+            other = pipeline.batch()
+            other.submit(0, "fine", os.path.join(tmp_dir, "2.mp3"), "voice")
+            other.wait()
+        pipeline.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
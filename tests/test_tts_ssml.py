@@ -0,0 +1,124 @@
+import io
+import os
+import re
+import tempfile
+import unittest
+import wave
+
+from viddit.core.tts_cache import CachedTTS
+from viddit.core.tts_pipeline import TTSPipeline
+from viddit.core.tts_ssml import build_ssml, split_wav_at_offsets, supports_marks
+
+RATE = 24000
+
+
+def wav_bytes(seconds):
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(RATE)
+        f.writeframes(b"\x01\x00" * round(seconds * RATE))
+    return buffer.getvalue()
+
+
+def wav_seconds(path):
+    with wave.open(path, "rb") as f:
+        return f.getnframes() / f.getframerate()
+
+
+class FakeMarkedTTS:
+    """Reads every word in 0.1s, one request per document, and reports where each <mark> fell"""
+
+    audio_encoding = "LINEAR16"
+
+    def __init__(self):
+        self.ssml_requests = 0
+        self.plain_requests = 0
+
+    def synthesize_with_marks(self, ssml, language_code="en-US", voice_name="en-US-Wavenet-A", speaking_rate=1.0, pitch=0.0):
+        self.ssml_requests += 1
+        timepoints, words = {}, 0
+        for mark_name, text in re.findall(r'<mark name="([^"]+)"/>([^<]*)', ssml):
+            timepoints[mark_name] = words * 0.1
+            words += len(text.split())
+        return wav_bytes(words * 0.1), timepoints
+
+    def text_to_speech(self, input_text, output_filename, language_code="en-US", voice_name="en-US-Wavenet-A", speaking_rate=1.0, pitch=0.0):
+        self.plain_requests += 1
+        with open(output_filename, "wb") as f:
+            f.write(wav_bytes(len(input_text.split()) * 0.1))
+
+
+class FakePlainTTS:
+    """Like AsyncGoogleCloudTTS, a client that can only narrate plain text"""
+
+    audio_encoding = "LINEAR16"
+
+    def __init__(self):
+        self.plain_requests = 0
+
+    def text_to_speech(self, input_text, output_filename, language_code="en-US", voice_name="en-US-Wavenet-A", speaking_rate=1.0, pitch=0.0):
+        self.plain_requests += 1
+        with open(output_filename, "wb") as f:
+            f.write(wav_bytes(len(input_text.split()) * 0.1))
+
+
+class TestTTSSSML(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def narrate(self, texts, tts=None, cache_dir=None):
+        tts = tts or FakeMarkedTTS()
+        pipeline = TTSPipeline(CachedTTS(tts, directory=cache_dir) if cache_dir else tts, workers=2, ssml_marks=True)
+        batch = pipeline.batch()
+        paths = [os.path.join(self.temp_dir.name, f"{k}.wav") for k in range(len(texts))]
+        for k, (text, path) in enumerate(zip(texts, paths)):
+            batch.submit(k, text, path, "en-US-Standard-A")
+        batch.wait()
+        pipeline.close()
+        return tts, [wav_seconds(path) for path in paths]
+
+    def test_build_ssml_escapes_text(self):
+        ssml, mark_names = build_ssml(["Q&A <3", "Fine"])
+        self.assertEqual(ssml, '<speak><mark name="segment_0"/>Q&amp;A &lt;3\n<mark name="segment_1"/>Fine</speak>')
+        self.assertEqual(mark_names, ["segment_0", "segment_1"])
+
+    def test_split_keeps_every_sample(self):
+        paths = [os.path.join(self.temp_dir.name, f"{k}.wav") for k in range(3)]
+        split_wav_at_offsets(wav_bytes(3.0), [0.2, 1.0, 2.5], paths, encoding="LINEAR16")
+        self.assertEqual([wav_seconds(path) for path in paths], [1.0, 1.5, 0.5])
+
+    def test_one_request_per_post(self):
+        tts, durations = self.narrate(["The post title and body", "First comment", "A second comment here"])
+        self.assertEqual((tts.ssml_requests, tts.plain_requests), (1, 0))
+        for duration, expected in zip(durations, [0.5, 0.2, 0.4]):
+            self.assertAlmostEqual(duration, expected, places=3)
+
+    def test_reruns_are_served_from_the_tts_cache(self):
+        cache_dir = os.path.join(self.temp_dir.name, "cache")
+        texts = ["The post title and body", "First comment"]
+        tts, first = self.narrate(texts, cache_dir=cache_dir)
+        _, second = self.narrate(texts, tts=tts, cache_dir=cache_dir)
+        self.assertEqual((tts.ssml_requests, tts.plain_requests), (1, 0))
+        self.assertEqual(first, second)
+
+    def test_falls_back_when_over_the_input_limit(self):
+        tts, durations = self.narrate(["word " * 900, "word " * 200])
+        self.assertEqual((tts.ssml_requests, tts.plain_requests), (0, 2))
+        self.assertAlmostEqual(durations[1], 20.0, places=3)
+
+    def test_clients_without_marks_are_found_under_the_cache(self):
+        self.assertTrue(supports_marks(CachedTTS(FakeMarkedTTS(), directory=self.temp_dir.name)))
+        self.assertFalse(supports_marks(CachedTTS(FakePlainTTS(), directory=self.temp_dir.name)))
+        with self.assertLogs("viddit.core.tts_pipeline", "WARNING"):
+            tts, durations = self.narrate(["One two", "Three"], tts=FakePlainTTS(), cache_dir=os.path.join(self.temp_dir.name, "cache"))
+        self.assertEqual(tts.plain_requests, 2)
+        self.assertAlmostEqual(durations[0], 0.2, places=3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from viddit.core.workspace import MB, WorkspaceManager
+
+LAYOUT = {"post_audio": os.path.join("post", "audio"), "comment_image": os.path.join("comments", "images")}
+
+
+class TestWorkspace(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.disk_root = os.path.join(self.temp_dir.name, "output")
+        self.tmpfs_root = os.path.join(self.temp_dir.name, "shm")
+        os.makedirs(self.tmpfs_root)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_jobs_get_separate_workspaces_that_are_cleaned_up(self):
+        manager = WorkspaceManager(self.disk_root, LAYOUT, tmpfs_root=self.tmpfs_root, min_free_mb=0)
+        with manager.job("job_0") as first, manager.job("job_1") as second:
+            self.assertNotEqual(first.path, second.path)
+            self.assertTrue(first.path.startswith(self.tmpfs_root))
+            self.assertTrue(os.path.isdir(first.directories["comment_image"]))
+            with open(first.file("output.mp4"), "wb") as f:
+                f.write(b"\0" * 2048)
+        self.assertFalse(os.path.exists(first.path))
+        self.assertFalse(os.path.exists(second.path))
+        self.assertEqual(manager.usage, {"job_0": 2048, "job_1": 0})
+
+    def test_falls_back_to_disk_when_tmpfs_is_full_or_missing(self):
+        full = WorkspaceManager(self.disk_root, LAYOUT, tmpfs_root=self.tmpfs_root, min_free_mb=1 << 40)
+        missing = WorkspaceManager(self.disk_root, LAYOUT, tmpfs_root=os.path.join(self.temp_dir.name, "missing"))
+        for manager in [full, missing]:
+            with manager.job("job_0") as workspace:
+                self.assertTrue(workspace.path.startswith(self.disk_root))
+
+    def test_live_workspaces_reserve_tmpfs(self):
+        free_mb = shutil.disk_usage(self.tmpfs_root).free / MB
+        # Room for one reservation but not two
+        manager = WorkspaceManager(self.disk_root, LAYOUT, tmpfs_root=self.tmpfs_root, min_free_mb=int(free_mb * 0.6))
+        with manager.job("job_0") as first:
+            with manager.job("job_1") as second:
+                self.assertTrue(first.path.startswith(self.tmpfs_root))
+                self.assertTrue(second.path.startswith(self.disk_root))
+        with manager.job("job_2") as third:
+            self.assertTrue(third.path.startswith(self.tmpfs_root))
+
+    def test_failed_jobs_still_release_their_workspace(self):
+        manager = WorkspaceManager(self.disk_root, LAYOUT, tmpfs_root=None)
+        with self.assertRaises(RuntimeError):
+            with manager.job("job_0") as workspace:
+                raise RuntimeError("upload failed")
+        self.assertFalse(os.path.exists(workspace.path))
+        self.assertIn("job_0", manager.usage)
+
+
+if __name__ == '__main__':
+    unittest.main()